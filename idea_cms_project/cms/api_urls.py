@@ -33,6 +33,10 @@ urlpatterns = [
     
     # Search API
     path('search/', api_views.search_api, name='api_search'),
+    path('search/suggest/', api_views.search_suggest_api, name='api_search_suggest'),
+    
+    # Monitoring API
+    path('metrics/', api_views.runtime_metrics_api, name='api_runtime_metrics'),
     
     # Form Submissions APIs
     path('forms/submit/', api_views.submit_form_api, name='api_submit_form'),
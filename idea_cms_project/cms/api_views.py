@@ -1,11 +1,18 @@
+import json
+
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
-from django.db.models import Q, Count, Avg
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import (
+    Q, Count, Avg, DateField, DurationField, ExpressionWrapper, F, IntegerField, OuterRef, Subquery, Value
+)
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from datetime import datetime, timedelta
 from .models import (
@@ -13,6 +20,14 @@ from .models import (
     BlogPost, FormSubmission, ContactMessage, DynamicForm,
     VisitorTracking, IntegrationSettings, PlatformReport
 )
+from .utils.cdn import cdn_rewrite_stats
+from .utils.compression import compression_stats
+from .utils.etags import etag_cache_stats
+from .utils.geoip import geoip_cache_stats
+from .utils.response_cache import response_cache_stats
+from .utils.search import SEARCH_SOURCES, search_documents
+from .utils.suggest import SUGGEST_TYPES, suggest
+from .utils.user_agents import user_agent_cache_stats
 from .serializers import (
     LoginSerializer, UserSerializer, CustomUserProfileSerializer,
     ProjectSerializer, TaskSerializer, NotificationSerializer,
@@ -28,6 +43,13 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+class ProjectProgressPagination(CursorPagination):
+    """تقسيم بالمؤشر (keyset) على المعرف: لا OFFSET ولا COUNT مهما كبر الجدول"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-id'
+
 # Authentication Views
 
 @api_view(['POST'])
@@ -166,7 +188,11 @@ def dashboard_stats_api(request):
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def project_progress_api(request):
-    """API تقدم المشاريع"""
+    """
+    API تقدم المشاريع
+    
+    تقسيم بالمؤشر (keyset) عبر ?cursor، أو ?stream=1 لإرجاع كل المشاريع كاستجابة متدفقة
+    """
     user = request.user
     
     if hasattr(user, 'profile') and user.profile.user_type == 'client':
@@ -174,25 +200,54 @@ def project_progress_api(request):
     else:
         projects = Project.objects.all()
     
-    progress_data = []
-    for project in projects:
-        days_remaining = (project.end_date - timezone.now().date()).days if project.end_date else 0
-        progress_data.append({
-            'project_id': project.id,
-            'project_title': project.title,
-            'progress': project.progress,
-            'status': project.status,
-            'start_date': project.start_date,
-            'end_date': project.end_date,
-            'days_remaining': max(0, days_remaining)
-        })
+    # الحقول المطلوبة فقط، والمدة المتبقية محسوبة في قاعدة البيانات
+    today = timezone.now().date()
+    rows = projects.values(
+        'id', 'title', 'progress', 'status', 'start_date', 'end_date'
+    ).annotate(
+        remaining=ExpressionWrapper(F('end_date') - Value(today, output_field=DateField()), output_field=DurationField())
+    )
+    
+    if request.query_params.get('stream', '').lower() in ('1', 'true'):
+        return StreamingHttpResponse(
+            _stream_project_progress(rows.order_by('-id')), content_type='application/json'
+        )
     
-    serializer = ProjectProgressSerializer(progress_data, many=True)
+    paginator = ProjectProgressPagination()
+    page = paginator.paginate_queryset(rows, request)
+    
+    serializer = ProjectProgressSerializer([_project_progress_row(row) for row in page], many=True)
     return Response({
         'success': True,
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
         'projects': serializer.data
     })
 
+
+def _project_progress_row(row):
+    remaining = row['remaining']
+    return {
+        'project_id': row['id'],
+        'project_title': row['title'],
+        'progress': row['progress'],
+        'status': row['status'],
+        'start_date': row['start_date'],
+        'end_date': row['end_date'],
+        'days_remaining': max(0, remaining.days) if remaining is not None else 0
+    }
+
+
+def _stream_project_progress(rows, chunk_size=2000):
+    """كتابة JSON على دفعات دون تحميل كل المشاريع في الذاكرة"""
+    yield '{"success": true, "projects": ['
+    separator = ''
+    for row in rows.iterator(chunk_size=chunk_size):
+        data = ProjectProgressSerializer(_project_progress_row(row)).data
+        yield separator + json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+        separator = ', '
+    yield ']}'
+
 # Projects API Views
 
 class ProjectListCreateAPIView(generics.ListCreateAPIView):
@@ -203,9 +258,11 @@ class ProjectListCreateAPIView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         user = self.request.user
+        # ترتيب صريح: ترتيب Meta لا يُطبق على الاستعلامات التي تحتوي GROUP BY
+        queryset = ProjectSerializer.setup_eager_loading(Project.objects.order_by('-created_at'))
         if hasattr(user, 'profile') and user.profile.user_type == 'client':
-            return Project.objects.filter(client=user)
-        return Project.objects.all()
+            return queryset.filter(client=user)
+        return queryset
     
     def perform_create(self, serializer):
         # تسجيل إنشاء المشروع في التحليلات
@@ -225,9 +282,11 @@ class ProjectDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     
     def get_queryset(self):
         user = self.request.user
+        # ترتيب صريح: ترتيب Meta لا يُطبق على الاستعلامات التي تحتوي GROUP BY
+        queryset = ProjectSerializer.setup_eager_loading(Project.objects.order_by('-created_at'))
         if hasattr(user, 'profile') and user.profile.user_type == 'client':
-            return Project.objects.filter(client=user)
-        return Project.objects.all()
+            return queryset.filter(client=user)
+        return queryset
 
 # Tasks API Views
 
@@ -241,7 +300,7 @@ class TaskListCreateAPIView(generics.ListCreateAPIView):
         user = self.request.user
         project_id = self.request.query_params.get('project_id')
         
-        queryset = Task.objects.all()
+        queryset = TaskSerializer.setup_eager_loading(Task.objects.all())
         
         if hasattr(user, 'profile') and user.profile.user_type == 'client':
             queryset = queryset.filter(project__client=user)
@@ -263,9 +322,10 @@ class TaskDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     
     def get_queryset(self):
         user = self.request.user
+        queryset = TaskSerializer.setup_eager_loading(Task.objects.all())
         if hasattr(user, 'profile') and user.profile.user_type == 'client':
-            return Task.objects.filter(project__client=user)
-        return Task.objects.all()
+            return queryset.filter(project__client=user)
+        return queryset
     
     def perform_update(self, serializer):
         # إنشاء إشعار عند تحديث حالة المهمة
@@ -351,38 +411,22 @@ def search_api(request):
     results = []
     user = request.user
     
-    # البحث في المشاريع
-    projects = Project.objects.filter(
-        Q(title__icontains=query) | Q(description__icontains=query)
-    )
-    if hasattr(user, 'profile') and user.profile.user_type == 'client':
-        projects = projects.filter(client=user)
-    
-    for project in projects[:5]:
-        results.append({
-            'type': 'project',
-            'id': project.id,
-            'title': project.title,
-            'description': project.description[:100] + '...' if len(project.description) > 100 else project.description,
-            'url': f'/projects/{project.id}/',
-            'relevance_score': 1.0
-        })
-    
-    # البحث في المهام
-    tasks = Task.objects.filter(
-        Q(title__icontains=query) | Q(description__icontains=query)
-    )
-    if hasattr(user, 'profile') and user.profile.user_type == 'client':
-        tasks = tasks.filter(project__client=user)
+    # البحث في المشاريع والمهام والمقالات والصفحات عبر الفهرس النصي مع صلاحيات المستخدم
+    doc_types = [t for t in request.query_params.get('types', '').split(',') if t in SEARCH_SOURCES] or None
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+    except ValueError:
+        limit = 20
     
-    for task in tasks[:5]:
+    for hit in search_documents(user, query, doc_types=doc_types, limit=limit):
+        document = hit.document
         results.append({
-            'type': 'task',
-            'id': task.id,
-            'title': task.title,
-            'description': task.description[:100] + '...' if len(task.description) > 100 else task.description,
-            'url': f'/tasks/{task.id}/',
-            'relevance_score': 0.8
+            'type': document.doc_type,
+            'id': document.object_id,
+            'title': document.title,
+            'description': document.description,
+            'url': document.url,
+            'relevance_score': round(hit.score, 4)
         })
     
     # البحث في المستخدمين (للإدارة فقط)
@@ -404,9 +448,6 @@ def search_api(request):
                 'relevance_score': 0.6
             })
     
-    # ترتيب النتائج حسب الصلة
-    results.sort(key=lambda x: x['relevance_score'], reverse=True)
-    
     serializer = SearchResultSerializer(results, many=True)
     return Response({
         'success': True,
@@ -415,6 +456,32 @@ def search_api(request):
         'total_results': len(results)
     })
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def search_suggest_api(request):
+    """API اقتراحات البحث أثناء الكتابة من فهرس العناوين في الذاكرة"""
+    query = request.query_params.get('q', '').strip()
+    doc_types = [t for t in request.query_params.get('types', '').split(',') if t in SUGGEST_TYPES] or None
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 20)
+    except ValueError:
+        limit = 10
+    
+    suggestions = [
+        {
+            'type': entry.doc_type,
+            'id': entry.object_id,
+            'title': entry.title,
+            'url': entry.url
+        }
+        for entry in (suggest(request.user, query, doc_types=doc_types, limit=limit) if query else [])
+    ]
+    return Response({
+        'success': True,
+        'query': query,
+        'suggestions': suggestions
+    })
+
 # Analytics API Views
 
 @api_view(['GET'])
@@ -428,7 +495,9 @@ def task_summary_api(request):
     else:
         tasks = Task.objects.all()
     
-    total_tasks = tasks.count()
+    # استعلام واحد مجمّع حسب الحالة
+    counts = dict(tasks.order_by().values_list('status').annotate(count=Count('id')))
+    total_tasks = sum(counts.values())
     if total_tasks == 0:
         return Response({
             'success': True,
@@ -436,10 +505,8 @@ def task_summary_api(request):
         })
     
     summary = []
-    for status_choice in Task.STATUS_CHOICES:
-        status_code = status_choice[0]
-        status_name = status_choice[1]
-        count = tasks.filter(status=status_code).count()
+    for status_code, status_name in Task.STATUS_CHOICES:
+        count = counts.get(status_code, 0)
         percentage = (count / total_tasks) * 100
         
         summary.append({
@@ -464,35 +531,57 @@ def user_activity_api(request):
             'message': 'غير مصرح لك بالوصول لهذه البيانات'
         }, status=status.HTTP_403_FORBIDDEN)
     
-    users = User.objects.filter(is_active=True)
-    activity_data = []
-    
-    for user in users:
-        tasks_assigned = Task.objects.filter(assigned_to=user).count()
-        tasks_completed = Task.objects.filter(assigned_to=user, status='done').count()
-        projects_involved = Project.objects.filter(
-            Q(client=user) | Q(manager=user) | Q(team_members=user)
-        ).distinct().count()
-        
-        activity_data.append({
-            'user_id': user.id,
-            'username': user.username,
-            'full_name': user.get_full_name() or user.username,
-            'last_login': user.last_login,
-            'tasks_assigned': tasks_assigned,
-            'tasks_completed': tasks_completed,
-            'projects_involved': projects_involved
-        })
-    
-    # ترتيب حسب آخر تسجيل دخول
-    activity_data.sort(key=lambda x: x['last_login'] or timezone.now() - timedelta(days=365), reverse=True)
+    # مشاريع المستخدم كعميل أو مدير أو عضو فريق (بدون تكرار المشروع)
+    projects_involved = Project.objects.filter(
+        Q(client=OuterRef('pk')) | Q(manager=OuterRef('pk')) | Q(team_members=OuterRef('pk'))
+    ).order_by().values(group=Value(1)).annotate(
+        count=Count('pk', distinct=True)
+    ).values('count')
+    
+    # استعلام واحد لكل الصفحة مرتب حسب آخر تسجيل دخول
+    users = User.objects.filter(is_active=True).annotate(
+        tasks_assigned=Count('assigned_tasks', distinct=True),
+        tasks_completed=Count('assigned_tasks', filter=Q(assigned_tasks__status='done'), distinct=True),
+        projects_involved=Coalesce(Subquery(projects_involved, output_field=IntegerField()), 0)
+    ).order_by(F('last_login').desc(nulls_last=True), 'id')
+    
+    paginator = StandardResultsSetPagination()
+    page = paginator.paginate_queryset(users, request)
+    
+    activity_data = [{
+        'user_id': user.id,
+        'username': user.username,
+        'full_name': user.get_full_name() or user.username,
+        'last_login': user.last_login,
+        'tasks_assigned': user.tasks_assigned,
+        'tasks_completed': user.tasks_completed,
+        'projects_involved': user.projects_involved
+    } for user in page]
     
     serializer = UserActivitySerializer(activity_data, many=True)
     return Response({
         'success': True,
+        'count': paginator.page.paginator.count,
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
         'activity': serializer.data
     })
 
+# Monitoring API
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def runtime_metrics_api(request):
+    """عدادات الذاكرات المؤقتة والضغط وإعادة كتابة CDN في هذه العملية (للمدراء فقط)"""
+    return Response({
+        'user_agent_cache': user_agent_cache_stats(),
+        'geoip_cache': geoip_cache_stats(),
+        'response_cache': response_cache_stats(),
+        'etag_cache': etag_cache_stats(),
+        'compression': compression_stats(),
+        'cdn_rewrite': cdn_rewrite_stats(),
+    })
+
 # Form Submissions API
 
 @api_view(['POST'])
@@ -0,0 +1,24 @@
+"""
+فحوص النظام الخاصة بـ cms (python manage.py check --deploy)
+"""
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .utils.shared_cache import is_shared_cache
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """الذاكرة المؤقتة الافتراضية يجب أن تكون مشتركة بين العمليات في الإنتاج"""
+    if is_shared_cache('default') or getattr(settings, 'ALLOW_PROCESS_LOCAL_CACHE', False):
+        return []
+    return [
+        Warning(
+            'The default cache is process-local, so the response cache and the unified platform report cache '
+            'are disabled (their invalidation would only reach the worker that handled the change), and search '
+            'suggestions from other workers only appear after the periodic background rebuild.',
+            hint='Set REDIS_URL to use a shared Redis cache.',
+            id='cms.W001',
+        )
+    ]
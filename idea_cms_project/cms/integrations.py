@@ -6,11 +6,14 @@ Meta Business API و X (Twitter) API
 import requests
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 from django.conf import settings
 from django.core.cache import cache
-from .models import IntegrationSettings, PlatformReport, AdCampaign
+from .models import IntegrationSettings, PlatformReport, AdCampaign, CampaignDailyReport
+from .utils.platform_metrics import invalidate_platform_metrics, unified_report_data
+from .utils.graph_api import GraphAPIClient
 logger = logging.getLogger(__name__)
 
 
@@ -18,11 +21,16 @@ class MetaBusinessIntegration:
     """
     خدمة التكامل مع Meta Business API
     لإدارة الحملات الإعلانية وجلب التقارير
+
+    الطلبات عبر GraphAPIClient: جلسة مشتركة باتصالات keep-alive مع احترام ترويسات حدود الاستخدام
+    إحصائيات الحملات في المزامنة تُجلب على مستوى الحساب (level=campaign) وتُوزّع على الحملات،
+    وإن فشل ذلك فبطلبات batch (حتى 50 حملة في الطلب)
     """
     
     def __init__(self):
-        self.base_url = "https://graph.facebook.com/v18.0"
         self.settings = self._get_settings()
+        self.client = GraphAPIClient(self.settings.get('access_token'))
+        self.base_url = self.client.base_url
     
     def _get_settings(self) -> Dict[str, str]:
         """جلب إعدادات Meta Business من قاعدة البيانات"""
@@ -46,13 +54,7 @@ class MetaBusinessIntegration:
             }
         
         try:
-            url = f"{self.base_url}/me"
-            params = {
-                'access_token': self.settings['access_token'],
-                'fields': 'id,name'
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
+            response = self.client.get('me', {'fields': 'id,name'}, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -76,76 +78,53 @@ class MetaBusinessIntegration:
             }
     
     def get_ad_accounts(self) -> List[Dict[str, Any]]:
-        """جلب قائمة حسابات الإعلانات"""
+        """جلب قائمة حسابات الإعلانات (كل الصفحات)"""
         if not self.settings.get('access_token'):
             return []
         
         try:
-            url = f"{self.base_url}/me/adaccounts"
-            params = {
-                'access_token': self.settings['access_token'],
-                'fields': 'id,name,account_status,currency,timezone_name'
-            }
-            
-            response = requests.get(url, params=params, timeout=15)
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('data', [])
-            else:
-                logger.error(f"Failed to get ad accounts: {response.status_code}")
-                return []
-                
+            return self.client.get_all('me/adaccounts', {'fields': 'id,name,account_status,currency,timezone_name'})
         except requests.RequestException as e:
             logger.error(f"Error getting ad accounts: {e}")
             return []
     
     def get_campaigns(self, ad_account_id: str) -> List[Dict[str, Any]]:
-        """جلب قائمة الحملات الإعلانية"""
+        """جلب قائمة الحملات الإعلانية (كل الصفحات)"""
         if not self.settings.get('access_token'):
             return []
         
         try:
-            url = f"{self.base_url}/{ad_account_id}/campaigns"
-            params = {
-                'access_token': self.settings['access_token'],
-                'fields': 'id,name,status,objective,created_time,updated_time'
-            }
-            
-            response = requests.get(url, params=params, timeout=15)
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('data', [])
-            else:
-                logger.error(f"Failed to get campaigns: {response.status_code}")
-                return []
-                
+            return self.client.get_all(
+                f'{ad_account_id}/campaigns', {'fields': 'id,name,status,objective,created_time,updated_time'}
+            )
         except requests.RequestException as e:
             logger.error(f"Error getting campaigns: {e}")
             return []
     
+    def _insights_params(self, date_range: int, level: Optional[str] = None) -> Dict[str, str]:
+        # تحديد نطاق التاريخ
+        end_date = datetime.now().date()
+        start_date = end_date - timedelta(days=date_range)
+        params = {
+            'fields': 'impressions,clicks,spend,reach,frequency,ctr,cpc,cpm,cpp',
+            'time_range': json.dumps({
+                'since': start_date.strftime('%Y-%m-%d'),
+                'until': end_date.strftime('%Y-%m-%d')
+            })
+        }
+        if level:
+            # صف لكل حملة؛ campaign_id لتوزيع الصفوف
+            params['level'] = level
+            params['fields'] += ',campaign_id'
+        return params
+    
     def get_campaign_insights(self, campaign_id: str, date_range: int = 7) -> Dict[str, Any]:
         """جلب إحصائيات الحملة الإعلانية"""
         if not self.settings.get('access_token'):
             return {}
         
         try:
-            # تحديد نطاق التاريخ
-            end_date = datetime.now().date()
-            start_date = end_date - timedelta(days=date_range)
-            
-            url = f"{self.base_url}/{campaign_id}/insights"
-            params = {
-                'access_token': self.settings['access_token'],
-                'fields': 'impressions,clicks,spend,reach,frequency,ctr,cpc,cpm,cpp',
-                'time_range': json.dumps({
-                    'since': start_date.strftime('%Y-%m-%d'),
-                    'until': end_date.strftime('%Y-%m-%d')
-                })
-            }
-            
-            response = requests.get(url, params=params, timeout=15)
+            response = self.client.get(f'{campaign_id}/insights', self._insights_params(date_range))
             
             if response.status_code == 200:
                 data = response.json()
@@ -161,22 +140,61 @@ class MetaBusinessIntegration:
             logger.error(f"Error getting campaign insights: {e}")
             return {}
     
+    def get_campaigns_insights(self, campaign_ids: List[str], date_range: int = 7) -> Dict[str, Dict[str, Any]]:
+        """
+        إحصائيات عدة حملات بطلبات batch (طلب HTTP لكل 50 حملة)
+        يعيد {معرف الحملة: الإحصائيات}؛ الحملات التي فشل طلبها الفرعي أو بلا بيانات لا تظهر في النتيجة
+        """
+        if not self.settings.get('access_token') or not campaign_ids:
+            return {}
+        
+        params = self._insights_params(date_range)
+        results = self.client.batch({
+            campaign_id: (f'{campaign_id}/insights', params) for campaign_id in campaign_ids
+        })
+        
+        insights = {}
+        for campaign_id, result in results.items():
+            if isinstance(result, Exception):
+                logger.error(f"Error getting insights for campaign {campaign_id}: {result}")
+            elif result.get('data'):
+                insights[campaign_id] = result['data'][0]
+        return insights
+    
+    def get_account_insights(self, ad_account_id: str, date_range: int = 7) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        إحصائيات كل حملات الحساب في طلب واحد (level=campaign) موزعة حسب الحملة
+        يعيد None عند الفشل (ليُستخدم batch بدلاً منه)، والحملات بلا بيانات لا تظهر في النتيجة
+        """
+        if not self.settings.get('access_token'):
+            return None
+        
+        try:
+            rows = self.client.get_all(f'{ad_account_id}/insights', self._insights_params(date_range, level='campaign'))
+        except requests.RequestException as e:
+            logger.error(f"Error getting account insights for {ad_account_id}: {e}")
+            return None
+        return {row['campaign_id']: row for row in rows if row.get('campaign_id')}
+    
+    def _account_sync_data(self, ad_account_id: str):
+        """(حملات الحساب، إحصائياتها أو None عند الفشل)"""
+        campaigns = self.get_campaigns(ad_account_id)
+        return campaigns, self.get_account_insights(ad_account_id) if campaigns else {}
+    
     def create_campaign(self, ad_account_id: str, campaign_data: Dict[str, Any]) -> Dict[str, Any]:
         """إنشاء حملة إعلانية جديدة"""
         if not self.settings.get('access_token'):
             return {'success': False, 'error': 'Access token not configured'}
         
         try:
-            url = f"{self.base_url}/{ad_account_id}/campaigns"
             data = {
-                'access_token': self.settings['access_token'],
                 'name': campaign_data.get('name'),
                 'objective': campaign_data.get('objective', 'TRAFFIC'),
                 'status': campaign_data.get('status', 'PAUSED'),
                 'special_ad_categories': campaign_data.get('special_ad_categories', [])
             }
             
-            response = requests.post(url, data=data, timeout=15)
+            response = self.client.post(f'{ad_account_id}/campaigns', data)
             
             if response.status_code == 200:
                 result = response.json()
@@ -200,18 +218,32 @@ class MetaBusinessIntegration:
             }
     
     def sync_campaigns_data(self) -> Dict[str, Any]:
-        """مزامنة بيانات الحملات مع قاعدة البيانات"""
+        """
+        مزامنة بيانات الحملات مع قاعدة البيانات
+        حملات كل حساب وإحصائياته (طلب واحد على مستوى الحساب) تُجلب بالتوازي، وحملات الحسابات التي
+        فشلت إحصائياتها تُجلب بطلبات batch؛ الكتابة في قاعدة البيانات من الخيط الحالي
+        """
         try:
-            ad_accounts = self.get_ad_accounts()
+            account_ids = [account['id'] for account in self.get_ad_accounts()]
+            with ThreadPoolExecutor(max_workers=max(1, min(len(account_ids), 4))) as executor:
+                account_data = list(zip(account_ids, executor.map(self._account_sync_data, account_ids)))
+            
+            account_campaigns = [(account_id, campaigns) for account_id, (campaigns, _) in account_data]
+            all_insights = {}
+            fallback_ids = []
+            for account_id, (campaigns, insights) in account_data:
+                if insights is None:
+                    fallback_ids.extend(campaign['id'] for campaign in campaigns)
+                else:
+                    all_insights.update(insights)
+            all_insights.update(self.get_campaigns_insights(fallback_ids))
             synced_campaigns = 0
+            synced_insights = 0
             
-            for account in ad_accounts:
-                account_id = account['id']
-                campaigns = self.get_campaigns(account_id)
-                
+            for account_id, campaigns in account_campaigns:
                 for campaign in campaigns:
                     # حفظ أو تحديث الحملة في قاعدة البيانات
-                    campaign_obj, created = AdCampaigns.objects.update_or_create(
+                    campaign_obj, created = AdCampaign.objects.update_or_create(
                         platform='meta_business',
                         external_id=campaign['id'],
                         defaults={
@@ -226,11 +258,10 @@ class MetaBusinessIntegration:
                         }
                     )
                     
-                    # جلب الإحصائيات
-                    insights = self.get_campaign_insights(campaign['id'])
+                    insights = all_insights.get(campaign['id'])
                     if insights:
                         # حفظ التقرير
-                        PlatformReports.objects.update_or_create(
+                        CampaignDailyReport.objects.update_or_create(
                             platform='meta_business',
                             campaign_id=campaign['id'],
                             report_date=datetime.now().date(),
@@ -245,12 +276,17 @@ class MetaBusinessIntegration:
                                 'data': insights
                             }
                         )
+                        synced_insights += 1
                     
                     synced_campaigns += 1
             
+            if synced_campaigns:
+                invalidate_platform_metrics()
+            
             return {
                 'success': True,
                 'synced_campaigns': synced_campaigns,
+                'synced_insights': synced_insights,
                 'message': f"Synced {synced_campaigns} campaigns successfully"
             }
             
@@ -458,7 +494,7 @@ class XTwitterIntegration:
             
             for tweet in tweets:
                 # حفظ التغريدة كحملة محتوى
-                campaign_obj, created = AdCampaigns.objects.update_or_create(
+                campaign_obj, created = AdCampaign.objects.update_or_create(
                     platform='x_twitter',
                     external_id=tweet['id'],
                     defaults={
@@ -476,7 +512,7 @@ class XTwitterIntegration:
                 analytics = self.get_tweet_analytics(tweet['id'])
                 if analytics:
                     # حفظ التقرير
-                    PlatformReports.objects.update_or_create(
+                    CampaignDailyReport.objects.update_or_create(
                         platform='x_twitter',
                         campaign_id=tweet['id'],
                         report_date=datetime.now().date(),
@@ -491,6 +527,9 @@ class XTwitterIntegration:
                 
                 synced_tweets += 1
             
+            if synced_tweets:
+                invalidate_platform_metrics()
+            
             return {
                 'success': True,
                 'synced_content': synced_tweets,
@@ -539,65 +578,14 @@ class IntegrationManager:
         
         return results
     
-    def get_unified_report(self, date_range: int = 7) -> Dict[str, Any]:
+    def get_unified_report(self, date_range: int = 7, include_series: bool = False) -> Dict[str, Any]:
         """إنشاء تقرير موحد من جميع المنصات"""
         try:
             end_date = datetime.now().date()
             start_date = end_date - timedelta(days=date_range)
             
-            # جلب تقارير من جميع المنصات
-            reports = PlatformReports.objects.filter(
-                report_date__gte=start_date,
-                report_date__lte=end_date
-            )
-            
-            # تجميع البيانات
-            unified_data = {
-                'total_impressions': 0,
-                'total_clicks': 0,
-                'total_spend': 0,
-                'total_reach': 0,
-                'platforms': {},
-                'date_range': {
-                    'start': start_date.isoformat(),
-                    'end': end_date.isoformat()
-                }
-            }
-            
-            for report in reports:
-                platform = report.platform
-                
-                if platform not in unified_data['platforms']:
-                    unified_data['platforms'][platform] = {
-                        'impressions': 0,
-                        'clicks': 0,
-                        'spend': 0,
-                        'reach': 0,
-                        'campaigns': 0
-                    }
-                
-                # تجميع البيانات
-                unified_data['total_impressions'] += report.impressions or 0
-                unified_data['total_clicks'] += report.clicks or 0
-                unified_data['total_spend'] += report.spend or 0
-                unified_data['total_reach'] += report.reach or 0
-                
-                unified_data['platforms'][platform]['impressions'] += report.impressions or 0
-                unified_data['platforms'][platform]['clicks'] += report.clicks or 0
-                unified_data['platforms'][platform]['spend'] += report.spend or 0
-                unified_data['platforms'][platform]['reach'] += report.reach or 0
-                unified_data['platforms'][platform]['campaigns'] += 1
-            
-            # حساب المعدلات
-            if unified_data['total_impressions'] > 0:
-                unified_data['overall_ctr'] = (unified_data['total_clicks'] / unified_data['total_impressions']) * 100
-            else:
-                unified_data['overall_ctr'] = 0
-            
-            if unified_data['total_clicks'] > 0:
-                unified_data['overall_cpc'] = unified_data['total_spend'] / unified_data['total_clicks']
-            else:
-                unified_data['overall_cpc'] = 0
+            # التجميع في قاعدة البيانات (استعلام GROUP BY واحد، وآخر للسلسلة اليومية عند طلبها)
+            unified_data = unified_report_data(start_date, end_date, include_series=include_series)
             
             return {
                 'success': True,
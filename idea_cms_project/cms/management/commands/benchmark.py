@@ -0,0 +1,775 @@
+"""
+Django management command لقياس أداء المسارات الساخنة في النظام
+مثال: python manage.py benchmark user_agents --iterations 200000
+"""
+
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+# مفردات لتوليد عناوين المشاريع والمهام والمقالات في قياس الاقتراحات
+TITLE_VOCABULARY = [
+    'حملة', 'التسويق', 'الرقمي', 'تصميم', 'موقع', 'إلكتروني', 'هوية', 'بصرية', 'إعلانات', 'سناب',
+    'تطوير', 'تطبيق', 'جوال', 'محتوى', 'مقالات', 'تحسين', 'محركات', 'البحث', 'متجر', 'خطة',
+    'إطلاق', 'منتج', 'جديد', 'تقرير', 'الأداء', 'الشهري', 'فيديو', 'تعريفي', 'عميل', 'مراجعة',
+    'campaign', 'website', 'redesign', 'launch', 'seo', 'landing', 'page', 'brand', 'social', 'ads',
+]
+
+# عينة من User Agents حقيقية مأخوذة من سجلات الزيارات
+USER_AGENT_CORPUS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) CriOS/120.0.6099.119 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (iPad; CPU OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.6099.144 Mobile Safari/537.36',
+    'Mozilla/5.0 (Linux; Android 13; SAMSUNG SM-A546E) AppleWebKit/537.36 (KHTML, like Gecko) SamsungBrowser/23.0 Chrome/115.0.0.0 Mobile Safari/537.36',
+    'Mozilla/5.0 (Linux; Android 13; SM-X710) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.6099.144 Safari/537.36',
+    'Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36 OPR/79.1.4195.76558',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (X11; CrOS x86_64 14541.0.0) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+    'Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)',
+    'facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)',
+    'Mozilla/5.0 (Windows NT 6.1; Win64; x64; Trident/7.0; rv:11.0) like Gecko',
+    'Mozilla/5.0 (Linux; Android 12; M2101K6G) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Mobile Safari/537.36',
+]
+
+
+def _legacy_parse_user_agent(user_agent):
+    """التطبيق السابق في VisitorTrackingMiddleware (للمقارنة فقط)"""
+    user_agent_lower = user_agent.lower()
+
+    device_type = 'desktop'
+    if any(mobile in user_agent_lower for mobile in ['mobile', 'android', 'iphone']):
+        device_type = 'mobile'
+    elif any(tablet in user_agent_lower for tablet in ['tablet', 'ipad']):
+        device_type = 'tablet'
+
+    browser = 'غير محدد'
+    if 'chrome' in user_agent_lower and 'edg' not in user_agent_lower:
+        browser = 'Chrome'
+    elif 'firefox' in user_agent_lower:
+        browser = 'Firefox'
+    elif 'safari' in user_agent_lower and 'chrome' not in user_agent_lower:
+        browser = 'Safari'
+    elif 'edg' in user_agent_lower:
+        browser = 'Edge'
+    elif 'opera' in user_agent_lower:
+        browser = 'Opera'
+
+    operating_system = 'غير محدد'
+    if 'windows' in user_agent_lower:
+        operating_system = 'Windows'
+    elif 'mac' in user_agent_lower and 'iphone' not in user_agent_lower and 'ipad' not in user_agent_lower:
+        operating_system = 'macOS'
+    elif 'linux' in user_agent_lower and 'android' not in user_agent_lower:
+        operating_system = 'Linux'
+    elif 'android' in user_agent_lower:
+        operating_system = 'Android'
+    elif 'iphone' in user_agent_lower or 'ipad' in user_agent_lower:
+        operating_system = 'iOS'
+
+    return {'device_type': device_type, 'browser': browser, 'operating_system': operating_system}
+
+
+def _legacy_extract_page_title(response):
+    """التطبيق السابق في VisitorTrackingMiddleware (للمقارنة فقط)"""
+    try:
+        if hasattr(response, 'content') and response.get('Content-Type', '').startswith('text/html'):
+            content = response.content.decode('utf-8', errors='ignore')
+            import re
+            title_match = re.search(r'<title[^>]*>(.*?)</title>', content, re.IGNORECASE | re.DOTALL)
+            if title_match:
+                return title_match.group(1).strip()
+    except:
+        pass
+    return 'صفحة غير محددة'
+
+
+def _legacy_cdn_rewrite(content, cdn_config):
+    """التطبيق السابق في CDNMiddleware._process_response (للمقارنة فقط)"""
+    import re
+    static_patterns = [
+        r'(/static/[^"\'>\s]+\.(?:css|js|png|jpg|jpeg|gif|webp|svg|woff|woff2|ttf|eot|ico|pdf|mp4|webm))',
+        r'(/media/[^"\'>\s]+\.(?:png|jpg|jpeg|gif|webp|svg|pdf|mp4|webm))',
+    ]
+
+    def replace(match):
+        original_url = match.group(1)
+        if cdn_config.should_use_cdn(original_url):
+            return cdn_config.get_cdn_url(original_url)
+        return original_url
+
+    text = content.decode('utf-8')
+    for pattern in static_patterns:
+        text = re.sub(pattern, replace, text)
+    return text.encode('utf-8')
+
+
+def _legacy_visit_analytics(queryset):
+    """التطبيق السابق في VisitorTrackingViewSet.analytics (للمقارنة فقط)"""
+    from django.db.models import Avg, Count
+
+    return {
+        'total_visitors': queryset.values('session_key').distinct().count(),
+        'total_page_views': queryset.count(),
+        'bounce_visits': queryset.filter(is_bounce=True).count(),
+        'avg_duration': queryset.aggregate(avg_duration=Avg('visit_duration'))['avg_duration'] or 0,
+        'top_pages': list(queryset.values('page_url', 'page_title').annotate(views=Count('id')).order_by('-views')[:10]),
+        'top_referrers': list(queryset.exclude(referrer='').values('referrer')
+                              .annotate(visits=Count('id')).order_by('-visits')[:10]),
+        'device_breakdown': dict(queryset.values('device_type').annotate(count=Count('id'))
+                                 .values_list('device_type', 'count')),
+        'browser_breakdown': dict(queryset.values('browser').annotate(count=Count('id'))
+                                  .values_list('browser', 'count')),
+        'country_breakdown': dict(queryset.values('country').annotate(count=Count('id'))
+                                  .values_list('country', 'count')),
+    }
+
+
+def _legacy_unified_report(queryset):
+    """التطبيق السابق في IntegrationManager.get_unified_report (للمقارنة فقط)"""
+    totals = {'impressions': 0, 'clicks': 0, 'spend': 0, 'reach': 0}
+    platforms = {}
+    for report in queryset:
+        platform = platforms.setdefault(
+            report.platform, {'impressions': 0, 'clicks': 0, 'spend': 0, 'reach': 0, 'campaigns': 0}
+        )
+        for field in totals:
+            value = getattr(report, field) or 0
+            totals[field] += value
+            platform[field] += value
+        platform['campaigns'] += 1
+    return {'totals': totals, 'platforms': platforms}
+
+
+class Command(BaseCommand):
+    help = 'Run micro-benchmarks for hot code paths'
+
+    suites = ['user_agents', 'geoip', 'page_title', 'analytics', 'hll', 'unified_report', 'suggest', 'compression', 'cdn',
+              'meta_sync']
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=self.suites, help='Benchmark suite to run')
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=100000,
+            help='Number of iterations per measurement (default: 100000)'
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for synthetic data')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        handler = getattr(self, f"bench_{options['suite']}", None)
+        if handler is None:
+            raise CommandError(f"Unknown suite: {options['suite']}")
+        handler(options['iterations'])
+
+    def report(self, label, elapsed, iterations):
+        """طباعة نتيجة قياس واحد"""
+        per_op = elapsed / iterations * 1e6 if iterations else 0
+        self.stdout.write(f'{label:<40} {elapsed * 1000:>10.1f} ms  {per_op:>8.3f} µs/op')
+
+    def timed(self, label, func, iterations):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        self.report(label, elapsed, iterations)
+        return elapsed
+
+    def bench_user_agents(self, iterations):
+        """مقارنة التحليل السابق مع المصنف المشترك (بدون/مع ذاكرة LRU)"""
+        from cms.utils.user_agents import classify_user_agent, clear_user_agent_cache, user_agent_cache_stats
+
+        # توزيع Zipf تقريبي: عدد قليل من الـ User Agents يشكل معظم الزيارات
+        weights = [1.0 / (rank + 1) for rank in range(len(USER_AGENT_CORPUS))]
+        workload = random.choices(USER_AGENT_CORPUS, weights=weights, k=iterations)
+
+        def legacy():
+            for ua in workload:
+                _legacy_parse_user_agent(ua)
+
+        def uncached():
+            for ua in workload:
+                classify_user_agent.__wrapped__(ua)
+
+        def cached():
+            for ua in workload:
+                classify_user_agent(ua)
+
+        self.stdout.write(f'User agent classification ({iterations} lookups, {len(USER_AGENT_CORPUS)} distinct)')
+        base = self.timed('legacy substring scans', legacy, iterations)
+        self.timed('precompiled matcher (no cache)', uncached, iterations)
+        clear_user_agent_cache()
+        elapsed = self.timed('precompiled matcher + LRU', cached, iterations)
+        self.stdout.write(f'speedup vs legacy: {base / elapsed:.1f}x  cache: {user_agent_cache_stats()}')
+
+    def bench_geoip(self, iterations):
+        """البحث في قاعدة نطاقات IP عبر mmap (بدون/مع ذاكرة LRU لكل عنوان)"""
+        from cms.utils.geoip import MmapGeoIPResolver, write_database
+
+        # قاعدة اصطناعية بحجم قريب من قواعد المدن الحقيقية (~500 ألف نطاق)
+        range_count = 500000
+        step = 0xFFFFFFFF // range_count
+        countries = [f'Country {i}' for i in range(200)]
+        ranges = [
+            (i * step, i * step + step - 1, countries[i % 200], f'City {i % 5000}')
+            for i in range(range_count)
+        ]
+
+        # عناوين الزوار متكررة: 5% من العناوين تشكل معظم الطلبات
+        distinct = [f'{random.randint(1, 223)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}'
+                    for _ in range(max(iterations // 20, 1))]
+        weights = [1.0 / (rank + 1) for rank in range(len(distinct))]
+        workload = random.choices(distinct, weights=weights, k=iterations)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'ip-ranges.bin')
+            start = time.perf_counter()
+            write_database(path, ranges)
+            self.stdout.write(f'built {range_count} ranges in {(time.perf_counter() - start) * 1000:.0f} ms '
+                              f'({os.path.getsize(path) / 1024 / 1024:.1f} MB)')
+
+            start = time.perf_counter()
+            resolver = MmapGeoIPResolver(path)
+            self.stdout.write(f'opened via mmap in {(time.perf_counter() - start) * 1000:.2f} ms')
+
+            cache = {}
+
+            def uncached():
+                for ip in workload:
+                    resolver.lookup(ip)
+
+            def cached():
+                # نفس سلوك resolve_location: ذاكرة لكل عنوان أمام المحلل
+                for ip in workload:
+                    if ip not in cache:
+                        cache[ip] = resolver.lookup(ip)
+
+            self.stdout.write(f'GeoIP lookups ({iterations} lookups, {len(distinct)} distinct IPs)')
+            base = self.timed('mmap binary search', uncached, iterations)
+            elapsed = self.timed('mmap binary search + per-IP cache', cached, iterations)
+            self.stdout.write(f'speedup from cache: {base / elapsed:.1f}x')
+            del resolver
+
+    def bench_page_title(self, iterations):
+        """استخراج عنوان الصفحة من استجابة HTML بحجم 500KB"""
+        from django.http import HttpResponse
+        from cms.middleware import VisitorTrackingMiddleware
+
+        iterations = min(iterations, 2000)
+        row = '<tr><td>مشروع</td><td>وصف طويل للمحتوى في الجدول</td><td>2024-01-01</td></tr>\n'
+        body = row * (500 * 1024 // len(row.encode('utf-8')))
+        page = f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>لوحة التحكم | Idea</title></head><body><table>{body}</table></body></html>'
+        response = HttpResponse(page, content_type='text/html; charset=utf-8')
+        tagged = HttpResponse(page, content_type='text/html; charset=utf-8')
+        tagged.page_title = 'لوحة التحكم | Idea'
+        # أسوأ حالة: صفحة بدون عنوان يتم فحصها بالكامل في التطبيق السابق
+        untitled = HttpResponse(page.replace('<title>', '<meta>').replace('</title>', '</meta>'),
+                                content_type='text/html; charset=utf-8')
+
+        middleware = VisitorTrackingMiddleware(lambda request: response)
+        assert middleware._extract_page_title(response) == _legacy_extract_page_title(response)
+
+        def run(func, target):
+            def loop():
+                for _ in range(iterations):
+                    func(target)
+            return loop
+
+        self.stdout.write(f'Page title extraction ({iterations} responses, {len(response.content) // 1024} KB)')
+        base = self.timed('legacy full decode + regex', run(_legacy_extract_page_title, response), iterations)
+        elapsed = self.timed('bytes regex on bounded prefix', run(middleware._extract_page_title, response), iterations)
+        self.timed('response.page_title attribute', run(middleware._extract_page_title, tagged), iterations)
+        self.timed('legacy, page without title', run(_legacy_extract_page_title, untitled), iterations)
+        self.timed('bounded prefix, page without title', run(middleware._extract_page_title, untitled), iterations)
+        self.stdout.write(f'speedup vs legacy: {base / elapsed:.1f}x')
+
+    def seed_visits(self, count):
+        """إنشاء زيارات اصطناعية (يتم استدعاؤها داخل transaction يتم التراجع عنها)"""
+        from cms.models import VisitorTracking
+
+        pages = [f'https://ideateeam.com/page/{i}' for i in range(500)]
+        referrers = [''] * 5 + [f'https://ref{i}.example.com/' for i in range(50)]
+        devices = ['desktop', 'mobile', 'tablet']
+        browsers = ['Chrome', 'Safari', 'Firefox', 'Edge', 'Samsung Internet']
+        countries = ['السعودية', 'مصر', 'الإمارات', 'الكويت', 'الأردن', 'غير محدد']
+        weights = [1.0 / (rank + 1) for rank in range(len(pages))]
+
+        batch = []
+        for i in range(count):
+            page = random.choices(pages, weights=weights)[0]
+            batch.append(VisitorTracking(
+                session_key=f'session-{random.randint(0, count // 3)}',
+                ip_address='10.0.0.1',
+                user_agent='bench',
+                referrer=random.choice(referrers),
+                page_url=page,
+                page_title=page.rsplit('/', 1)[-1],
+                visit_duration=random.randint(0, 120000),
+                is_bounce=random.random() < 0.4,
+                device_type=random.choice(devices),
+                browser=random.choice(browsers),
+                country=random.choice(countries),
+            ))
+            if len(batch) >= 5000:
+                VisitorTracking.objects.bulk_create(batch)
+                batch = []
+        VisitorTracking.objects.bulk_create(batch)
+
+    def bench_analytics(self, iterations):
+        """تحليلات الزوار: الاستعلامات المنفصلة السابقة مقابل محرك التجميع"""
+        from django.db import connection, transaction
+        from django.test.utils import CaptureQueriesContext
+        from cms.models import VisitorTracking
+        from cms.utils.analytics import visit_analytics
+
+        rows = min(iterations, 1000000)
+        with transaction.atomic():
+            self.seed_visits(rows)
+            queryset = VisitorTracking.objects.all()
+
+            with CaptureQueriesContext(connection) as legacy_queries:
+                base = self.timed('legacy: one query per metric', lambda: _legacy_visit_analytics(queryset), rows)
+            with CaptureQueriesContext(connection) as new_queries:
+                elapsed = self.timed(
+                    f'aggregation engine ({connection.vendor})', lambda: visit_analytics(queryset), rows
+                )
+
+            legacy, current = _legacy_visit_analytics(queryset), visit_analytics(queryset)
+            for key in ('total_visitors', 'total_page_views', 'device_breakdown', 'browser_breakdown', 'country_breakdown'):
+                assert legacy[key] == current[key], key
+            assert [page['views'] for page in legacy['top_pages']] == [page['views'] for page in current['top_pages']]
+
+            self.stdout.write(f'{rows} visits: {len(legacy_queries)} queries -> {len(new_queries)} queries, '
+                              f'speedup {base / elapsed:.1f}x')
+            transaction.set_rollback(True)
+
+    def bench_hll(self, iterations):
+        """دقة وسرعة HyperLogLog مقارنة بالعد الدقيق (iterations = عدد الزيارات الاصطناعية)"""
+        from datetime import timedelta
+        from django.db import transaction
+        from django.utils import timezone
+        from cms.models import VisitorTracking
+        from cms.utils.hyperloglog import HyperLogLog
+        from cms.utils import rollups
+
+        # الدقة: عدد فريد معروف مقابل التقدير
+        self.stdout.write('HyperLogLog accuracy (precision 14, expected standard error 0.81%)')
+        cardinality = 1000
+        while cardinality <= max(iterations, 1000):
+            sketch = HyperLogLog()
+            start = time.perf_counter()
+            sketch.update(f'session-{i}' for i in range(cardinality))
+            elapsed = time.perf_counter() - start
+            estimate = sketch.count()
+            error = (estimate - cardinality) / cardinality * 100
+            self.stdout.write(f'{cardinality:>10} distinct -> {estimate:>10}  error {error:+6.2f}%  '
+                              f'add {elapsed / cardinality * 1e6:.2f} µs/value  size {len(sketch.to_bytes())} B')
+            cardinality *= 10
+
+        # الدمج: 30 يوماً متداخلة (زوار عائدون) مقابل اتحاد المجموعات الدقيق
+        daily = max(iterations // 30, 100)
+        union, sketches = set(), []
+        for day in range(30):
+            values = [f'session-{random.randint(0, daily * 10)}' for _ in range(daily)]
+            union.update(values)
+            sketch = HyperLogLog()
+            sketch.update(values)
+            sketches.append(sketch.to_bytes())
+        start = time.perf_counter()
+        estimate = HyperLogLog.merged(sketches).count()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'merge 30 daily sketches: exact {len(union)} -> {estimate} '
+                          f'(error {(estimate - len(union)) / len(union) * 100:+.2f}%) in {elapsed * 1000:.1f} ms')
+
+        # السرعة: COUNT DISTINCT على السجلات الخام مقابل دمج الرسوم اليومية المخزنة
+        rows = min(iterations, 5000000)
+        with transaction.atomic():
+            self.seed_visits(rows)
+            today = timezone.localdate()
+            first_id = VisitorTracking.objects.order_by('id').values_list('id', flat=True).first()
+            per_day = rows // 30 + 1
+            for day in range(30):
+                visited_at = timezone.now() - timedelta(days=day + 1)
+                VisitorTracking.objects.filter(
+                    id__gte=first_id + day * per_day, id__lt=first_id + (day + 1) * per_day
+                ).update(visited_at=visited_at)
+
+            start = time.perf_counter()
+            rollups.run_rollups(since=today - timedelta(days=31), until=today - timedelta(days=1))
+            self.stdout.write(f'rollup of 30 days with sketches: {(time.perf_counter() - start) * 1000:.0f} ms')
+
+            date_from, date_to = today - timedelta(days=31), today - timedelta(days=1)
+            exact, approx = {}, {}
+            base = self.timed(
+                f'exact COUNT DISTINCT ({rows} rows)',
+                lambda: exact.update(value=rollups._exact_unique_count('session_key', date_from, date_to)), rows
+            )
+            elapsed = self.timed(
+                'merge 30 stored sketches',
+                lambda: approx.update(value=rollups._approx_unique_count('session_key', (date_from, date_to), None)),
+                rows
+            )
+            error = (approx['value'] - exact['value']) / exact['value'] * 100
+            self.stdout.write(f'exact {exact["value"]} approx {approx["value"]} error {error:+.2f}%  '
+                              f'speedup {base / elapsed:.1f}x')
+            transaction.set_rollback(True)
+
+    def bench_unified_report(self, iterations):
+        """التقرير الموحد: المرور على كل الصفوف في Python مقابل GROUP BY في قاعدة البيانات (iterations = عدد الصفوف)"""
+        from datetime import timedelta
+        from django.db import connection, transaction
+        from django.utils import timezone
+        from cms.models import CampaignDailyReport
+        from cms.utils import platform_metrics
+
+        rows = min(iterations, 5000000)
+        platforms = ['meta_business', 'x_twitter', 'google_ads', 'linkedin']
+        campaigns_per_platform = 250
+        days = max(rows // (len(platforms) * campaigns_per_platform), 1)
+        today = timezone.localdate()
+
+        with transaction.atomic():
+            batch, created = [], 0
+            for day in range(days):
+                report_date = today - timedelta(days=day)
+                for platform in platforms:
+                    for campaign in range(campaigns_per_platform):
+                        impressions = random.randint(100, 100000)
+                        clicks = random.randint(0, impressions // 20)
+                        batch.append(CampaignDailyReport(
+                            platform=platform, campaign_id=f'{platform}-{campaign}', report_date=report_date,
+                            impressions=impressions, clicks=clicks, reach=impressions // 2,
+                            spend=round(clicks * random.uniform(0.1, 2.0), 2),
+                        ))
+                        created += 1
+                if len(batch) >= 20000:
+                    CampaignDailyReport.objects.bulk_create(batch)
+                    batch = []
+            CampaignDailyReport.objects.bulk_create(batch)
+
+            date_from, date_to = today - timedelta(days=days - 1), today
+            queryset = platform_metrics.report_queryset(date_from, date_to)
+            self.stdout.write(f'{created} report rows over {days} days ({connection.vendor})')
+
+            legacy, current = {}, {}
+            base = self.timed('legacy: iterate rows in Python',
+                              lambda: legacy.update(_legacy_unified_report(queryset.iterator(chunk_size=5000))), created)
+            elapsed = self.timed('GROUP BY platform',
+                                 lambda: current.update(platform_metrics.platform_metrics(queryset)), created)
+            self.timed('GROUP BY report_date (daily series)',
+                       lambda: platform_metrics.daily_series(queryset, date_from, date_to), created)
+
+            assert legacy['totals']['impressions'] == current['totals']['total_impressions']
+            assert legacy['totals']['clicks'] == current['totals']['total_clicks']
+            self.stdout.write(f'speedup {base / elapsed:.1f}x')
+
+            platform_metrics.invalidate_platform_metrics()
+            self.timed('unified report (cache miss)',
+                       lambda: platform_metrics.unified_report_data(date_from, date_to, include_series=True), 1)
+            self.timed('unified report (cache hit) x1000',
+                       lambda: [platform_metrics.unified_report_data(date_from, date_to, include_series=True)
+                                for _ in range(1000)], 1000)
+            transaction.set_rollback(True)
+
+    def bench_suggest(self, iterations):
+        """اقتراحات البحث: LIKE و FTS في قاعدة البيانات مقابل الفهرس المرتب في الذاكرة (iterations = عدد العناوين)"""
+        import tracemalloc
+        from django.db import connection, transaction
+        from cms.models import SearchDocument
+        from cms.utils.search import get_search_backend, normalize_text
+        from cms.utils.suggest import VIEW_ALL, VIEW_PUBLIC, SuggestIndex
+
+        count = iterations
+        doc_types = ['project', 'task', 'blogpost', 'tag', 'category']
+        clients = list(range(1, 501))
+
+        index = SuggestIndex()
+        entries = []
+        for object_id in range(1, count + 1):
+            doc_type = random.choices(doc_types, weights=[20, 60, 15, 3, 2])[0]
+            title = ' '.join(random.sample(TITLE_VOCABULARY, random.randint(2, 6)))
+            private = doc_type in ('project', 'task')
+            entries.append(index.make_entry(
+                doc_type, object_id, title, f'/{doc_type}/{object_id}/',
+                owner_id=random.choice(clients) if private else None,
+                is_public=not private and random.random() < 0.9,
+            ))
+
+        self.timed(f'build index ({count} titles)', lambda: index.load(entries), count)
+        tracemalloc.start()
+        SuggestIndex().load(entries)
+        self.stdout.write(f'index memory (peak during build) {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f} MB')
+        tracemalloc.stop()
+
+        # ما يكتبه المستخدم فعلاً: بدايات كلمات بطول 1-5 أحرف، وأحياناً كلمة كاملة وبداية التالية
+        queries = []
+        for _ in range(10000):
+            words = random.sample(TITLE_VOCABULARY, 2)
+            if random.random() < 0.2:
+                queries.append(f'{words[0]} {words[1][:2]}')
+            else:
+                queries.append(words[0][:random.randint(1, 5)])
+
+        client_views = [('owner', clients[0]), VIEW_PUBLIC]
+        for label, views in (('staff', [VIEW_ALL]), ('client', client_views)):
+            self.timed(f'suggest ({label})',
+                       lambda: [index.suggest(query, views, limit=10) for query in queries], len(queries))
+
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                index.suggest(query, views, limit=10)
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            self.stdout.write(f'{label} p50 {latencies[len(latencies) // 2] * 1e6:.1f} µs  '
+                              f'p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.1f} µs  '
+                              f'max {latencies[-1] * 1e6:.1f} µs')
+
+        updates = entries[:1000]
+        self.timed('incremental update (re-add)', lambda: [index.add(entry) for entry in updates], len(updates))
+        self.timed('incremental delete',
+                   lambda: [index.discard(entry.doc_type, entry.object_id) for entry in updates], len(updates))
+
+        # نفس العناوين في قاعدة البيانات: LIKE (البحث السابق) و FTS
+        with transaction.atomic():
+            SearchDocument.objects.bulk_create([
+                SearchDocument(
+                    doc_type=entry.doc_type, object_id=entry.object_id, title=entry.title, url=entry.url,
+                    owner_id=entry.owner_id, is_public=entry.is_public,
+                    indexed_title=normalize_text(entry.title), indexed_body='',
+                )
+                for entry in entries
+            ], batch_size=5000)
+            db_queries = queries[:200]
+            documents = SearchDocument.objects.all()
+            backend = get_search_backend(documents.db)
+            self.timed(f'database LIKE ({connection.vendor})',
+                       lambda: [list(documents.filter(title__icontains=query)[:10]) for query in db_queries],
+                       len(db_queries))
+            self.timed(f'database full-text ({backend.__class__.__name__})',
+                       lambda: [backend.search(documents, query, limit=10) for query in db_queries],
+                       len(db_queries))
+            transaction.set_rollback(True)
+
+    def compression_payloads(self):
+        """صفحات الموقع الفعلية (HTML و CSS في جذر المستودع) و JSON واجهة المقالات لمقالات اصطناعية"""
+        from django.conf import settings
+        from django.contrib.auth.models import User
+        from rest_framework.renderers import JSONRenderer
+        from cms.models import BlogPost, Category, Tag
+        from cms.serializers import BlogPostSerializer
+
+        payloads = []
+        for name in ('index.html', 'dashboard.html', 'style.css'):
+            path = settings.BASE_DIR.parent / name
+            if path.exists():
+                content_type = 'text/css' if name.endswith('.css') else 'text/html'
+                payloads.append((name, content_type, [path.read_bytes()]))
+
+        author = User.objects.create(username='benchmark-compression')
+        categories = [Category.objects.create(name=f'تصنيف {i}', slug=f'bench-category-{i}') for i in range(5)]
+        tags = [Tag.objects.create(name=f'وسم {i}', slug=f'bench-tag-{i}') for i in range(20)]
+        for i in range(200):
+            words = lambda n: ' '.join(random.choices(TITLE_VOCABULARY, k=n))
+            post = BlogPost.objects.create(
+                title=words(6), slug=f'bench-post-{i}', content=f'<p>{words(120)}</p>' * 4, excerpt=words(30),
+                category=random.choice(categories), author=author, status='published', meta_description=words(12),
+            )
+            post.tags.set(random.sample(tags, 3))
+
+        posts = BlogPost.objects.select_related('author', 'category', 'featured_image').prefetch_related('tags')
+        data = BlogPostSerializer(posts, many=True).data
+        renderer = JSONRenderer()
+        payloads.append(('posts page (20, application/json)', 'application/json', [renderer.render(data[:20])]))
+        # قائمة متدفقة: عنصر لكل دفعة كما في ?stream=1
+        payloads.append(('posts stream (200, application/json)', 'application/json',
+                         [renderer.render(item) + b',' for item in data]))
+        return payloads
+
+    def bench_compression(self, iterations):
+        """سرعة ونسبة ووقت المعالج لكل ترميز ومستوى على صفحات و JSON المشروع (iterations = حد التكرار)"""
+        from django.db import transaction
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from cms.middleware import CompressionMiddleware
+        from cms.utils.compression import (
+            available_codecs, compress, compress_stream, compression_level, decompress, variant_cache,
+        )
+
+        levels = {'gzip': [1, 6, 9], 'br': [1, 4, 5, 9, 11], 'zstd': [1, 3, 6, 9, 12, 19]}
+        codecs = available_codecs()
+        missing = sorted(set(levels) - set(codecs))
+        if missing:
+            self.stdout.write(f'not installed: {", ".join(missing)}')
+
+        def measure(func, size):
+            """تكرار حتى 0.2 ثانية على الأقل (وبحد أقصى iterations): MB/s ووقت المعالج لكل عملية"""
+            reps, wall, cpu = 0, 0.0, 0.0
+            while reps < max(iterations, 1) and (reps < 3 or wall < 0.2):
+                wall_start, cpu_start = time.perf_counter(), time.process_time()
+                func()
+                wall += time.perf_counter() - wall_start
+                cpu += time.process_time() - cpu_start
+                reps += 1
+            return size * reps / wall / 1024 / 1024, cpu / reps * 1000
+
+        with transaction.atomic():
+            payloads = self.compression_payloads()
+            for name, content_type, chunks in payloads:
+                body = b''.join(chunks)
+                streamed = len(chunks) > 1
+                self.stdout.write(f'\n{name}: {len(body) / 1024:.1f} KB'
+                                  + (f' in {len(chunks)} chunks' if streamed else ''))
+                self.stdout.write(f'{"codec":<10}{"ratio":>8}{"MB/s":>10}{"cpu ms":>10}{"decode MB/s":>13}')
+                for codec in codecs:
+                    configured = compression_level(content_type, codec)
+                    for level in sorted(set(levels[codec]) | {configured}):
+                        if streamed:
+                            run = lambda: b''.join(compress_stream(chunks, codec, level))
+                        else:
+                            run = lambda: compress(body, codec, level)
+                        output = run()
+                        assert decompress(output, codec) == body
+                        speed, cpu = measure(run, len(body))
+                        decode_speed, _ = measure(lambda: decompress(output, codec), len(body))
+                        label = f'{codec}-{level}' + ('*' if level == configured else '')
+                        self.stdout.write(f'{label:<10}{len(output) / len(body):>8.3f}{speed:>10.1f}'
+                                          f'{cpu:>10.3f}{decode_speed:>13.1f}')
+            transaction.set_rollback(True)
+        self.stdout.write('* = configured level for the content type')
+
+        # الطلب المتكرر لنفس الاستجابة: ضغط في كل مرة مقابل النسخة المحفوظة حسب ETag
+        name, content_type, chunks = payloads[0]
+        body = b''.join(chunks)
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=', '.join(codecs))
+        count = min(iterations, 2000)
+        for label, etag in (('middleware, compress each time', None), ('middleware, cached variant', '"bench"')):
+            def respond(request):
+                response = HttpResponse(body, content_type=content_type)
+                if etag:
+                    response['ETag'] = etag
+                return response
+            middleware = CompressionMiddleware(respond)
+            variant_cache.clear()
+            self.timed(f'{label} ({name})', lambda: [middleware(request) for _ in range(count)], count)
+
+    def bench_cdn(self, iterations):
+        """تحويل روابط CDN في صفحة HTML بحجم 200KB: التطبيق السابق مقابل المرور الواحد والذاكرة حسب ETag"""
+        from cms.utils.cdn import CDNRewriter
+
+        class BenchCDNConfig:
+            base_url = 'https://cdn.ideateeam.com'
+            static_file_types = ['css', 'js', 'png', 'jpg', 'jpeg', 'gif', 'webp', 'svg',
+                                 'woff', 'woff2', 'ttf', 'eot', 'ico', 'pdf', 'mp4', 'webm']
+
+            def should_use_cdn(self, file_path):
+                return file_path.split('.')[-1].lower() in self.static_file_types
+
+            def get_cdn_url(self, file_path):
+                return f'{self.base_url}{file_path}'
+
+        config = BenchCDNConfig()
+        iterations = min(iterations, 1000)
+        head = ''.join(
+            f'<link rel="stylesheet" href="/static/css/{name}.css">'
+            for name in ('enhanced-design', 'phase2_design_system', 'navigation', 'chatbot', 'dark-mode')
+        ) + '<script src="/static/js/chatbot.js"></script><script src="/static/js/performance-optimizations.js"></script>'
+        row = ('<div class="card"><img src="/media/projects/{i}.jpg" alt="مشروع"><h3>حملة التسويق الرقمي {i}</h3>'
+               '<p>وصف المشروع والخدمات المقدمة للعميل مع تفاصيل التنفيذ والنتائج</p>'
+               '<a href="/static/docs/guide-{j}.pdf">دليل</a><span class="icon" style="background:url(/static/img/i{j}.svg)"></span></div>\n')
+        rows, size, i = [], 0, 0
+        while size < 200 * 1024:
+            rows.append(row.format(i=i % 300, j=i % 20))
+            size += len(rows[-1].encode('utf-8'))
+            i += 1
+        page = f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>المشاريع</title>{head}</head><body>{"".join(rows)}</body></html>'
+        content = page.encode('utf-8')
+
+        rewriter = CDNRewriter(config)
+        expected = _legacy_cdn_rewrite(content, config)
+        assert rewriter.rewrite(content) == expected
+        chunks = [content[start:start + 8192] for start in range(0, len(content), 8192)]
+        assert b''.join(rewriter.rewrite_stream(chunks)) == expected
+
+        self.stdout.write(f'CDN rewriting ({iterations} pages, {len(content) // 1024} KB, '
+                          f'{len(rewriter.pattern.findall(content))} URLs)')
+        base = self.timed('legacy decode + 2x re.sub + encode',
+                          lambda: [_legacy_cdn_rewrite(content, config) for _ in range(iterations)], iterations)
+        cold = CDNRewriter(config)
+        self.timed('single pass on bytes (cold URL memo, 1 page)', lambda: cold.rewrite(content), 1)
+        elapsed = self.timed('single pass on bytes (warm URL memo)',
+                             lambda: [rewriter.rewrite(content) for _ in range(iterations)], iterations)
+        self.timed('streaming, 8KB chunks',
+                   lambda: [b''.join(rewriter.rewrite_stream(chunks)) for _ in range(iterations)], iterations)
+        cached = self.timed('cached by ETag',
+                            lambda: [rewriter.rewrite_cached(content, '"page-v1"') for _ in range(iterations)],
+                            iterations)
+        self.stdout.write(f'speedup vs legacy: single pass {base / elapsed:.1f}x, ETag cache {base / cached:.0f}x')
+        self.stdout.write(f'stats: {rewriter.stats()}')
+
+
+    def bench_meta_sync(self, iterations):
+        """
+        جلب إحصائيات الحملات من خادم Graph API محلي (زمن استجابة 20ms):
+        طلب requests.get منفصل لكل حملة بالتتابع مقابل الجلسة المشتركة والجلب المتوازي وطلبات batch
+        وطلب واحد لكل حساب (level=campaign)
+        """
+        import requests
+        from cms.utils.graph_api import GraphAPIClient, get_meta_graph_api_settings
+        from cms.utils.graph_stub import GraphAPIStub
+
+        campaigns = max(1, min(iterations, 150))
+        stub = GraphAPIStub(accounts=2, campaigns_per_account=campaigns, latency=0.02).start()
+        try:
+            client = GraphAPIClient(stub.access_token, base_url=stub.base_url)
+            accounts = [account['id'] for account in client.get_all('me/adaccounts')]
+            ids = [campaign['id'] for account in accounts for campaign in client.get_all(f'{account}/campaigns')]
+            params = {'fields': 'impressions,clicks,spend', 'access_token': stub.access_token}
+
+            def legacy():
+                return [requests.get(f'{stub.base_url}/{campaign_id}/insights', params=params, timeout=10).json()
+                        for campaign_id in ids]
+
+            def pooled_serial():
+                return [client.get_json(f'{campaign_id}/insights', params) for campaign_id in ids]
+
+            def concurrent():
+                return client.fetch_concurrent({
+                    campaign_id: (f'{campaign_id}/insights', params) for campaign_id in ids
+                })
+
+            def batched():
+                return client.batch({
+                    campaign_id: (f'{campaign_id}/insights', params) for campaign_id in ids
+                })
+
+            def account_level():
+                return [client.get_all(f'{account}/insights', {**params, 'level': 'campaign'}) for account in accounts]
+
+            assert batched() == concurrent()
+            workers = get_meta_graph_api_settings()['MAX_CONCURRENCY']
+            self.stdout.write(f'Meta insights sync ({len(ids)} campaigns, 20ms latency, {workers} workers)')
+            for label, func in (('legacy requests.get, serial', legacy),
+                                ('pooled session, serial', pooled_serial),
+                                ('pooled session, concurrent', concurrent),
+                                ('batch, 50 per request', batched),
+                                ('account level, level=campaign', account_level)):
+                stub.reset_stats()
+                self.timed(label, func, len(ids))
+                stats = stub.stats()
+                self.stdout.write(f"  requests: {stats['requests']}  sub-requests: {stats['sub_requests']}  "
+                                  f"new connections: {stats['connections']}  max in flight: {stats['max_active']}")
+        finally:
+            stub.stop()
@@ -0,0 +1,90 @@
+"""
+Django management command لبناء قاعدة نطاقات IP المحلية من ملف CSV
+العمليات العاملة تلتقط الملف الجديد خلال GEOIP_CHECK_INTERVAL ثانية دون إعادة تشغيل
+مثال: python manage.py build_geoip_db ranges.csv --columns 0,1,2,3
+"""
+
+import csv
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cms.utils.geoip import GEOIP_CHECK_INTERVAL, ip_to_int, reset_geoip_resolver, write_database
+
+
+class Command(BaseCommand):
+    help = 'Build the local mmap GeoIP range database from a CSV export'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='CSV file with IPv4 ranges (start, end, country, city)')
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Output file (default: settings.GEOIP_DATABASE_PATH)'
+        )
+        parser.add_argument(
+            '--columns',
+            default='0,1,2,3',
+            help='Column indices for start,end,country,city (default: 0,1,2,3)'
+        )
+        parser.add_argument('--skip-header', action='store_true', help='Skip the first CSV row')
+
+    def handle(self, *args, **options):
+        output = options['output'] or getattr(settings, 'GEOIP_DATABASE_PATH', None)
+        if not output:
+            raise CommandError('No output path given and GEOIP_DATABASE_PATH is not set')
+
+        try:
+            columns = [int(index) for index in options['columns'].split(',')]
+        except ValueError:
+            raise CommandError('--columns must be four comma separated integers')
+        if len(columns) != 4:
+            raise CommandError('--columns must be four comma separated integers')
+
+        ranges, skipped = [], 0
+        try:
+            with open(options['source'], newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                if options['skip_header']:
+                    next(reader, None)
+                for row in reader:
+                    parsed = self.parse_row(row, columns)
+                    if parsed is None:
+                        skipped += 1
+                    else:
+                        ranges.append(parsed)
+        except OSError as e:
+            raise CommandError(f'Cannot read {options["source"]}: {e}')
+
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        # الكتابة إلى ملف مؤقت ثم الاستبدال حتى لا تقرأ العمليات العاملة ملفاً نصف مكتوب
+        temp_path = f'{output}.tmp'
+        count = write_database(temp_path, ranges)
+        os.replace(temp_path, output)
+        reset_geoip_resolver()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {count} ranges to {output} (skipped {skipped} rows); '
+            f'running workers reload it within {GEOIP_CHECK_INTERVAL}s'
+        ))
+
+    def parse_row(self, row, columns):
+        """تحويل صف CSV إلى (start, end, country, city)، None لصفوف IPv6 أو التالفة"""
+        try:
+            start, end, country, city = (row[index].strip() for index in columns)
+        except IndexError:
+            return None
+
+        start, end = self.parse_ip(start), self.parse_ip(end)
+        if start is None or end is None or end < start:
+            return None
+        return start, end, country, city
+
+    @staticmethod
+    def parse_ip(value):
+        # بعض المصادر تصدّر النطاقات كأعداد صحيحة وبعضها كعناوين نقطية
+        if value.isdigit():
+            number = int(value)
+            return number if number <= 0xFFFFFFFF else None
+        return ip_to_int(value)
@@ -0,0 +1,49 @@
+"""
+Django management command لبناء الملفات الثابتة للإنتاج: اسم ببصمة المحتوى لكل ملف في STATIC_ROOT،
+ونسخ .gz و .br (و .zst) مضغوطة مسبقاً بالتوازي، وملف manifest يستخدمه StaticAssetsMiddleware
+مثال: python manage.py build_static_assets --collect
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from cms.utils.static_assets import build_static_assets
+
+
+class Command(BaseCommand):
+    help = 'Fingerprint static files, write precompressed siblings and the static manifest'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--collect',
+            action='store_true',
+            help='Run collectstatic --noinput first'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Compression processes (default: STATIC_ASSETS["WORKERS"] or CPU count)'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.STATIC_ROOT:
+            raise CommandError('STATIC_ROOT is not set')
+        if options['collect']:
+            call_command('collectstatic', interactive=False, verbosity=0)
+
+        start = time.perf_counter()
+        try:
+            stats = build_static_assets(workers=options['workers'])
+        except OSError as e:
+            raise CommandError(f'Building static assets failed: {e}')
+
+        self.stdout.write(f"{stats['files']} files, {stats['changed']} rebuilt, {stats['bytes'] / 1024:.1f} KB")
+        for codec, size in stats['compressed'].items():
+            self.stdout.write(f'{codec}: {size / 1024:.1f} KB')
+        self.stdout.write(self.style.SUCCESS(
+            f"Static manifest written in {time.perf_counter() - start:.1f}s ({', '.join(stats['codecs'])})"
+        ))
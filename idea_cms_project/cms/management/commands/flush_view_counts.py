@@ -0,0 +1,46 @@
+"""
+Django management command لتطبيق عدادات المشاهدات المعلقة في الذاكرة المؤقتة على قاعدة البيانات
+كل عملية تفرّغ عداداتها دورياً وعند إيقافها؛ الأمر يغطي كل المقالات (عبر cron مثلاً).
+يتطلب ذاكرة مؤقتة مشتركة (Redis): مع LocMemCache يعمل الأمر في عملية لا ترى عدادات الخادم.
+مثال: python manage.py flush_view_counts
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cms.utils.counters import blog_post_views, get_view_counter_settings
+from cms.utils.shared_cache import is_shared_cache
+
+
+class Command(BaseCommand):
+    help = 'Apply pending blog post view counts from the cache to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Posts per cache lookup (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        alias = get_view_counter_settings()['CACHE']
+        if not is_shared_cache(alias):
+            raise CommandError(
+                f'The "{alias}" cache is process-local, so pending view counts live in the server processes '
+                f'and cannot be flushed from here. Configure a shared cache (REDIS_URL).'
+            )
+
+        queryset = blog_post_views.model.objects.order_by('pk').values_list('pk', flat=True)
+        batch, total = [], 0
+
+        try:
+            for pk in queryset.iterator(chunk_size=options['batch_size']):
+                batch.append(pk)
+                if len(batch) >= options['batch_size']:
+                    total += blog_post_views.flush(batch)
+                    batch = []
+            total += blog_post_views.flush(batch)
+        except Exception as e:
+            raise CommandError(f'Flushing view counts failed: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'Applied {total} pending views'))
@@ -0,0 +1,47 @@
+"""
+Django management command لتشغيل خادم Graph API محلي لتجربة مزامنة Meta Business دون حساب حقيقي
+مثال: python manage.py graph_api_stub --port 8765 --latency 0.1 --rate-limit 200
+ثم: META_GRAPH_API_URL=http://127.0.0.1:8765/v18.0 python manage.py sync_platforms --platform meta_business
+"""
+
+from django.core.management.base import BaseCommand
+
+from cms.utils.graph_stub import GraphAPIStub
+
+
+class Command(BaseCommand):
+    help = 'Run a local Graph API stub server for Meta Business sync testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--accounts', type=int, default=2, help='Ad accounts (default: 2)')
+        parser.add_argument('--campaigns', type=int, default=150, help='Campaigns per account (default: 150)')
+        parser.add_argument('--latency', type=float, default=0.05, help='Seconds per response (default: 0.05)')
+        parser.add_argument(
+            '--rate-limit',
+            type=int,
+            default=None,
+            help='Requests allowed per --window seconds before error code 4 (default: unlimited)'
+        )
+        parser.add_argument('--window', type=float, default=10.0)
+        parser.add_argument('--token', default='stub-token', help='Accepted access token (default: stub-token)')
+
+    def handle(self, *args, **options):
+        stub = GraphAPIStub(
+            accounts=options['accounts'],
+            campaigns_per_account=options['campaigns'],
+            latency=options['latency'],
+            rate_limit=options['rate_limit'],
+            window=options['window'],
+            access_token=options['token'],
+            host=options['host'],
+            port=options['port'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Graph API stub on http://{options['host']}:{options['port']}/v18.0 (token: {options['token']})"
+        ))
+        try:
+            stub.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write(f'stats: {stub.stats()}')
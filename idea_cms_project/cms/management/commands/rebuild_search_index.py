@@ -0,0 +1,43 @@
+"""
+Django management command لإعادة بناء فهرس البحث من المحتوى الحالي
+يُشغّل مرة بعد التثبيت أو بعد استيراد بيانات دون إشارات، مثال: python manage.py rebuild_search_index
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from cms.utils.search import SEARCH_SOURCES, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for projects, tasks, blog posts and pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'doc_types',
+            nargs='*',
+            help=f'Document types to rebuild: {", ".join(SEARCH_SOURCES)} (default: all)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Documents per bulk insert (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options['doc_types']) - set(SEARCH_SOURCES)
+        if unknown:
+            raise CommandError(f"Unknown document types: {', '.join(sorted(unknown))}")
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            counts = rebuild_index(options['doc_types'] or None, batch_size=options['batch_size'])
+
+        for doc_type, count in counts.items():
+            self.stdout.write(f'{doc_type}: {count} documents')
+        self.stdout.write(self.style.SUCCESS(
+            f'Search index rebuilt in {time.perf_counter() - start:.1f}s'
+        ))
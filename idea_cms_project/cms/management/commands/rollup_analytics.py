@@ -0,0 +1,46 @@
+"""
+Django management command لبناء جداول التحليلات اليومية تدريجياً
+يُشغّل دورياً عبر cron job بعد منتصف الليل، مثال: python manage.py rollup_analytics
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cms.utils.rollups import get_watermark, run_rollups
+
+
+class Command(BaseCommand):
+    help = 'Roll up closed days of visitor and form submission data into daily tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            help='Re-aggregate starting from this day (YYYY-MM-DD) instead of the watermark'
+        )
+        parser.add_argument(
+            '--until',
+            type=date.fromisoformat,
+            help='Last day to aggregate (default: yesterday, the open day is never rolled up)'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Re-aggregate every day from the first raw record'
+        )
+
+    def handle(self, *args, **options):
+        previous, _ = get_watermark()
+
+        try:
+            days = run_rollups(since=options['since'], until=options['until'], rebuild=options['rebuild'])
+        except Exception as e:
+            raise CommandError(f'Rollup failed: {e}')
+
+        closed_through, _ = get_watermark()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rolled up {len(days)} day(s); watermark {previous or "-"} -> {closed_through}'
+            )
+        )
@@ -1,9 +1,30 @@
+import html
 import json
+import re
 import time
+from django.utils.cache import get_conditional_response, patch_vary_headers
 from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import http_date
 from django.utils import timezone
 from django.conf import settings
+from django.http import FileResponse
 from .models import VisitorTracking
+from .utils.visit_buffer import get_visit_buffer
+from .utils.user_agents import classify_user_agent
+from .utils.geoip import resolve_location
+from .utils.etags import file_validators, weak_etag
+from .utils.compression import (
+    acompress_stream, available_codecs, compress, compress_stream, compression_level, count,
+    get_compression_settings, negotiate, variant_cache,
+)
+from .utils.static_assets import get_static_assets_settings, get_static_manifest
+from .utils.cdn import get_cdn_rewriter
+
+# عنوان الصفحة يقع في <head> لذا يكفي فحص بداية المحتوى كـ bytes دون فك ترميز الصفحة كاملة
+TITLE_SCAN_BYTES = 16384
+TITLE_MAX_LENGTH = 200  # حسب VisitorTracking.page_title
+_TITLE_PATTERN = re.compile(rb'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+DEFAULT_PAGE_TITLE = 'صفحة غير محددة'
 
 
 class VisitorTrackingMiddleware(MiddlewareMixin):
@@ -46,9 +67,7 @@ class VisitorTrackingMiddleware(MiddlewareMixin):
             return False
         
         # تجاهل طلبات البوتات (اختياري)
-        user_agent = request.META.get('HTTP_USER_AGENT', '').lower()
-        bot_indicators = ['bot', 'crawler', 'spider', 'scraper']
-        if any(indicator in user_agent for indicator in bot_indicators):
+        if classify_user_agent(request.META.get('HTTP_USER_AGENT', '')).is_bot:
             return False
         
         return True
@@ -64,10 +83,10 @@ class VisitorTrackingMiddleware(MiddlewareMixin):
             session_key = request.session.session_key or 'anonymous'
             ip_address = self._get_client_ip(request)
             user_agent = request.META.get('HTTP_USER_AGENT', '')
-            referrer = request.META.get('HTTP_REFERER', '')
+            referrer = self._fit_field('referrer', request.META.get('HTTP_REFERER', ''))
             
             # معلومات الصفحة
-            page_url = request.build_absolute_uri()
+            page_url = self._fit_field('page_url', request.build_absolute_uri())
             page_title = self._extract_page_title(response)
             
             # تحليل User Agent
@@ -76,31 +95,43 @@ class VisitorTrackingMiddleware(MiddlewareMixin):
             # تحديد ما إذا كانت الزيارة bounce (زيارة صفحة واحدة فقط)
             is_bounce = self._is_bounce_visit(request, visit_duration)
             
-            # معلومات الموقع الجغرافي (يمكن تحسينها باستخدام خدمة GeoIP)
-            location_info = self._get_location_info(ip_address)
-            
             # إنشاء سجل تتبع الزائر
-            VisitorTracking.objects.create(
-                session_key=session_key,
-                ip_address=ip_address,
-                user_agent=user_agent,
-                referrer=referrer,
-                page_url=page_url,
-                page_title=page_title,
-                visit_duration=visit_duration,
-                is_bounce=is_bounce,
-                device_type=device_info['device_type'],
-                browser=device_info['browser'],
-                operating_system=device_info['operating_system'],
-                country=location_info['country'],
-                city=location_info['city']
-            )
+            # وقت الزيارة نفسها وليس وقت الكتابة المجمعة (قد تتأخر إذا كانت قاعدة البيانات غير متاحة)
+            record = {
+                'visited_at': timezone.now(),
+                'session_key': session_key,
+                'ip_address': ip_address,
+                'user_agent': user_agent,
+                'referrer': referrer,
+                'page_url': page_url,
+                'page_title': page_title,
+                'visit_duration': visit_duration,
+                'is_bounce': is_bounce,
+                'device_type': device_info['device_type'],
+                'browser': device_info['browser'],
+                'operating_system': device_info['operating_system']
+            }
+            
+            # الكتابة عبر المخزن المؤقت حتى لا يضيف التتبع زمن قاعدة البيانات للاستجابة
+            # (ويتم تحديد الموقع الجغرافي عند الكتابة المجمعة بدلاً من خيط الطلب)
+            visit_buffer = get_visit_buffer()
+            if visit_buffer is not None:
+                visit_buffer.add(record)
+            else:
+                record.update(self._get_location_info(ip_address))
+                VisitorTracking.objects.create(**record)
             
         except Exception as e:
             # تسجيل الخطأ دون إيقاف الطلب
             if settings.DEBUG:
                 print(f"خطأ في تتبع الزائر: {e}")
     
+    @staticmethod
+    def _fit_field(field_name, value):
+        """قص القيمة إلى max_length الحقل (URLField = 200) حتى لا يُفشل رابط طويل واحد الكتابة المجمعة"""
+        max_length = VisitorTracking._meta.get_field(field_name).max_length
+        return value[:max_length] if max_length else value
+    
     def _get_client_ip(self, request):
         """الحصول على عنوان IP الحقيقي للعميل"""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -111,61 +142,27 @@ class VisitorTrackingMiddleware(MiddlewareMixin):
         return ip
     
     def _extract_page_title(self, response):
-        """استخراج عنوان الصفحة من HTML"""
+        """استخراج عنوان الصفحة من HTML (أو من response.page_title إن حددته الـ view)"""
+        page_title = getattr(response, 'page_title', None)
+        if page_title:
+            return str(page_title)[:TITLE_MAX_LENGTH]
+
         try:
-            if hasattr(response, 'content') and response.get('Content-Type', '').startswith('text/html'):
-                content = response.content.decode('utf-8', errors='ignore')
-                # البحث عن تاج title
-                import re
-                title_match = re.search(r'<title[^>]*>(.*?)</title>', content, re.IGNORECASE | re.DOTALL)
-                if title_match:
-                    return title_match.group(1).strip()
-        except:
+            if response.streaming or not response.get('Content-Type', '').startswith('text/html'):
+                return DEFAULT_PAGE_TITLE
+            title_match = _TITLE_PATTERN.search(response.content[:TITLE_SCAN_BYTES])
+            if title_match:
+                title = title_match.group(1).decode(response.charset or 'utf-8', errors='ignore')
+                title = html.unescape(' '.join(title.split()))
+                if title:
+                    return title[:TITLE_MAX_LENGTH]
+        except Exception:
             pass
-        return 'صفحة غير محددة'
+        return DEFAULT_PAGE_TITLE
     
     def _parse_user_agent(self, user_agent):
         """تحليل User Agent لاستخراج معلومات الجهاز والمتصفح"""
-        user_agent_lower = user_agent.lower()
-        
-        # تحديد نوع الجهاز
-        device_type = 'desktop'
-        if any(mobile in user_agent_lower for mobile in ['mobile', 'android', 'iphone']):
-            device_type = 'mobile'
-        elif any(tablet in user_agent_lower for tablet in ['tablet', 'ipad']):
-            device_type = 'tablet'
-        
-        # تحديد المتصفح
-        browser = 'غير محدد'
-        if 'chrome' in user_agent_lower and 'edg' not in user_agent_lower:
-            browser = 'Chrome'
-        elif 'firefox' in user_agent_lower:
-            browser = 'Firefox'
-        elif 'safari' in user_agent_lower and 'chrome' not in user_agent_lower:
-            browser = 'Safari'
-        elif 'edg' in user_agent_lower:
-            browser = 'Edge'
-        elif 'opera' in user_agent_lower:
-            browser = 'Opera'
-        
-        # تحديد نظام التشغيل
-        operating_system = 'غير محدد'
-        if 'windows' in user_agent_lower:
-            operating_system = 'Windows'
-        elif 'mac' in user_agent_lower and 'iphone' not in user_agent_lower and 'ipad' not in user_agent_lower:
-            operating_system = 'macOS'
-        elif 'linux' in user_agent_lower and 'android' not in user_agent_lower:
-            operating_system = 'Linux'
-        elif 'android' in user_agent_lower:
-            operating_system = 'Android'
-        elif 'iphone' in user_agent_lower or 'ipad' in user_agent_lower:
-            operating_system = 'iOS'
-        
-        return {
-            'device_type': device_type,
-            'browser': browser,
-            'operating_system': operating_system
-        }
+        return classify_user_agent(user_agent).as_dict()
     
     def _is_bounce_visit(self, request, visit_duration):
         """تحديد ما إذا كانت الزيارة bounce"""
@@ -173,13 +170,8 @@ class VisitorTrackingMiddleware(MiddlewareMixin):
         return visit_duration < 30000  # 30 ثانية بالميلي ثانية
     
     def _get_location_info(self, ip_address):
-        """الحصول على معلومات الموقع الجغرافي"""
-        # يمكن تحسين هذا باستخدام خدمة GeoIP مثل MaxMind
-        # حالياً نعيد قيم افتراضية
-        return {
-            'country': 'المملكة العربية السعودية',
-            'city': 'الرياض'
-        }
+        """الحصول على معلومات الموقع الجغرافي من قاعدة GeoIP المحلية"""
+        return resolve_location(ip_address)
 
 
 class CORSMiddleware(MiddlewareMixin):
@@ -252,17 +244,13 @@ except ImportError:
 class CDNMiddleware(MiddlewareMixin):
     """
     Middleware لتحويل روابط الملفات الثابتة إلى روابط CDN
+    التحويل على البايتات في مرور واحد، والصفحات ذات ETag تُحوّل مرة واحدة، والمتدفقة دفعة بدفعة
     """
     
     def __init__(self, get_response):
         self.get_response = get_response
         self.cdn_enabled = cdn_config is not None and cdn_config.get_active_provider()[0] is not None
-        
-        # أنماط regex للملفات الثابتة
-        self.static_patterns = [
-            r'(/static/[^"\'>\s]+\.(?:css|js|png|jpg|jpeg|gif|webp|svg|woff|woff2|ttf|eot|ico|pdf|mp4|webm))',
-            r'(/media/[^"\'>\s]+\.(?:png|jpg|jpeg|gif|webp|svg|pdf|mp4|webm))',
-        ]
+        self.rewriter = get_cdn_rewriter(cdn_config) if self.cdn_enabled else None
         
         super().__init__(get_response)
     
@@ -279,39 +267,25 @@ class CDNMiddleware(MiddlewareMixin):
         return (
             response.status_code == 200 and
             response.get('Content-Type', '').startswith('text/html') and
-            hasattr(response, 'content')
+            not response.has_header('Content-Encoding')
         )
     
     def _process_response(self, response):
         """معالجة الاستجابة وتحويل روابط الملفات الثابتة"""
-        try:
-            content = response.content.decode('utf-8')
-            
-            for pattern in self.static_patterns:
-                content = re.sub(
-                    pattern,
-                    self._replace_static_url,
-                    content
-                )
-            
-            response.content = content.encode('utf-8')
-            response['Content-Length'] = len(response.content)
-            
-        except Exception as e:
-            # في حالة حدوث خطأ، نعيد الاستجابة الأصلية
-            print(f"خطأ في CDN Middleware: {e}")
-            
-        return response
-    
-    def _replace_static_url(self, match):
-        """استبدال رابط الملف الثابت برابط CDN"""
-        original_url = match.group(1)
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.rewriter.arewrite_stream(response.streaming_content)
+            else:
+                response.streaming_content = self.rewriter.rewrite_stream(response.streaming_content)
+            response.headers.pop('Content-Length', None)
+            return response
         
-        if cdn_config and cdn_config.should_use_cdn(original_url):
-            cdn_url = cdn_config.get_cdn_url(original_url)
-            return cdn_url
+        content = self.rewriter.rewrite_cached(response.content, response.get('ETag'))
+        if content != response.content:
+            response.content = content
+            response['Content-Length'] = len(content)
             
-        return original_url
+        return response
 
 
 class CacheControlMiddleware(MiddlewareMixin):
@@ -341,14 +315,40 @@ class CacheControlMiddleware(MiddlewareMixin):
         super().__init__(get_response)
     
     def __call__(self, request):
+        file_type = self._get_file_type(request.path)
+        conditional = request.method in ('GET', 'HEAD')
+        
+        # الملفات الثابتة والوسائط: بصمة المحتوى من القرص (محفوظة حسب وقت التعديل والحجم)،
+        # وإذا كانت نسخة العميل مطابقة نرد بـ 304 دون فتح الملف
+        validators = file_validators(request.path) if file_type in ('static', 'media') else None
+        if validators is not None and conditional:
+            not_modified = get_conditional_response(
+                request, etag=validators.etag, last_modified=validators.last_modified
+            )
+            if not_modified is not None:
+                self._add_cache_headers(request, not_modified, validators)
+                return not_modified
+        
         response = self.get_response(request)
         
         # إضافة headers التخزين المؤقت
-        self._add_cache_headers(request, response)
+        self._add_cache_headers(request, response, validators)
+        
+        # JSON: ETag ضعيف من المحتوى إن لم تضعه الواجهة (الاستجابات المخزنة تضعه وترد بـ 304 قبل التسلسل)
+        if conditional and response.status_code == 200 and self._is_json(response):
+            if not response.has_header('ETag'):
+                response['ETag'] = weak_etag(response.content)
+            response = get_conditional_response(request, etag=response['ETag'], response=response)
         
         return response
     
-    def _add_cache_headers(self, request, response):
+    def _is_json(self, response):
+        return (
+            not response.streaming and
+            response.get('Content-Type', '').split(';')[0] == 'application/json'
+        )
+    
+    def _add_cache_headers(self, request, response, validators=None):
         """إضافة headers التحكم في التخزين المؤقت"""
         path = request.path
         
@@ -364,9 +364,10 @@ class CacheControlMiddleware(MiddlewareMixin):
                 response['Cache-Control'] = f'public, max-age={max_age}'
                 response['Expires'] = self._get_expires_date(max_age)
                 
-                # إضافة ETag للملفات الثابتة
-                if file_type in ['static', 'media']:
-                    response['ETag'] = f'"{hash(path)}"'
+                # ETag قوي من محتوى الملف: نفس القيمة في كل العمليات ويتغير مع تغير الملف
+                if validators is not None and response.status_code in (200, 304):
+                    response['ETag'] = validators.etag
+                    response['Last-Modified'] = http_date(validators.last_modified)
     
     def _get_file_type(self, path):
         """تحديد نوع الملف بناءً على المسار"""
@@ -394,7 +395,8 @@ class CacheControlMiddleware(MiddlewareMixin):
 
 class CompressionMiddleware(MiddlewareMixin):
     """
-    Middleware لضغط المحتوى (Gzip)
+    Middleware لضغط المحتوى (br / zstd / gzip حسب Accept-Encoding)
+    الاستجابات المتدفقة تُضغط دفعة بدفعة، والنسخ المضغوطة للاستجابات ذات ETag تُحفظ في الذاكرة
     """
     
     def __init__(self, get_response):
@@ -409,7 +411,8 @@ class CompressionMiddleware(MiddlewareMixin):
             'application/json',
             'application/xml',
             'text/xml',
-            'text/plain'
+            'text/plain',
+            'image/svg+xml',
         ]
         
         super().__init__(get_response)
@@ -419,55 +422,148 @@ class CompressionMiddleware(MiddlewareMixin):
         
         # ضغط المحتوى إذا كان مدعوماً
         if self._should_compress(request, response):
-            response = self._compress_response(response)
+            patch_vary_headers(response, ('Accept-Encoding',))
+            codec = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), available_codecs())
+            if codec is not None:
+                response = self._compress_response(response, codec)
             
         return response
     
     def _should_compress(self, request, response):
         """تحديد ما إذا كان يجب ضغط الاستجابة"""
-        # التحقق من دعم العميل للضغط
-        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
-        if 'gzip' not in accept_encoding:
+        if not get_compression_settings()['ENABLED']:
             return False
-            
+        
         # التحقق من نوع المحتوى
-        content_type = response.get('Content-Type', '').split(';')[0]
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
         if content_type not in self.compressible_types:
             return False
-            
-        # التحقق من حجم المحتوى (لا نضغط الملفات الصغيرة)
-        if len(response.content) < 1024:  # أقل من 1KB
+        
+        # التحقق من عدم وجود ضغط مسبق، أو طلب جزء من الملف، أو منع التحويل
+        if response.has_header('Content-Encoding') or response.status_code == 206:
             return False
-            
-        # التحقق من عدم وجود ضغط مسبق
-        if response.get('Content-Encoding'):
+        if 'no-transform' in response.get('Cache-Control', ''):
             return False
-            
+        
+        # التحقق من حجم المحتوى (لا نضغط الملفات الصغيرة)، والمتدفقة حسب Content-Length إن وجد
+        min_size = get_compression_settings()['MIN_SIZE']
+        if response.streaming:
+            length = response.get('Content-Length')
+            if length is not None and length.isdigit() and int(length) < min_size:
+                return False
+        elif len(response.content) < min_size:
+            return False
+        
         return True
     
-    def _compress_response(self, response):
+    def _variant_key(self, response, codec, level):
+        """مفتاح النسخة المضغوطة للاستجابات القابلة للتخزين (ETag يحدد المحتوى بالبايت في هذا المشروع)"""
+        etag = response.get('ETag')
+        if not etag or response.status_code != 200:
+            return None
+        cache_control = response.get('Cache-Control', '')
+        if 'no-store' in cache_control or 'private' in cache_control:
+            return None
+        length = response.get('Content-Length') if response.streaming else len(response.content)
+        if length is None:
+            return None
+        return (etag, response.get('Content-Type', ''), int(length), codec, level)
+    
+    def _compress_response(self, response, codec):
         """ضغط محتوى الاستجابة"""
-        import gzip
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        level = compression_level(content_type, codec)
+        key = self._variant_key(response, codec, level)
+        cached = variant_cache.get(key) if key is not None else None
         
-        try:
-            # ضغط المحتوى
-            compressed_content = gzip.compress(response.content)
-            
-            # تحديث الاستجابة
-            response.content = compressed_content
-            response['Content-Encoding'] = 'gzip'
-            response['Content-Length'] = len(compressed_content)
-            
-            # إضافة Vary header
-            vary = response.get('Vary', '')
-            if 'Accept-Encoding' not in vary:
-                if vary:
-                    vary += ', Accept-Encoding'
+        if response.streaming:
+            if cached is not None:
+                # الملف لا يُقرأ؛ يُغلق مع الاستجابة
+                response.streaming_content = [cached]
+                response['Content-Length'] = len(cached)
+            else:
+                on_complete = (lambda data: variant_cache.set(key, data)) if key is not None else None
+                if response.is_async:
+                    response.streaming_content = acompress_stream(
+                        response.streaming_content, codec, level, on_complete
+                    )
                 else:
-                    vary = 'Accept-Encoding'
-                response['Vary'] = vary
-                
-        except Exception as e:
-            print(f"خطأ في ضغط المحتوى: {e}")
-            
+                    response.streaming_content = compress_stream(
+                        response.streaming_content, codec, level, on_complete
+                    )
+                # الطول النهائي غير معروف قبل انتهاء التدفق
+                response.headers.pop('Content-Length', None)
+            count('streamed')
+        else:
+            original = response.content
+            if cached is None:
+                cached = compress(original, codec, level)
+                if len(cached) >= len(original):
+                    count('skipped')
+                    return response
+                if key is not None:
+                    variant_cache.set(key, cached)
+            response.content = cached
+            response['Content-Length'] = len(cached)
+            count('compressed', len(original), len(cached))
+        
+        response['Content-Encoding'] = codec
+        
+        # المحتوى المضغوط تمثيل مختلف بالبايت، فيصبح ETag القوي ضعيفاً (مثل GZipMiddleware)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        
+        return response
+
+
+class StaticAssetsMiddleware(MiddlewareMixin):
+    """
+    Middleware لإرسال الملفات الثابتة المبنية بـ build_static_assets
+    النسخة المضغوطة مسبقاً حسب Accept-Encoding (بدون ضغط أثناء الطلب)، والأسماء ذات البصمة مع immutable
+    الملفات غير الموجودة في الـ manifest تمر للـ middleware التالي كالمعتاد
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        super().__init__(get_response)
+    
+    def __call__(self, request):
+        if (
+            request.method in ('GET', 'HEAD') and
+            request.path.startswith(settings.STATIC_URL) and
+            get_static_assets_settings()['ENABLED']
+        ):
+            asset = get_static_manifest().get(request.path[len(settings.STATIC_URL):])
+            if asset is not None:
+                return self._serve(request, asset)
+        
+        return self.get_response(request)
+    
+    def _serve(self, request, asset):
+        """إرسال الملف أو نسخته المضغوطة، أو 304 إذا كانت نسخة العميل مطابقة"""
+        codecs = [codec for codec in get_compression_settings()['CODECS'] if codec in asset.encodings]
+        codec = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), codecs) if codecs else None
+        
+        # ETag قوي لكل تمثيل: نفس المحتوى بترميز مختلف تمثيل مختلف بالبايت
+        etag = f'"{asset.digest}-{codec}"' if codec else f'"{asset.digest}"'
+        response = get_conditional_response(request, etag=etag, last_modified=asset.last_modified)
+        if response is None:
+            try:
+                response = FileResponse(open(asset.encoded_path(codec), 'rb'), content_type=asset.content_type)
+            except OSError:
+                # الملف حُذف بعد البناء
+                return self.get_response(request)
+            response['Content-Length'] = asset.encodings[codec] if codec else asset.size
+            if codec:
+                response['Content-Encoding'] = codec
+        
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(asset.last_modified)
+        if asset.immutable:
+            response['Cache-Control'] = f'public, max-age={settings.STATIC_FILES_CACHE_TTL}, immutable'
+        else:
+            response['Cache-Control'] = f'public, max-age={settings.STATIC_FILES_CACHE_TTL}'
+        if codecs:
+            patch_vary_headers(response, ('Accept-Encoding',))
         return response
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0003_project_systemsettings_alter_adcampaign_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPageStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True, verbose_name='اليوم')),
+                ('page_url', models.URLField(verbose_name='رابط الصفحة')),
+                ('page_title', models.CharField(blank=True, max_length=200, verbose_name='عنوان الصفحة')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='المشاهدات')),
+                ('bounces', models.PositiveIntegerField(default=0, verbose_name='زيارات الارتداد')),
+                ('total_duration', models.BigIntegerField(default=0, verbose_name='مجموع مدة الزيارات')),
+            ],
+            options={
+                'verbose_name': 'إحصائيات صفحة يومية',
+                'verbose_name_plural': 'إحصائيات الصفحات اليومية',
+                'ordering': ['-date', '-views'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyVisitorStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='اليوم')),
+                ('page_views', models.PositiveIntegerField(default=0, verbose_name='مشاهدات الصفحات')),
+                ('bounces', models.PositiveIntegerField(default=0, verbose_name='زيارات الارتداد')),
+                ('total_duration', models.BigIntegerField(default=0, verbose_name='مجموع مدة الزيارات')),
+            ],
+            options={
+                'verbose_name': 'ملخص زوار يومي',
+                'verbose_name_plural': 'ملخصات الزوار اليومية',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyVisitorBreakdown',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True, verbose_name='اليوم')),
+                ('dimension', models.CharField(choices=[('device_type', 'نوع الجهاز'), ('browser', 'المتصفح'), ('country', 'البلد'), ('referrer', 'المصدر')], max_length=20, verbose_name='البُعد')),
+                ('value', models.CharField(blank=True, max_length=200, verbose_name='القيمة')),
+                ('visits', models.PositiveIntegerField(default=0, verbose_name='الزيارات')),
+            ],
+            options={
+                'verbose_name': 'توزيع زوار يومي',
+                'verbose_name_plural': 'توزيعات الزوار اليومية',
+                'ordering': ['-date', 'dimension', '-visits'],
+                'unique_together': {('date', 'dimension', 'value')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySubmissionStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True, verbose_name='اليوم')),
+                ('status', models.CharField(max_length=20, verbose_name='الحالة')),
+                ('submissions', models.PositiveIntegerField(default=0, verbose_name='الإرسالات')),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cms.dynamicform', verbose_name='النموذج')),
+            ],
+            options={
+                'verbose_name': 'إحصائيات إرسالات يومية',
+                'verbose_name_plural': 'إحصائيات الإرسالات اليومية',
+                'ordering': ['-date'],
+                'unique_together': {('date', 'form', 'status')},
+            },
+        ),
+    ]
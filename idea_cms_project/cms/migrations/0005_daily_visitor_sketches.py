@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0004_daily_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyvisitorstats',
+            name='ip_sketch',
+            field=models.BinaryField(blank=True, null=True, verbose_name='رسم عناوين IP الفريدة (HyperLogLog)'),
+        ),
+        migrations.AddField(
+            model_name='dailyvisitorstats',
+            name='visitors_sketch',
+            field=models.BinaryField(blank=True, null=True, verbose_name='رسم الجلسات الفريدة (HyperLogLog)'),
+        ),
+        migrations.AlterField(
+            model_name='formsubmission',
+            name='submitted_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='تاريخ الإرسال'),
+        ),
+        migrations.AlterField(
+            model_name='visitortracking',
+            name='visited_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='تاريخ الزيارة'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0005_daily_visitor_sketches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticsreport',
+            name='error_message',
+            field=models.TextField(blank=True, verbose_name='رسالة الخطأ'),
+        ),
+        migrations.AddField(
+            model_name='analyticsreport',
+            name='status',
+            field=models.CharField(choices=[('pending', 'في الانتظار'), ('running', 'قيد الإنشاء'), ('completed', 'مكتمل'), ('failed', 'فشل')], default='completed', max_length=20, verbose_name='حالة الإنشاء'),
+        ),
+    ]
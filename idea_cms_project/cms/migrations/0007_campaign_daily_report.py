@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0006_analyticsreport_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignDailyReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(max_length=50, verbose_name='المنصة')),
+                ('campaign_id', models.CharField(max_length=255, verbose_name='المعرف الخارجي للحملة')),
+                ('report_date', models.DateField(db_index=True, verbose_name='تاريخ التقرير')),
+                ('impressions', models.BigIntegerField(default=0, verbose_name='مرات الظهور')),
+                ('clicks', models.BigIntegerField(default=0, verbose_name='النقرات')),
+                ('spend', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='الإنفاق')),
+                ('reach', models.BigIntegerField(default=0, verbose_name='الوصول')),
+                ('ctr', models.FloatField(default=0, verbose_name='نسبة النقر')),
+                ('cpc', models.FloatField(default=0, verbose_name='تكلفة النقرة')),
+                ('cpm', models.FloatField(default=0, verbose_name='تكلفة الألف ظهور')),
+                ('engagement_rate', models.FloatField(default=0, verbose_name='التفاعل')),
+                ('data', models.JSONField(default=dict, verbose_name='البيانات الخام')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+            ],
+            options={
+                'verbose_name': 'تقرير أداء حملة يومي',
+                'verbose_name_plural': 'تقارير أداء الحملات اليومية',
+                'ordering': ['-report_date'],
+                'unique_together': {('platform', 'campaign_id', 'report_date')},
+            },
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:07
+
+from django.db import migrations, models
+
+
+# الفهرس النصي خاص بكل قاعدة بيانات لذا يُنشأ بـ SQL مباشر حسب النوع
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE cms_searchdocument_fts USING fts5("
+    "indexed_title, indexed_body, content='cms_searchdocument', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER cms_searchdocument_ai AFTER INSERT ON cms_searchdocument BEGIN "
+    "INSERT INTO cms_searchdocument_fts(rowid, indexed_title, indexed_body) "
+    "VALUES (new.id, new.indexed_title, new.indexed_body); END",
+    "CREATE TRIGGER cms_searchdocument_ad AFTER DELETE ON cms_searchdocument BEGIN "
+    "INSERT INTO cms_searchdocument_fts(cms_searchdocument_fts, rowid, indexed_title, indexed_body) "
+    "VALUES ('delete', old.id, old.indexed_title, old.indexed_body); END",
+    "CREATE TRIGGER cms_searchdocument_au AFTER UPDATE ON cms_searchdocument BEGIN "
+    "INSERT INTO cms_searchdocument_fts(cms_searchdocument_fts, rowid, indexed_title, indexed_body) "
+    "VALUES ('delete', old.id, old.indexed_title, old.indexed_body); "
+    "INSERT INTO cms_searchdocument_fts(rowid, indexed_title, indexed_body) "
+    "VALUES (new.id, new.indexed_title, new.indexed_body); END",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS cms_searchdocument_au",
+    "DROP TRIGGER IF EXISTS cms_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS cms_searchdocument_ai",
+    "DROP TABLE IF EXISTS cms_searchdocument_fts",
+]
+
+POSTGRES_FORWARD = [
+    "ALTER TABLE cms_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(indexed_title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(indexed_body, '')), 'B')) STORED",
+    "CREATE INDEX cms_searchdocument_vector_gin ON cms_searchdocument USING GIN (search_vector)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS cms_searchdocument_vector_gin",
+    "ALTER TABLE cms_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0007_campaign_daily_report'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(max_length=20, verbose_name='نوع المستند')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='معرف الكائن')),
+                ('title', models.CharField(max_length=255, verbose_name='العنوان')),
+                ('description', models.TextField(blank=True, verbose_name='المقتطف')),
+                ('url', models.CharField(blank=True, max_length=500, verbose_name='الرابط')),
+                ('owner_id', models.BigIntegerField(blank=True, db_index=True, null=True, verbose_name='معرف العميل المالك')),
+                ('is_public', models.BooleanField(default=False, verbose_name='منشور للعامة')),
+                ('indexed_title', models.TextField(blank=True, verbose_name='العنوان المفهرس')),
+                ('indexed_body', models.TextField(blank=True, verbose_name='النص المفهرس')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+            ],
+            options={
+                'verbose_name': 'مستند بحث',
+                'verbose_name_plural': 'فهرس البحث',
+                'unique_together': {('doc_type', 'object_id')},
+            },
+        ),
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}),
+        ),
+    ]
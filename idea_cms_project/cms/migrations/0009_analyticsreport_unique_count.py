@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticsreport',
+            name='unique_count',
+            field=models.CharField(blank=True, max_length=10, verbose_name='طريقة عد الزوار الفريدين'),
+        ),
+    ]
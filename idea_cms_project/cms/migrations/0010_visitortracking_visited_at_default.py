@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cms', '0009_analyticsreport_unique_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='visitortracking',
+            name='visited_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='تاريخ الزيارة'),
+        ),
+    ]
@@ -270,7 +270,7 @@ class FormSubmission(models.Model):
     notes = models.TextField(blank=True, verbose_name="ملاحظات")
     ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name="عنوان IP")
     user_agent = models.TextField(blank=True, verbose_name="User Agent")
-    submitted_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الإرسال")
+    submitted_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="تاريخ الإرسال")
     processed_at = models.DateTimeField(null=True, blank=True, verbose_name="تاريخ المعالجة")
     processed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, 
                                    verbose_name="معالج بواسطة")
@@ -311,7 +311,8 @@ class VisitorTracking(models.Model):
     operating_system = models.CharField(max_length=50, blank=True, verbose_name="نظام التشغيل")
     country = models.CharField(max_length=100, blank=True, verbose_name="البلد")
     city = models.CharField(max_length=100, blank=True, verbose_name="المدينة")
-    visited_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الزيارة")
+    # يضعه الـ middleware عند الزيارة، فالسجلات المكتوبة لاحقاً من المخزن المؤقت تحتفظ بوقتها
+    visited_at = models.DateTimeField(default=timezone.now, editable=False, db_index=True, verbose_name="تاريخ الزيارة")
 
     class Meta:
         verbose_name = "تتبع زائر"
@@ -322,6 +323,83 @@ class VisitorTracking(models.Model):
         return f"{self.ip_address} - {self.page_title} - {self.visited_at.strftime('%Y-%m-%d %H:%M')}"
 
 
+class DailyVisitorStats(models.Model):
+    """ملخص يومي مجمّع لسجلات تتبع الزوار (يُبنى بأمر rollup_analytics)"""
+    date = models.DateField(unique=True, verbose_name="اليوم")
+    page_views = models.PositiveIntegerField(default=0, verbose_name="مشاهدات الصفحات")
+    bounces = models.PositiveIntegerField(default=0, verbose_name="زيارات الارتداد")
+    total_duration = models.BigIntegerField(default=0, verbose_name="مجموع مدة الزيارات")
+    visitors_sketch = models.BinaryField(null=True, blank=True, verbose_name="رسم الجلسات الفريدة (HyperLogLog)")
+    ip_sketch = models.BinaryField(null=True, blank=True, verbose_name="رسم عناوين IP الفريدة (HyperLogLog)")
+
+    class Meta:
+        verbose_name = "ملخص زوار يومي"
+        verbose_name_plural = "ملخصات الزوار اليومية"
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date} - {self.page_views}"
+
+
+class DailyPageStats(models.Model):
+    """مشاهدات كل صفحة في اليوم"""
+    date = models.DateField(db_index=True, verbose_name="اليوم")
+    page_url = models.URLField(verbose_name="رابط الصفحة")
+    page_title = models.CharField(max_length=200, blank=True, verbose_name="عنوان الصفحة")
+    views = models.PositiveIntegerField(default=0, verbose_name="المشاهدات")
+    bounces = models.PositiveIntegerField(default=0, verbose_name="زيارات الارتداد")
+    total_duration = models.BigIntegerField(default=0, verbose_name="مجموع مدة الزيارات")
+
+    class Meta:
+        verbose_name = "إحصائيات صفحة يومية"
+        verbose_name_plural = "إحصائيات الصفحات اليومية"
+        ordering = ['-date', '-views']
+
+    def __str__(self):
+        return f"{self.date} - {self.page_url} - {self.views}"
+
+
+class DailyVisitorBreakdown(models.Model):
+    """توزيع الزيارات اليومي حسب الجهاز والمتصفح والبلد والمصدر"""
+    DIMENSIONS = [
+        ('device_type', 'نوع الجهاز'),
+        ('browser', 'المتصفح'),
+        ('country', 'البلد'),
+        ('referrer', 'المصدر'),
+    ]
+
+    date = models.DateField(db_index=True, verbose_name="اليوم")
+    dimension = models.CharField(max_length=20, choices=DIMENSIONS, verbose_name="البُعد")
+    value = models.CharField(max_length=200, blank=True, verbose_name="القيمة")
+    visits = models.PositiveIntegerField(default=0, verbose_name="الزيارات")
+
+    class Meta:
+        verbose_name = "توزيع زوار يومي"
+        verbose_name_plural = "توزيعات الزوار اليومية"
+        ordering = ['-date', 'dimension', '-visits']
+        unique_together = ['date', 'dimension', 'value']
+
+    def __str__(self):
+        return f"{self.date} - {self.dimension}: {self.value} ({self.visits})"
+
+
+class DailySubmissionStats(models.Model):
+    """عدد إرسالات كل نموذج حسب الحالة في اليوم"""
+    date = models.DateField(db_index=True, verbose_name="اليوم")
+    form = models.ForeignKey('DynamicForm', on_delete=models.CASCADE, verbose_name="النموذج")
+    status = models.CharField(max_length=20, verbose_name="الحالة")
+    submissions = models.PositiveIntegerField(default=0, verbose_name="الإرسالات")
+
+    class Meta:
+        verbose_name = "إحصائيات إرسالات يومية"
+        verbose_name_plural = "إحصائيات الإرسالات اليومية"
+        ordering = ['-date']
+        unique_together = ['date', 'form', 'status']
+
+    def __str__(self):
+        return f"{self.date} - {self.form_id} - {self.status}: {self.submissions}"
+
+
 class IntegrationSettings(models.Model):
     """نموذج إعدادات التكامل مع المنصات الخارجية"""
     PLATFORM_CHOICES = [
@@ -381,6 +459,32 @@ class PlatformReport(models.Model):
         return f"{self.integration.get_platform_display()} - {self.get_report_type_display()} - {self.date_from}"
 
 
+class CampaignDailyReport(models.Model):
+    """أداء حملة أو منشور على منصة خارجية في يوم واحد (صف لكل حملة ويوم)"""
+    platform = models.CharField(max_length=50, verbose_name="المنصة")
+    campaign_id = models.CharField(max_length=255, verbose_name="المعرف الخارجي للحملة")
+    report_date = models.DateField(db_index=True, verbose_name="تاريخ التقرير")
+    impressions = models.BigIntegerField(default=0, verbose_name="مرات الظهور")
+    clicks = models.BigIntegerField(default=0, verbose_name="النقرات")
+    spend = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="الإنفاق")
+    reach = models.BigIntegerField(default=0, verbose_name="الوصول")
+    ctr = models.FloatField(default=0, verbose_name="نسبة النقر")
+    cpc = models.FloatField(default=0, verbose_name="تكلفة النقرة")
+    cpm = models.FloatField(default=0, verbose_name="تكلفة الألف ظهور")
+    engagement_rate = models.FloatField(default=0, verbose_name="التفاعل")
+    data = models.JSONField(default=dict, verbose_name="البيانات الخام")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="تاريخ التحديث")
+
+    class Meta:
+        verbose_name = "تقرير أداء حملة يومي"
+        verbose_name_plural = "تقارير أداء الحملات اليومية"
+        ordering = ['-report_date']
+        unique_together = ['platform', 'campaign_id', 'report_date']
+
+    def __str__(self):
+        return f"{self.platform} - {self.campaign_id} - {self.report_date}"
+
+
 class AdCampaign(models.Model):
     """نموذج الحملات الإعلانية"""
     STATUS_CHOICES = [
@@ -441,6 +545,12 @@ class AnalyticsReport(models.Model):
         ('yearly', 'سنوي'),
         ('custom', 'مخصص'),
     ]
+    STATUS_CHOICES = [
+        ('pending', 'في الانتظار'),
+        ('running', 'قيد الإنشاء'),
+        ('completed', 'مكتمل'),
+        ('failed', 'فشل'),
+    ]
 
     title = models.CharField(max_length=200, verbose_name="عنوان التقرير")
     report_type = models.CharField(max_length=20, choices=REPORT_TYPES, verbose_name="نوع التقرير")
@@ -450,6 +560,9 @@ class AnalyticsReport(models.Model):
     form_submissions = models.JSONField(default=dict, verbose_name="إرسالات النماذج")
     visitor_insights = models.JSONField(default=dict, verbose_name="رؤى الزوار")
     platform_performance = models.JSONField(default=dict, verbose_name="أداء المنصات")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='completed', verbose_name="حالة الإنشاء")
+    error_message = models.TextField(blank=True, verbose_name="رسالة الخطأ")
+    unique_count = models.CharField(max_length=10, blank=True, verbose_name="طريقة عد الزوار الفريدين")
     generated_by = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="أنشئ بواسطة")
     generated_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الإنشاء")
 
@@ -689,3 +802,30 @@ class SystemSettings(models.Model):
     def __str__(self):
         return self.key
 
+
+
+class SearchDocument(models.Model):
+    """
+    مستند في فهرس البحث (مشروع، مهمة، مقال، صفحة)
+
+    النصوص المفهرسة مطبّعة مسبقاً؛ الفهرس نفسه يُبنى داخل قاعدة البيانات:
+    جدول FTS5 في SQLite أو عمود tsvector مع GIN في PostgreSQL (انظر cms/utils/search.py)
+    """
+    doc_type = models.CharField(max_length=20, verbose_name="نوع المستند")
+    object_id = models.PositiveBigIntegerField(verbose_name="معرف الكائن")
+    title = models.CharField(max_length=255, verbose_name="العنوان")
+    description = models.TextField(blank=True, verbose_name="المقتطف")
+    url = models.CharField(max_length=500, blank=True, verbose_name="الرابط")
+    owner_id = models.BigIntegerField(null=True, blank=True, db_index=True, verbose_name="معرف العميل المالك")
+    is_public = models.BooleanField(default=False, verbose_name="منشور للعامة")
+    indexed_title = models.TextField(blank=True, verbose_name="العنوان المفهرس")
+    indexed_body = models.TextField(blank=True, verbose_name="النص المفهرس")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="تاريخ التحديث")
+
+    class Meta:
+        verbose_name = "مستند بحث"
+        verbose_name_plural = "فهرس البحث"
+        unique_together = ['doc_type', 'object_id']
+
+    def __str__(self):
+        return f"{self.doc_type}:{self.object_id} - {self.title}"
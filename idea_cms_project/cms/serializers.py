@@ -1,10 +1,13 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db.models import Count, Q
 from .models import (
     Category, Tag, Media, Page, BlogPost, SiteSettings, ContactMessage,
     DynamicForm, FormSubmission, VisitorTracking, IntegrationSettings,
     PlatformReport, AdCampaign, AnalyticsReport
 )
+from .utils.user_agents import classify_user_agent
+from .utils.geoip import resolve_location
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -25,7 +28,11 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_posts_count(self, obj):
-        return obj.blogpost_set.filter(status='published').count()
+        # القيمة المحسوبة في استعلام القائمة (annotate) إن وجدت، وإلا استعلام منفصل
+        count = getattr(obj, 'published_posts_count', None)
+        if count is None:
+            count = obj.blogpost_set.filter(status='published').count()
+        return count
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -38,7 +45,11 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
     
     def get_posts_count(self, obj):
-        return obj.blogpost_set.filter(status='published').count()
+        # القيمة المحسوبة في استعلام القائمة (annotate) إن وجدت، وإلا استعلام منفصل
+        count = getattr(obj, 'published_posts_count', None)
+        if count is None:
+            count = obj.blogpost_set.filter(status='published').count()
+        return count
 
 
 class MediaSerializer(serializers.ModelSerializer):
@@ -390,50 +401,16 @@ class VisitorTrackingCreateSerializer(serializers.ModelSerializer):
         user_agent = request.META.get('HTTP_USER_AGENT', '') if request else ''
         
         # تحليل User Agent لاستخراج معلومات الجهاز والمتصفح
-        device_type = 'desktop'
-        browser = 'unknown'
-        operating_system = 'unknown'
-        
-        if user_agent:
-            user_agent_lower = user_agent.lower()
-            
-            # تحديد نوع الجهاز
-            if any(mobile in user_agent_lower for mobile in ['mobile', 'android', 'iphone', 'ipad']):
-                device_type = 'mobile'
-            elif 'tablet' in user_agent_lower:
-                device_type = 'tablet'
-            
-            # تحديد المتصفح
-            if 'chrome' in user_agent_lower:
-                browser = 'Chrome'
-            elif 'firefox' in user_agent_lower:
-                browser = 'Firefox'
-            elif 'safari' in user_agent_lower:
-                browser = 'Safari'
-            elif 'edge' in user_agent_lower:
-                browser = 'Edge'
-            
-            # تحديد نظام التشغيل
-            if 'windows' in user_agent_lower:
-                operating_system = 'Windows'
-            elif 'mac' in user_agent_lower:
-                operating_system = 'macOS'
-            elif 'linux' in user_agent_lower:
-                operating_system = 'Linux'
-            elif 'android' in user_agent_lower:
-                operating_system = 'Android'
-            elif 'ios' in user_agent_lower:
-                operating_system = 'iOS'
+        ua_info = classify_user_agent(user_agent)
         
         return VisitorTracking.objects.create(
             session_key=session_key,
             ip_address=ip_address,
             user_agent=user_agent,
-            device_type=device_type,
-            browser=browser,
-            operating_system=operating_system,
-            country='Saudi Arabia',  # يمكن تحسينها باستخدام خدمة GeoIP
-            city='Riyadh',
+            device_type=ua_info.device_type,
+            browser=ua_info.browser,
+            operating_system=ua_info.operating_system,
+            **resolve_location(ip_address),
             **validated_data
         )
 
@@ -518,8 +495,9 @@ class AnalyticsReportSerializer(serializers.ModelSerializer):
         model = AnalyticsReport
         fields = ['id', 'title', 'report_type', 'date_from', 'date_to', 
                  'website_analytics', 'form_submissions', 'visitor_insights', 
-                 'platform_performance', 'summary', 'generated_by', 'generated_at']
-        read_only_fields = ['id', 'generated_by', 'generated_at']
+                 'platform_performance', 'summary', 'status', 'error_message',
+                 'generated_by', 'generated_at']
+        read_only_fields = ['id', 'status', 'error_message', 'generated_by', 'generated_at']
     
     def get_summary(self, obj):
         """ملخص التقرير"""
@@ -613,14 +591,24 @@ class ProjectSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at']
     
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """ربط العميل والمدير وجلب أعضاء الفريق مسبقاً وعدّ المهام في نفس الاستعلام"""
+        return queryset.select_related('client', 'manager').prefetch_related('team_members').annotate(
+            tasks_total=Count('tasks'),
+            tasks_done=Count('tasks', filter=Q(tasks__status='done'))
+        )
+    
     def get_team_members_names(self, obj):
         return [member.get_full_name() or member.username for member in obj.team_members.all()]
     
     def get_tasks_count(self, obj):
-        return obj.tasks.count()
+        count = getattr(obj, 'tasks_total', None)
+        return obj.tasks.count() if count is None else count
     
     def get_completed_tasks_count(self, obj):
-        return obj.tasks.filter(status='done').count()
+        count = getattr(obj, 'tasks_done', None)
+        return obj.tasks.filter(status='done').count() if count is None else count
 
 class TaskSerializer(serializers.ModelSerializer):
     """مُسلسل المهام"""
@@ -637,6 +625,11 @@ class TaskSerializer(serializers.ModelSerializer):
             'actual_hours', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """ربط المشروع والمستخدمين في نفس الاستعلام"""
+        return queryset.select_related('project', 'assigned_to', 'created_by')
 
 class NotificationSerializer(serializers.ModelSerializer):
     """مُسلسل الإشعارات"""
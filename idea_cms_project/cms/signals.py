@@ -0,0 +1,114 @@
+"""
+إشارات النماذج: تحديث فهرس البحث واقتراحات البحث تدريجياً عند حفظ أو حذف المحتوى،
+وإبطال الاستجابات المخزنة المعتمدة عليه
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import BlogPost, Category, Media, Page, Project, SearchDocument, SiteSettings, Tag, Task
+from .utils.response_cache import invalidate_tags, model_tag
+from .utils.search import SEARCH_SOURCES, index_object, remove_object
+from .utils.suggest import remove_suggestion, suggest_doc_type, update_suggestions
+
+
+def _auto_index_enabled():
+    return getattr(settings, 'SEARCH_AUTO_INDEX', True)
+
+
+def update_search_index(sender, instance, raw=False, **kwargs):
+    """إعادة فهرسة الكائن بعد حفظه (يتم تجاهل تحميل fixtures)"""
+    if raw or not _auto_index_enabled():
+        return
+    index_object(instance)
+
+
+def remove_from_search_index(sender, instance, **kwargs):
+    if _auto_index_enabled():
+        remove_object(instance)
+
+
+for source in SEARCH_SOURCES.values():
+    post_save.connect(update_search_index, sender=source.model, dispatch_uid=f'search_index_save_{source.doc_type}')
+    post_delete.connect(remove_from_search_index, sender=source.model,
+                        dispatch_uid=f'search_index_delete_{source.doc_type}')
+
+
+@receiver(post_save, sender=Project, dispatch_uid='search_index_task_owners')
+def update_task_owners(sender, instance, created, raw=False, **kwargs):
+    """مهام المشروع تتبع عميله في صلاحيات البحث، فتتغير معه عند نقل المشروع لعميل آخر"""
+    if raw or created or not _auto_index_enabled():
+        return
+    updated = SearchDocument.objects.filter(
+        doc_type='task', object_id__in=instance.tasks.values('id')
+    ).exclude(owner_id=instance.client_id).update(owner_id=instance.client_id)
+    if updated:
+        tasks = list(instance.tasks.select_related('project'))
+        transaction.on_commit(lambda: update_suggestions(tasks))
+
+
+SUGGEST_MODELS = (Project, Task, BlogPost, Tag, Category)
+
+
+# فهرس الاقتراحات في الذاكرة لا يتراجع مع المعاملة، لذا يُحدّث بعد تأكيدها فقط
+def update_suggest_index(sender, instance, raw=False, **kwargs):
+    if raw or not _auto_index_enabled():
+        return
+    transaction.on_commit(lambda: update_suggestions([instance]))
+
+
+def remove_from_suggest_index(sender, instance, **kwargs):
+    if not _auto_index_enabled():
+        return
+    doc_type, object_id = suggest_doc_type(instance), instance.pk
+    if doc_type is not None:
+        transaction.on_commit(lambda: remove_suggestion(doc_type, object_id))
+
+
+for model in SUGGEST_MODELS:
+    post_save.connect(update_suggest_index, sender=model, dispatch_uid=f'search_suggest_save_{model.__name__}')
+    post_delete.connect(remove_from_suggest_index, sender=model,
+                        dispatch_uid=f'search_suggest_delete_{model.__name__}')
+
+
+# نماذج تظهر في الاستجابات العامة المخزنة، والحقول التي لا يغيّر حفظها وحدها تلك الاستجابات
+RESPONSE_CACHE_MODELS = {
+    BlogPost: (),
+    Category: (),
+    Tag: (),
+    Page: (),
+    Media: (),
+    SiteSettings: (),
+    User: ('last_login',),
+}
+
+
+def _invalidate_responses(model, pk):
+    # بعد تأكيد المعاملة، حتى لا يُعاد حساب استجابة من البيانات القديمة بالنسخة الجديدة للوسم
+    transaction.on_commit(lambda: invalidate_tags(model_tag(model), model_tag(model, pk)))
+
+
+def invalidate_cached_responses(sender, instance, raw=False, update_fields=None, **kwargs):
+    ignored = RESPONSE_CACHE_MODELS.get(sender, ())
+    if raw or (update_fields and ignored and set(update_fields) <= set(ignored)):
+        return
+    _invalidate_responses(sender, instance.pk)
+
+
+for model in RESPONSE_CACHE_MODELS:
+    post_save.connect(invalidate_cached_responses, sender=model,
+                      dispatch_uid=f'response_cache_save_{model.__name__}')
+    post_delete.connect(invalidate_cached_responses, sender=model,
+                        dispatch_uid=f'response_cache_delete_{model.__name__}')
+
+
+@receiver(m2m_changed, sender=BlogPost.tags.through, dispatch_uid='response_cache_post_tags')
+def invalidate_post_tags(sender, instance, action, **kwargs):
+    """تغيير وسوم مقال يغيّر المقال نفسه وأعداد مقالات الوسوم"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    tags = (model_tag(BlogPost), model_tag(Tag), model_tag(type(instance), instance.pk))
+    transaction.on_commit(lambda: invalidate_tags(*tags))
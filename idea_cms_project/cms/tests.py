@@ -1,3 +1,1087 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError
+from django.http import HttpResponse, JsonResponse
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .middleware import DEFAULT_PAGE_TITLE, TITLE_SCAN_BYTES, CacheControlMiddleware, VisitorTrackingMiddleware
+from .models import (
+    AnalyticsReport, BlogPost, CampaignDailyReport, Category, DynamicForm, FormSubmission, Project, Tag, Task,
+    VisitorTracking,
+)
+from .utils.analytics import visit_analytics
+from .utils.reports import request_report
+from .utils.rollups import run_rollups, submission_rollup_stats, visit_rollup_analytics
+from .utils.platform_metrics import invalidate_platform_metrics, unified_report_data
+from .utils.response_cache import request_key
+from .utils import geoip, search, static_assets, suggest
+from .utils.cdn import CDNRewriter
+from .utils.compression import negotiate
+from .utils.counters import ViewCounter
+from .utils.graph_api import GraphAPIClient, GraphAPIError, RateLimiter
+from .utils.graph_stub import GraphAPIStub
+from .utils.hyperloglog import DEFAULT_PRECISION, HyperLogLog
+from .utils.search import filter_by_relevance
+from .utils.user_agents import UNKNOWN, UserAgentInfo, classify_user_agent
+from .utils.visit_buffer import VisitBuffer
+
+
+def visit_record(**overrides):
+    record = {
+        'session_key': 'test-session',
+        'ip_address': '127.0.0.1',
+        'user_agent': 'Mozilla/5.0',
+        'referrer': '',
+        'page_url': 'http://testserver/',
+        'page_title': 'الرئيسية',
+        'country': '',
+        'city': '',
+    }
+    record.update(overrides)
+    return record
+
+
+class VisitBufferTests(TestCase):
+    """الكتابة المجمعة لسجلات الزيارات"""
+
+    def test_failed_batch_is_retried_row_by_row(self):
+        visit_buffer = VisitBuffer(max_batch_size=10)
+        for index in range(3):
+            visit_buffer._pending.append(visit_record(page_url=f'http://testserver/{index}'))
+        # سجل غير صالح يُفشل الدفعة كاملة
+        visit_buffer._pending.append(visit_record(ip_address=None))
+
+        with self.assertLogs('cms.utils.visit_buffer', level='ERROR'):
+            self.assertEqual(visit_buffer.flush(), 3)
+
+        self.assertEqual(VisitorTracking.objects.count(), 3)
+        stats = visit_buffer.stats()
+        self.assertEqual((stats['flushed'], stats['failed'], stats['pending']), (3, 1, 0))
+
+    def test_long_urls_are_truncated_to_field_length(self):
+        long_url = 'http://testserver/' + 'a' * 500
+        self.assertEqual(len(VisitorTrackingMiddleware._fit_field('page_url', long_url)), 200)
+        self.assertEqual(len(VisitorTrackingMiddleware._fit_field('referrer', long_url)), 200)
+        self.assertEqual(VisitorTrackingMiddleware._fit_field('referrer', ''), '')
+
+    def test_unavailable_database_keeps_batch_pending(self):
+        visit_buffer = VisitBuffer(max_batch_size=10)
+        visited_at = timezone.now() - timedelta(hours=3)
+        for index in range(3):
+            visit_buffer._pending.append(visit_record(page_url=f'http://testserver/{index}', visited_at=visited_at))
+
+        outage = mock.patch.object(VisitorTracking.objects, 'bulk_create', side_effect=OperationalError('down'))
+        with outage, self.assertLogs('cms.utils.visit_buffer', level='ERROR'):
+            self.assertEqual(visit_buffer.flush(), 0)
+        stats = visit_buffer.stats()
+        self.assertEqual((stats['failed'], stats['requeued'], stats['pending']), (0, 3, 3))
+        self.assertEqual(visit_buffer._pending[0]['page_url'], 'http://testserver/0')
+
+        # بعد عودة قاعدة البيانات تُكتب السجلات بوقت الزيارة الأصلي
+        self.assertEqual(visit_buffer.flush(), 3)
+        self.assertEqual(list(VisitorTracking.objects.values_list('visited_at', flat=True).distinct()), [visited_at])
+
+    def test_requeue_respects_overflow_policy(self):
+        for policy, expected in (('drop_oldest', ['c', 'x', 'y']), ('drop_newest', ['a', 'b', 'c']),
+                                 ('flush', ['a', 'b', 'c', 'x', 'y'])):
+            with self.subTest(policy=policy):
+                visit_buffer = VisitBuffer(max_batch_size=1, max_pending=3, overflow_policy=policy)
+                visit_buffer._pending.extend([{'page_url': 'x'}, {'page_url': 'y'}])
+                visit_buffer._requeue([{'page_url': name} for name in 'abc'])
+                self.assertEqual([record['page_url'] for record in visit_buffer._pending], expected)
+
+
+class UserAgentClassifierTests(SimpleTestCase):
+    """تصنيف User Agent بالنمط المجمّع"""
+
+    CASES = [
+        ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+         'Chrome/120.0.0.0 Safari/537.36', ('desktop', 'Chrome', 'Windows', False)),
+        ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+         'Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0', ('desktop', 'Edge', 'Windows', False)),
+        ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+         'Chrome/120.0.0.0 Safari/537.36 OPR/106.0.0.0', ('desktop', 'Opera', 'Windows', False)),
+        ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+         'Version/17.1 Safari/605.1.15', ('desktop', 'Safari', 'macOS', False)),
+        ('Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0',
+         ('desktop', 'Firefox', 'Linux', False)),
+        ('Mozilla/5.0 (X11; CrOS x86_64 14541.0.0) AppleWebKit/537.36 (KHTML, like Gecko) '
+         'Chrome/120.0.0.0 Safari/537.36', ('desktop', 'Chrome', 'ChromeOS', False)),
+        ('Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+         'CriOS/120.0.6099.119 Mobile/15E148 Safari/604.1', ('mobile', 'Chrome', 'iOS', False)),
+        ('Mozilla/5.0 (iPad; CPU OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+         'Version/17.1 Mobile/15E148 Safari/604.1', ('tablet', 'Safari', 'iOS', False)),
+        ('Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) '
+         'SamsungBrowser/23.0 Chrome/115.0.0.0 Mobile Safari/537.36', ('mobile', 'Samsung Internet', 'Android', False)),
+        ('Mozilla/5.0 (Linux; Android 13; SM-X710) AppleWebKit/537.36 (KHTML, like Gecko) '
+         'Chrome/120.0.0.0 Safari/537.36', ('tablet', 'Chrome', 'Android', False)),
+        ('Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+         ('desktop', UNKNOWN, UNKNOWN, True)),
+        ('', ('desktop', UNKNOWN, UNKNOWN, False)),
+    ]
+
+    def test_classification_table(self):
+        for user_agent, expected in self.CASES:
+            with self.subTest(user_agent=user_agent):
+                self.assertEqual(classify_user_agent(user_agent), UserAgentInfo(*expected))
+
+    def test_result_is_shared_through_the_cache(self):
+        user_agent = self.CASES[0][0]
+        self.assertIs(classify_user_agent(user_agent), classify_user_agent(user_agent))
+
+
+class GeoIPResolverTests(SimpleTestCase):
+    """البحث الثنائي في قاعدة النطاقات المحلية وإعادة تحميلها عند استبدال الملف"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'geoip.bin')
+        settings_override = override_settings(GEOIP_DATABASE_PATH=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        geoip.reset_geoip_resolver()
+        self.addCleanup(geoip.reset_geoip_resolver)
+
+    def build(self, ranges):
+        # الاستبدال الذري كما يفعل build_geoip_db
+        geoip.write_database(f'{self.path}.tmp', [
+            (geoip.ip_to_int(start), geoip.ip_to_int(end), country, city) for start, end, country, city in ranges
+        ])
+        os.replace(f'{self.path}.tmp', self.path)
+
+    def test_lookup_hits_and_misses(self):
+        self.build([('10.0.0.0', '10.0.0.255', 'SA', 'Riyadh'), ('10.0.2.0', '10.0.2.255', 'EG', 'Cairo')])
+        for ip_address, expected in (
+            ('10.0.0.0', ('SA', 'Riyadh')), ('10.0.0.255', ('SA', 'Riyadh')), ('10.0.2.7', ('EG', 'Cairo')),
+            ('10.0.1.1', (geoip.UNKNOWN, geoip.UNKNOWN)), ('9.255.255.255', (geoip.UNKNOWN, geoip.UNKNOWN)),
+            ('::1', (geoip.UNKNOWN, geoip.UNKNOWN)),
+        ):
+            with self.subTest(ip_address=ip_address):
+                location = geoip.resolve_location(ip_address)
+                self.assertEqual((location['country'], location['city']), expected)
+
+    def test_replaced_database_is_picked_up(self):
+        # عملية بدأت قبل وجود الملف
+        with self.assertLogs('cms.utils.geoip', level='WARNING'):
+            self.assertEqual(geoip.resolve_location('10.0.0.1')['country'], geoip.UNKNOWN)
+        self.build([('10.0.0.0', '10.0.0.255', 'SA', 'Riyadh')])
+
+        # الفحص محدود بالفترة
+        self.assertEqual(geoip.resolve_location('10.0.0.1')['country'], geoip.UNKNOWN)
+        with mock.patch.object(geoip, 'GEOIP_CHECK_INTERVAL', 0):
+            self.assertEqual(geoip.resolve_location('10.0.0.1')['country'], 'SA')
+            self.build([('10.0.0.0', '10.0.0.255', 'AE', 'Dubai')])
+            self.assertEqual(geoip.resolve_location('10.0.0.1'), {'country': 'AE', 'city': 'Dubai'})
+
+
+class PageTitleExtractionTests(SimpleTestCase):
+    """استخراج عنوان الصفحة من بداية المحتوى فقط"""
+
+    def setUp(self):
+        self.middleware = VisitorTrackingMiddleware(lambda request: HttpResponse())
+
+    def page_with_title_at(self, end, title='عنوان &amp; الصفحة'):
+        # عنوان ينتهي وسم إغلاقه عند البايت end من المحتوى
+        tag = f'<title>{title}</title>'.encode()
+        return HttpResponse(b' ' * (end - len(tag)) + tag + b'<body>' + b'x' * 1000 + b'</body>',
+                            content_type='text/html; charset=utf-8')
+
+    def test_title_at_prefix_boundary(self):
+        response = self.page_with_title_at(TITLE_SCAN_BYTES)
+        self.assertEqual(self.middleware._extract_page_title(response), 'عنوان & الصفحة')
+
+    def test_title_crossing_prefix_boundary_is_ignored(self):
+        for end in (TITLE_SCAN_BYTES + 1, TITLE_SCAN_BYTES + 500):
+            with self.subTest(end=end):
+                response = self.page_with_title_at(end)
+                self.assertEqual(self.middleware._extract_page_title(response), DEFAULT_PAGE_TITLE)
+
+    def test_non_html_and_explicit_titles(self):
+        self.assertEqual(self.middleware._extract_page_title(JsonResponse({'title': 'x'})), DEFAULT_PAGE_TITLE)
+        response = self.page_with_title_at(100)
+        response.page_title = 'من الـ view ' * 30
+        self.assertEqual(len(self.middleware._extract_page_title(response)), 200)
+
+
+def seed_visits(first_day, days, per_day=12):
+    """زيارات متنوعة موزعة على أيام متتالية، ويعيدها كقائمة"""
+    visits = []
+    for offset in range(days):
+        start = timezone.make_aware(datetime.combine(first_day + timedelta(days=offset), time.min))
+        for index in range(per_day):
+            number = offset * per_day + index
+            visits.append(VisitorTracking(
+                session_key=f'session-{number % 7}', ip_address='10.0.0.1', user_agent='Mozilla/5.0',
+                referrer=['', 'https://google.com/', 'https://facebook.com/'][number % 3],
+                page_url=f'http://testserver/page-{number % 5}/', page_title=f'صفحة {number % 5}',
+                visit_duration=number * 10, is_bounce=number % 4 == 0,
+                device_type=['desktop', 'mobile', 'desktop', 'tablet'][number % 4],
+                browser=['Chrome', 'Safari', 'Firefox', 'Edge'][number % 4], country=['SA', 'EG'][number % 2],
+                visited_at=start + timedelta(hours=index * 2),
+            ))
+    return VisitorTracking.objects.bulk_create(visits)
+
+
+class VisitAnalyticsTests(TestCase):
+    """تحليلات الزوار بتجميع واحد ومرور واحد للتوزيعات"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.visits = seed_visits(timezone.localdate() - timedelta(days=3), 3)
+
+    def test_matches_per_row_counts(self):
+        with self.assertNumQueries(2):
+            analytics = visit_analytics(VisitorTracking.objects.all())
+
+        visits = self.visits
+        pages = Counter((visit.page_url, visit.page_title) for visit in visits)
+        referrers = Counter(visit.referrer for visit in visits if visit.referrer)
+        self.assertEqual(analytics['total_visitors'], len({visit.session_key for visit in visits}))
+        self.assertEqual(analytics['total_page_views'], len(visits))
+        self.assertEqual(analytics['bounce_rate'],
+                         round(sum(visit.is_bounce for visit in visits) / len(visits) * 100, 2))
+        self.assertEqual(analytics['avg_session_duration'],
+                         round(sum(visit.visit_duration for visit in visits) / len(visits), 2))
+        self.assertCountEqual(analytics['top_pages'], [
+            {'page_url': page_url, 'page_title': page_title, 'views': views}
+            for (page_url, page_title), views in pages.items()
+        ])
+        self.assertCountEqual(analytics['top_referrers'], [
+            {'referrer': referrer, 'visits': count} for referrer, count in referrers.items()
+        ])
+        for key, field in (('device_breakdown', 'device_type'), ('browser_breakdown', 'browser'),
+                           ('country_breakdown', 'country')):
+            self.assertEqual(analytics[key], Counter(getattr(visit, field) for visit in visits))
+
+    def test_empty_queryset(self):
+        analytics = visit_analytics(VisitorTracking.objects.none())
+        self.assertEqual((analytics['total_page_views'], analytics['bounce_rate'], analytics['top_pages']), (0, 0, []))
+
+
+class RollupAnalyticsTests(TestCase):
+    """التحليلات من جداول التجميع اليومية تطابق التحليلات من السجلات الخام"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        cls.first_day = cls.today - timedelta(days=5)
+        seed_visits(cls.first_day, 6)
+        user = User.objects.create_user('rollup-staff', password='test', is_staff=True)
+        form = DynamicForm.objects.create(name='استشارة', form_type='consultation', created_by=user)
+        for index in range(12):
+            submission = FormSubmission.objects.create(form=form, submission_data={}, status=['new', 'completed'][index % 2])
+            FormSubmission.objects.filter(pk=submission.pk).update(
+                submitted_at=timezone.now() - timedelta(days=index % 6)
+            )
+        # الأيام حتى قبل أمس مجمعة، وأمس واليوم من السجلات الخام
+        run_rollups(until=cls.today - timedelta(days=2))
+
+    def raw_analytics(self, date_from, date_to):
+        visits = VisitorTracking.objects.filter(visited_at__date__gte=date_from, visited_at__date__lte=date_to)
+        return visit_analytics(visits)
+
+    def assertSameAnalytics(self, rolled, raw):
+        for key in ('top_pages', 'top_referrers'):
+            self.assertCountEqual(rolled.pop(key), raw.pop(key))
+        self.assertEqual(rolled, raw)
+
+    def test_visit_analytics_match_raw_rows(self):
+        for date_from, date_to in (
+            (self.first_day, self.today),  # تجميعات + سجلات خام
+            (self.first_day + timedelta(days=1), self.today - timedelta(days=3)),  # تجميعات فقط
+            (self.today - timedelta(days=1), self.today),  # سجلات خام فقط
+        ):
+            with self.subTest(date_from=date_from, date_to=date_to):
+                rolled = visit_rollup_analytics(date_from, date_to, unique='exact')
+                self.assertGreater(rolled['total_page_views'], 0)
+                self.assertSameAnalytics(rolled, self.raw_analytics(date_from, date_to))
+
+    def test_approx_unique_visitors_match_exact(self):
+        exact = visit_rollup_analytics(self.first_day, self.today, unique='exact')['total_visitors']
+        approx = visit_rollup_analytics(self.first_day, self.today, unique='approx')['total_visitors']
+        self.assertEqual((exact, approx), (7, 7))
+
+    def test_submission_stats_match_raw_rows(self):
+        stats = submission_rollup_stats(self.first_day, self.today)
+        self.assertEqual(stats['total_submissions'], 12)
+        self.assertEqual(stats['submissions_by_form'], {'استشارة': 12})
+        self.assertEqual(stats['submissions_by_status'], {'new': 6, 'completed': 6})
+
+
+class HyperLogLogTests(SimpleTestCase):
+    """دقة رسوم HyperLogLog بعد الدمج والتخزين"""
+
+    # ثلاثة أضعاف الخطأ المعياري 1.04 / sqrt(2^14)
+    TOLERANCE = 3 * 1.04 / (1 << DEFAULT_PRECISION) ** 0.5
+
+    def daily_sketches(self, days=30, per_day=2000, step=1000):
+        # أيام متداخلة: نصف زوار كل يوم عادوا من اليوم السابق
+        sketches = []
+        for day in range(days):
+            sketch = HyperLogLog()
+            sketch.update(f'session-{value}' for value in range(day * step, day * step + per_day))
+            sketches.append(sketch)
+        return sketches, (days - 1) * step + per_day
+
+    def test_merged_count_within_error_bounds(self):
+        sketches, expected = self.daily_sketches()
+        merged = HyperLogLog()
+        for sketch in sketches:
+            merged.merge(sketch)
+        self.assertLess(abs(merged.count() - expected) / expected, self.TOLERANCE)
+
+        # الدمج من القيم المخزنة يطابق الدمج في الذاكرة
+        stored = HyperLogLog.merged([sketch.to_bytes() for sketch in sketches] + [None])
+        self.assertEqual(stored.registers, merged.registers)
+
+    def test_merge_is_idempotent_for_repeated_visitors(self):
+        sketches, _ = self.daily_sketches(days=1)
+        merged = HyperLogLog.merged([sketches[0].to_bytes()] * 5)
+        self.assertEqual(merged.count(), sketches[0].count())
+
+    def test_small_counts_use_linear_counting(self):
+        sketch = HyperLogLog()
+        sketch.update(range(100))
+        self.assertLessEqual(abs(sketch.count() - 100), 2)
+        self.assertEqual(HyperLogLog().count(), 0)
+
+    def test_precision_mismatch(self):
+        with self.assertRaises(ValueError):
+            HyperLogLog(12).merge(HyperLogLog(14))
+        with self.assertRaises(ValueError):
+            HyperLogLog.merged([HyperLogLog(12).to_bytes()])
+
+
+class FormSubmissionStatsTests(TestCase):
+    """إحصائيات الإرسالات بعدد ثابت من الاستعلامات مهما كانت الفترة"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='test', is_staff=True)
+        forms = [
+            DynamicForm.objects.create(name=f'نموذج {index}', form_type=form_type, created_by=cls.user)
+            for index, form_type in enumerate(['consultation', 'contact', 'custom'])
+        ]
+        now = timezone.now()
+        statuses = ['new', 'in_progress', 'completed', 'cancelled']
+        for index in range(40):
+            submission = FormSubmission.objects.create(
+                form=forms[index % len(forms)], submission_data={'name': f'عميل {index}'},
+                status=statuses[index % len(statuses)],
+            )
+            submitted_at = now - timedelta(days=index * 9)
+            FormSubmission.objects.filter(pk=submission.pk).update(
+                submitted_at=submitted_at,
+                processed_at=submitted_at + timedelta(hours=2) if submission.status == 'completed' else None,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_query_count_does_not_depend_on_window(self):
+        url = reverse('formsubmission-stats')
+        for days in (7, 30, 365):
+            with self.subTest(days=days), self.assertNumQueries(3):
+                response = self.client.get(url, {'days': days})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['total_submissions'], 40)
+            self.assertEqual(len(response.data['submissions_by_date']), days)
+
+
+@override_settings(BACKGROUND_JOBS={'ENABLED': False}, ANALYTICS_UNIQUE_COUNT='approx')
+class AnalyticsReportDedupeTests(TestCase):
+    """دمج طلبات التقارير المتطابقة قيد التنفيذ"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('analyst', password='test')
+        self.date_to = timezone.now().date()
+        self.date_from = self.date_to - timedelta(days=7)
+        self.pending = AnalyticsReport.objects.create(
+            title='قيد التنفيذ', report_type='weekly', date_from=self.date_from, date_to=self.date_to,
+            generated_by=self.user, status='pending', unique_count='exact',
+        )
+
+    def test_same_unique_mode_shares_in_flight_report(self):
+        report, created = request_report('أسبوعي', 'weekly', self.date_from, self.date_to, self.user, unique='exact')
+        self.assertFalse(created)
+        self.assertEqual(report.pk, self.pending.pk)
+
+    def test_different_unique_mode_gets_its_own_report(self):
+        for unique in ('approx', None):
+            with self.subTest(unique=unique):
+                report, created = request_report('أسبوعي', 'weekly', self.date_from, self.date_to, self.user,
+                                                 unique=unique)
+                self.assertTrue(created)
+                self.assertNotEqual(report.pk, self.pending.pk)
+                self.assertEqual(report.unique_count, 'approx')
+                self.assertEqual(report.status, 'completed')
+
+
+class ResponseCacheTests(TestCase):
+    """ذاكرة استجابات الواجهات العامة"""
+
+    def setUp(self):
+        cache.clear()
+        Category.objects.create(name='تسويق', slug='marketing')
+        self.url = reverse('category-list')
+
+    @override_settings(ALLOW_PROCESS_LOCAL_CACHE=True)
+    def test_invalidated_on_save(self):
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='تصميم', slug='design')
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()['results']), 2)
+
+    @override_settings(ALLOW_PROCESS_LOCAL_CACHE=True)
+    def test_computes_directly_while_another_request_recomputes(self):
+        request = Request(APIRequestFactory().get(self.url))
+        cache.add(f'{request_key(request)}:lock', 1, 10)
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'BYPASS')
+        self.assertEqual(len(response.json()['results']), 1)
+
+    @override_settings(ALLOW_PROCESS_LOCAL_CACHE=False)
+    def test_disabled_with_process_local_cache(self):
+        self.client.get(self.url)
+        self.assertFalse(self.client.get(self.url).has_header('X-Cache'))
+
+
+class RuntimeMetricsApiTests(TestCase):
+    """عدادات الذاكرات المؤقتة الداخلية للمدراء فقط، وعدادات المخزن المؤقت للزيارات وحدها"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('metrics-staff', password='test', is_staff=True)
+        cls.member = User.objects.create_user('metrics-member', password='test')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_metrics_require_admin(self):
+        url = reverse('api_runtime_metrics')
+        self.client.force_authenticate(self.member)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {
+            'user_agent_cache', 'geoip_cache', 'response_cache', 'etag_cache', 'compression', 'cdn_rewrite',
+        })
+
+    def test_buffer_stats_report_visit_buffer_only(self):
+        self.client.force_authenticate(self.member)
+        response = self.client.get(reverse('visitortracking-buffer-stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(set(response.data) <= {'enabled', *VisitBuffer().stats()})
+
+
+class PlatformSummaryTests(TestCase):
+    """ملخص المنصات من استعلام GROUP BY واحد بمعدلات موزونة"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('platform-staff', password='test', is_staff=True)
+        today = timezone.localdate()
+        rows = [
+            # (المنصة، الحملة، قبل كم يوم، الظهور، النقرات، الإنفاق)
+            ('facebook', 'fb-1', 1, 1000, 10, '5.00'),
+            ('facebook', 'fb-1', 2, 9000, 450, '45.00'),
+            ('facebook', 'fb-2', 1, 0, 0, '0.00'),
+            ('instagram', 'ig-1', 3, 2000, 20, '10.00'),
+            ('instagram', 'ig-1', 30, 5000, 500, '50.00'),  # خارج الفترة
+        ]
+        CampaignDailyReport.objects.bulk_create([
+            CampaignDailyReport(platform=platform, campaign_id=campaign_id, report_date=today - timedelta(days=days_ago),
+                                impressions=impressions, clicks=clicks, spend=spend, reach=impressions // 2)
+            for platform, campaign_id, days_ago, impressions, clicks, spend in rows
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_summary_is_one_weighted_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('platformreport-summary'), {'days': 7})
+        self.assertEqual(response.status_code, 200)
+
+        facebook = response.data['platforms']['facebook']
+        self.assertEqual((facebook['total_impressions'], facebook['total_clicks'], facebook['campaigns_count']),
+                         (10000, 460, 2))
+        # مجموع النقرات / مجموع الظهور، وليس متوسط نسب الأيام
+        self.assertAlmostEqual(facebook['avg_ctr'], 4.6)
+        self.assertAlmostEqual(facebook['avg_cpc'], 50 / 460)
+
+        summary = response.data['summary']
+        self.assertEqual((summary['total_impressions'], summary['total_clicks'], summary['total_campaigns']),
+                         (12000, 480, 3))
+        self.assertAlmostEqual(summary['overall_ctr'], 4.0)
+        self.assertAlmostEqual(summary['total_spend'], 60.0)
+
+
+class UnifiedReportCacheTests(TestCase):
+    """التقرير الموحد للمنصات مخزن حتى المزامنة التالية"""
+
+    def setUp(self):
+        cache.clear()
+        self.date_to = timezone.now().date()
+        self.date_from = self.date_to - timedelta(days=30)
+
+    @override_settings(ALLOW_PROCESS_LOCAL_CACHE=True)
+    def test_cached_until_invalidated(self):
+        unified_report_data(self.date_from, self.date_to)
+        with self.assertNumQueries(0):
+            unified_report_data(self.date_from, self.date_to)
+        invalidate_platform_metrics()
+        with self.assertNumQueries(1):
+            unified_report_data(self.date_from, self.date_to)
+
+    @override_settings(ALLOW_PROCESS_LOCAL_CACHE=False)
+    def test_not_cached_with_process_local_cache(self):
+        unified_report_data(self.date_from, self.date_to)
+        with self.assertNumQueries(1):
+            unified_report_data(self.date_from, self.date_to)
+
+
+@override_settings(ALLOW_PROCESS_LOCAL_CACHE=False)
+class TaxonomyQueryCountTests(TestCase):
+    """عدد المقالات المنشورة لكل تصنيف ووسم في نفس استعلام القائمة"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author', password='test')
+        cls.categories = [Category.objects.create(name=f'تصنيف {i}', slug=f'category-{i}') for i in range(4)]
+        cls.tags = [Tag.objects.create(name=f'وسم {i}', slug=f'tag-{i}') for i in range(6)]
+        cls.published = {'category': {}, 'tag': {}}
+        for index in range(24):
+            category = cls.categories[index % 4]
+            post_tags = [cls.tags[index % 6], cls.tags[(index + 1) % 6]]
+            status = 'published' if index % 3 else 'draft'
+            post = BlogPost.objects.create(
+                title=f'مقال {index}', slug=f'post-{index}', content='محتوى', category=category,
+                author=author, status=status,
+            )
+            post.tags.set(post_tags)
+            if status == 'published':
+                counts = cls.published['category']
+                counts[category.slug] = counts.get(category.slug, 0) + 1
+                for tag in post_tags:
+                    cls.published['tag'][tag.slug] = cls.published['tag'].get(tag.slug, 0) + 1
+
+    def assert_counts(self, kind, items):
+        for item in items:
+            self.assertEqual(item['posts_count'], self.published[kind].get(item['slug'], 0), item['slug'])
+
+    def test_list_and_retrieve(self):
+        for kind, objects in (('category', self.categories), ('tag', self.tags)):
+            with self.subTest(kind=kind):
+                with self.assertNumQueries(2):
+                    response = self.client.get(reverse(f'{kind}-list'))
+                results = response.json()['results']
+                self.assertEqual(len(results), len(objects))
+                self.assert_counts(kind, results)
+
+                with self.assertNumQueries(1):
+                    response = self.client.get(reverse(f'{kind}-detail', args=[objects[1].slug]))
+                self.assert_counts(kind, [response.json()])
+
+
+class ProjectTaskListQueryCountTests(TestCase):
+    """قوائم المشاريع والمهام بعدد ثابت من الاستعلامات مهما زاد عدد الصفوف"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('project-manager', password='test', first_name='مدير')
+        members = [User.objects.create_user(f'member-{index}', password='test') for index in range(3)]
+        for index in range(8):
+            project = Project.objects.create(
+                title=f'مشروع {index}', description='وصف', client=members[index % 3], manager=cls.user,
+                start_date=timezone.localdate(), end_date=timezone.localdate() + timedelta(days=30),
+            )
+            project.team_members.set(members[:index % 3 + 1])
+            for number in range(index % 4 + 1):
+                Task.objects.create(title=f'مهمة {index}-{number}', project=project, assigned_to=members[number % 3],
+                                    created_by=cls.user, status='done' if number % 2 else 'todo')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_project_list(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('api_projects_list'))
+        results = response.json()['results']
+        self.assertEqual(len(results), 8)
+        for project in results:
+            tasks = Task.objects.filter(project_id=project['id'])
+            self.assertEqual(project['tasks_count'], tasks.count())
+            self.assertEqual(project['completed_tasks_count'], tasks.filter(status='done').count())
+            self.assertEqual(len(project['team_members_names']), len(project['team_members']))
+
+    def test_task_list(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('api_tasks_list'))
+        results = response.json()['results']
+        self.assertEqual(len(results), Task.objects.count())
+        self.assertTrue(all(task['project_title'] and task['created_by_name'] == 'مدير' for task in results))
+
+
+class UserActivityApiTests(TestCase):
+    """نشاط المستخدمين باستعلام واحد للصفحة دون تكرار العد بسبب الربط بين المهام والمشاريع"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('admin', password='test', is_staff=True)
+        cls.users = [User.objects.create_user(f'member{i}', password='test') for i in range(4)]
+        User.objects.create_user('inactive', password='test', is_active=False)
+        first, second, third, fourth = cls.users
+        today = timezone.now().date()
+
+        def project(title, client, manager, team):
+            project = Project.objects.create(title=title, description='وصف', client=client, manager=manager,
+                                             start_date=today, end_date=today + timedelta(days=30))
+            project.team_members.set(team)
+            return project
+
+        # first عميل ومدير وعضو فريق في نفس المشروع: يُعد مرة واحدة
+        alpha = project('ألفا', first, first, [first, second])
+        beta = project('بيتا', second, third, [first, third])
+        project('جاما', third, None, [])
+
+        for index, (user, status) in enumerate([
+            (first, 'done'), (first, 'done'), (first, 'todo'), (first, 'in_progress'),
+            (second, 'done'), (second, 'todo'), (third, 'todo'),
+        ]):
+            Task.objects.create(title=f'مهمة {index}', project=alpha if index % 2 else beta,
+                                assigned_to=user, created_by=cls.staff, status=status)
+
+        cls.expected = {
+            first.username: {'tasks_assigned': 4, 'tasks_completed': 2, 'projects_involved': 2},
+            second.username: {'tasks_assigned': 2, 'tasks_completed': 1, 'projects_involved': 2},
+            third.username: {'tasks_assigned': 1, 'tasks_completed': 0, 'projects_involved': 2},
+            fourth.username: {'tasks_assigned': 0, 'tasks_completed': 0, 'projects_involved': 0},
+            cls.staff.username: {'tasks_assigned': 0, 'tasks_completed': 0, 'projects_involved': 0},
+        }
+
+    def test_counts_and_query_count(self):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        with self.assertNumQueries(2):
+            response = client.get(reverse('api_user_activity'))
+        self.assertEqual(response.status_code, 200)
+
+        activity = {
+            row['username']: {key: row[key] for key in ('tasks_assigned', 'tasks_completed', 'projects_involved')}
+            for row in response.json()['activity']
+        }
+        self.assertEqual(activity, self.expected)
+
+
+class FilterByRelevanceTests(TestCase):
+    """البحث مع فلاتر الواجهة والتقسيم إلى صفحات"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('writer', password='test')
+        cls.marketing = Category.objects.create(name='تسويق', slug='marketing')
+        design = Category.objects.create(name='تصميم', slug='design')
+        # مقالات التصميم أعلى صلة (الكلمة في العنوان) من مقالات التسويق (الكلمة في النص فقط)،
+        # وعددها أكبر من صفحة واحدة في الواجهة
+        for index in range(25):
+            BlogPost.objects.create(title=f'هوية بصرية {index}', slug=f'design-{index}', content='تصميم هوية',
+                                    category=design, author=author, status='published')
+        for index in range(2):
+            BlogPost.objects.create(title=f'حملة {index}', slug=f'marketing-{index}', content='بناء الهوية للعلامة',
+                                    category=cls.marketing, author=author, status='published')
+        BlogPost.objects.create(title='أخبار', slug='news', content='لا علاقة', category=design, author=author,
+                                status='published')
+
+    def setUp(self):
+        cache.clear()
+
+    def check_relevance(self):
+        queryset = BlogPost.objects.filter(category=self.marketing)
+        self.assertEqual(sorted(post.slug for post in filter_by_relevance(queryset, 'blogpost', 'هوية')),
+                         ['marketing-0', 'marketing-1'])
+
+        results = [post.slug for post in filter_by_relevance(BlogPost.objects.all(), 'blogpost', 'هوية')]
+        self.assertEqual(len(results), 27)
+        self.assertTrue(all(slug.startswith('design-') for slug in results[:25]))
+        self.assertEqual(filter_by_relevance(BlogPost.objects.all(), 'blogpost', 'هوية').count(), 27)
+
+    def test_scope_and_relevance(self):
+        self.check_relevance()
+
+    @override_settings(SEARCH_BACKEND='cms.utils.search.SearchBackend')
+    def test_like_fallback_backend(self):
+        search._backends.clear()
+        self.addCleanup(search._backends.clear)
+        self.check_relevance()
+
+    def test_list_endpoint_pages_through_all_matches(self):
+        url = reverse('blogpost-list')
+        first = APIClient().get(url, {'search': 'هوية'}).json()
+        second = APIClient().get(url, {'search': 'هوية', 'page': 2}).json()
+        self.assertEqual(first['count'], 27)
+        slugs = [post['slug'] for post in first['results'] + second['results']]
+        self.assertEqual(len(slugs), 27)
+        self.assertEqual(len(set(slugs)), 27)
+        self.assertEqual(slugs[-2:], ['marketing-1', 'marketing-0'])
+
+
+@override_settings(BACKGROUND_JOBS={'ENABLED': False}, ALLOW_PROCESS_LOCAL_CACHE=True)
+class SuggestSyncTests(TestCase):
+    """مزامنة فهرس الاقتراحات بين العمليات عبر سجل التعديلات"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(setattr, suggest, '_suggest_index', None)
+        self.old = Tag.objects.create(name='تسويق رقمي', slug='digital')
+        self.index = suggest.rebuild_suggest_index()
+
+    def in_other_worker(self, func, *args):
+        # تعديل في عملية أخرى: لا يصل إلى فهرس هذه العملية إلا عبر الذاكرة المؤقتة
+        suggest._suggest_index = None
+        func(*args)
+        suggest._suggest_index = self.index
+        self.index.checked_at = 0
+
+    def titles(self, index, query):
+        return [entry.title for entry in index.suggest(query, [suggest.VIEW_ALL])]
+
+    def test_changes_from_other_workers_are_applied_as_deltas(self):
+        new = Tag.objects.create(name='تسويق المحتوى', slug='content')
+        self.in_other_worker(suggest.update_suggestions, [new])
+        self.in_other_worker(suggest.remove_suggestion, 'tag', self.old.pk)
+
+        with self.assertNumQueries(0):
+            index = suggest.get_suggest_index()
+        self.assertIs(index, self.index)
+        self.assertEqual(self.titles(index, 'تسو'), ['تسويق المحتوى'])
+
+    def test_lost_delta_schedules_background_rebuild(self):
+        new = Tag.objects.create(name='تسويق المحتوى', slug='content')
+        self.in_other_worker(suggest.update_suggestions, [new])
+        cache.delete(suggest.CACHE_DELTA_KEY.format(self.index.version + 1))
+
+        with mock.patch.object(suggest, '_schedule_rebuild') as schedule:
+            # الفحص الأول يفترض أن التعديل لم يُكتب بعد، والثاني يعتبره منتهياً
+            self.assertIs(suggest.get_suggest_index(), self.index)
+            schedule.assert_not_called()
+            self.index.checked_at = 0
+            suggest.get_suggest_index()
+            schedule.assert_called_once()
+
+        self.assertEqual(sorted(self.titles(suggest.rebuild_suggest_index(), 'تسو')), ['تسويق المحتوى', 'تسويق رقمي'])
+
+
+class ViewCounterTests(TestCase):
+    """تفريغ عدادات المشاهدات دون انتظار زيارة جديدة"""
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user('reader', password='test')
+        category = Category.objects.create(name='أخبار', slug='news')
+        self.post = BlogPost.objects.create(title='مقال', slug='post', content='نص', category=category,
+                                            author=author, status='published')
+        self.counter = ViewCounter(BlogPost, 'views_count')
+        self.addCleanup(self.counter.stop, flush=False)
+
+    @override_settings(VIEW_COUNTERS={'FLUSH_INTERVAL': 0.01})
+    def test_idle_counts_are_flushed_periodically(self):
+        flushed = threading.Event()
+        with mock.patch.object(self.counter, 'flush', side_effect=lambda: flushed.set()):
+            self.counter.increment(self.post.pk)
+            self.assertTrue(flushed.wait(2))
+            self.counter.stop(flush=False)
+
+    def test_stop_applies_pending_counts(self):
+        for _ in range(3):
+            self.counter.increment(self.post.pk)
+        self.counter.stop()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 3)
+        self.assertEqual(self.counter.pending([self.post.pk]), {self.post.pk: 0})
+
+    def test_displayed_count_does_not_drop_during_flush(self):
+        for _ in range(3):
+            self.counter.increment(self.post.pk)
+
+        displayed = []
+
+        def read_counts(*tags):
+            # استجابة مخزنة بقيمة قاعدة البيانات السابقة، واستجابة محسوبة من جديد
+            for views_count in (0, BlogPost.objects.get(pk=self.post.pk).views_count):
+                item = {'id': self.post.pk, 'views_count': views_count}
+                self.counter.apply_pending_data([item])
+                displayed.append(item['views_count'])
+
+        with mock.patch('cms.utils.counters.invalidate_tags', side_effect=read_counts):
+            self.assertEqual(self.counter.flush([self.post.pk]), 3)
+
+        self.assertEqual(len(displayed), 2)
+        self.assertGreaterEqual(min(displayed), 3)
+        item = {'id': self.post.pk, 'views_count': BlogPost.objects.get(pk=self.post.pk).views_count}
+        self.counter.apply_pending_data([item])
+        self.assertEqual(item['views_count'], 3)
+
+    def test_failed_update_keeps_pending_counts(self):
+        self.counter.increment(self.post.pk)
+        update = mock.patch.object(BlogPost.objects, 'filter', side_effect=OperationalError('down'))
+        with update, self.assertLogs('cms.utils.counters', level='ERROR'), self.assertRaises(OperationalError):
+            self.counter.flush()
+        self.assertEqual(self.counter.pending([self.post.pk]), {self.post.pk: 1})
+        self.assertEqual(self.counter._dirty, {self.post.pk})
+
+    def test_flush_command_requires_shared_cache(self):
+        with self.assertRaises(CommandError):
+            call_command('flush_view_counts')
+
+
+class ConditionalGetTests(SimpleTestCase):
+    """ETag من المحتوى والرد بـ 304"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = media_root.name
+        override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_URL='/media/')
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_json_matching_etag_returns_304(self):
+        middleware = CacheControlMiddleware(lambda request: JsonResponse({'items': [1, 2, 3]}))
+        etag = middleware(self.factory.get('/api/items/'))['ETag']
+
+        response = middleware(self.factory.get('/api/items/', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(middleware(self.factory.get('/api/items/', HTTP_IF_NONE_MATCH='W/"other"')).status_code, 200)
+
+    def test_file_etag_follows_content_and_skips_view(self):
+        path = os.path.join(self.media_root, 'logo.png')
+        with open(path, 'wb') as file:
+            file.write(b'image-bytes')
+        get_response = mock.Mock(return_value=HttpResponse(b'image-bytes'))
+        middleware = CacheControlMiddleware(get_response)
+        etag = middleware(self.factory.get('/media/logo.png'))['ETag']
+
+        # نفس المحتوى بوقت تعديل جديد يعطي نفس ETag، فلا يُستدعى العرض
+        os.utime(path, (1, 1))
+        response = middleware(self.factory.get('/media/logo.png', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(get_response.call_count, 1)
+
+        with open(path, 'wb') as file:
+            file.write(b'new-image-bytes')
+        self.assertNotEqual(middleware(self.factory.get('/media/logo.png'))['ETag'], etag)
+
+
+class NegotiateEncodingTests(SimpleTestCase):
+    """اختيار الترميز من Accept-Encoding"""
+
+    codecs = ['br', 'zstd', 'gzip']
+
+    def test_highest_q_wins_and_server_order_breaks_ties(self):
+        self.assertEqual(negotiate('gzip;q=1.0, br;q=0.5', self.codecs), 'gzip')
+        self.assertEqual(negotiate('gzip, zstd, br', self.codecs), 'br')
+        self.assertEqual(negotiate('gzip;q=0.8, *;q=0.9', self.codecs), 'br')
+        self.assertEqual(negotiate('x-gzip', self.codecs), 'gzip')
+
+    def test_rejected_or_unknown_encodings(self):
+        self.assertIsNone(negotiate('', self.codecs))
+        self.assertIsNone(negotiate('deflate', self.codecs))
+        self.assertIsNone(negotiate('gzip;q=0, br;q=0', self.codecs))
+        self.assertIsNone(negotiate('gzip;q=abc', self.codecs))
+        self.assertIsNone(negotiate('*;q=0', self.codecs))
+
+    def test_identity_preference(self):
+        self.assertIsNone(negotiate('identity;q=1, gzip;q=0.5', self.codecs))
+        self.assertEqual(negotiate('identity;q=0.5, gzip', self.codecs), 'gzip')
+        self.assertEqual(negotiate('identity, gzip', self.codecs), 'gzip')
+
+
+class FingerprintedStaticUrlTests(SimpleTestCase):
+    """روابط {% static %} بأسماء البصمة بعد build_static_assets"""
+
+    def setUp(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        os.makedirs(os.path.join(static_root.name, 'css'))
+        with open(os.path.join(static_root.name, 'css', 'app.css'), 'w') as file:
+            file.write('body { color: #333; }\n' * 100)
+        override = override_settings(STATIC_ROOT=static_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        static_assets._manifest = None
+        self.addCleanup(setattr, static_assets, '_manifest', None)
+
+    def render(self, name):
+        return Template('{% load static %}{% static name %}').render(Context({'name': name}))
+
+    def test_static_tag_uses_hashed_name(self):
+        self.assertEqual(self.render('css/app.css'), '/static/css/app.css')
+
+        static_assets.build_static_assets(workers=1)
+        static_assets._manifest = None
+        hashed = static_assets.get_static_manifest().hashed_name('css/app.css')
+        self.assertRegex(hashed, r'^css/app\.[0-9a-f]{12}\.css$')
+        self.assertEqual(self.render('css/app.css'), f'/static/{hashed}')
+        self.assertEqual(self.render('css/missing.css'), '/static/css/missing.css')
+
+    def test_disabled_pipeline_keeps_original_names(self):
+        static_assets.build_static_assets(workers=1)
+        with override_settings(STATIC_ASSETS={'ENABLED': False}):
+            self.assertEqual(self.render('css/app.css'), '/static/css/app.css')
+
+
+class StubCDNConfig:
+    base_url = 'https://cdn.example.com'
+
+    def should_use_cdn(self, file_path):
+        return not file_path.endswith('.pdf')
+
+    def get_cdn_url(self, file_path):
+        return f'{self.base_url}{file_path}'
+
+
+class CDNStreamRewriteTests(SimpleTestCase):
+    """تحويل الروابط في الاستجابات المتدفقة مهما كانت حدود الدفعات"""
+
+    page = (
+        '<link rel="stylesheet" href="/static/css/app.css"><img src="/media/projects/حملة.jpg">'
+        '<a href="/static/docs/guide.pdf">دليل</a><span style="background:url(/static/img/icon.svg)"></span>'
+        '<a href="https://cdn.example.com/static/css/app.css">'
+    ).encode('utf-8')
+
+    def setUp(self):
+        self.rewriter = CDNRewriter(StubCDNConfig())
+
+    def chunked(self, data, size):
+        return [data[i:i + size] for i in range(0, len(data), size)]
+
+    def test_every_chunk_size_matches_whole_page(self):
+        expected = self.rewriter.rewrite(self.page)
+        self.assertIn(b'"https://cdn.example.com/static/css/app.css"', expected)
+        self.assertIn(b'"/static/docs/guide.pdf"', expected)
+        self.assertEqual(expected.count(b'https://cdn.example.com/static/css/app.css'), 2)
+        for size in range(1, len(self.page) + 1):
+            with self.subTest(size=size):
+                self.assertEqual(b''.join(self.rewriter.rewrite_stream(self.chunked(self.page, size))), expected)
+
+    def test_chunks_are_cut_after_delimiters(self):
+        output = list(self.rewriter.rewrite_stream(self.chunked(self.page, 7)))
+        for chunk in output[:-1]:
+            self.assertIn(chunk[-1:], (b'"', b"'", b'>', b' '))
+
+    @override_settings(CDN_REWRITE={'STREAM_CARRY_LIMIT': 16})
+    def test_carry_is_bounded_without_delimiters(self):
+        data = b'x' * 100
+        output = list(self.rewriter.rewrite_stream(self.chunked(data, 10)))
+        self.assertEqual(b''.join(output), data)
+        self.assertTrue(all(len(chunk) <= 26 for chunk in output))
+
+
+GRAPH_TEST_SETTINGS = {'BACKOFF': 0.1, 'RATE_LIMIT_RETRIES': 5, 'SLOW_DOWN_INTERVAL': 0.01, 'MAX_PAUSE': 5,
+                       'PAGE_SIZE': 3, 'BATCH_SIZE': 3}
+
+
+class GraphStubMixin:
+    """خادم Graph API محلي لكل اختبار، ومحدد استخدام جديد بدلاً من المشترك في العملية"""
+
+    def start_stub(self, **options):
+        stub = GraphAPIStub(accounts=1, campaigns_per_account=7, **options).start()
+        self.addCleanup(stub.stop)
+        limiter = mock.patch.object(GraphAPIClient, 'limiter', RateLimiter())
+        limiter.start()
+        self.addCleanup(limiter.stop)
+        return stub, GraphAPIClient(stub.access_token, stub.base_url)
+
+
+@override_settings(META_GRAPH_API=GRAPH_TEST_SETTINGS)
+class GraphAPIClientTests(GraphStubMixin, SimpleTestCase):
+    """العميل المشترك مقابل خادم Graph API المحلي"""
+
+    def test_paging_reuses_pooled_connections(self):
+        stub, client = self.start_stub(latency=0)
+        campaigns = client.get_all('act_100/campaigns', {'fields': 'id,name'})
+        self.assertEqual([campaign['id'] for campaign in campaigns], stub.campaigns['act_100'])
+        self.assertEqual(stub.stats()['requests'], 3)
+        self.assertLess(stub.stats()['connections'], 3)
+
+    def test_concurrent_fetch_retries_rate_limited_requests(self):
+        # الطلبات المرفوضة تُحسب من الحد أيضاً (كما في Graph API)، فالتراجع يجب أن يتجاوز النافذة
+        stub, client = self.start_stub(latency=0.05, rate_limit=3, window=0.3)
+        calls = {campaign_id: (f'{campaign_id}/insights', None) for campaign_id in stub.campaigns['act_100'][:4]}
+        results = client.fetch_concurrent(calls, max_workers=4)
+        self.assertGreaterEqual(stub.stats()['rate_limited'], 1)
+        self.assertEqual({key: result['data'][0]['campaign_id'] for key, result in results.items()},
+                         {key: key for key in calls})
+
+    def test_errors_are_raised_per_request(self):
+        stub, client = self.start_stub(latency=0)
+        results = client.fetch_concurrent({'missing': ('999/insights', None), 'ok': ('10000000/insights', None)})
+        self.assertIsInstance(results['missing'], GraphAPIError)
+        self.assertEqual(results['missing'].code, 100)
+        self.assertEqual(results['ok']['data'][0]['campaign_id'], '10000000')
+
+
+@override_settings(META_GRAPH_API=GRAPH_TEST_SETTINGS)
+class GraphAPIBatchTests(GraphStubMixin, SimpleTestCase):
+    """طلبات batch: نتيجة أو خطأ لكل طلب فرعي، وإعادة المرفوض بسبب الحد وحده"""
+
+    def insights_calls(self, stub, count):
+        return {campaign_id: (f'{campaign_id}/insights', {'fields': 'impressions'})
+                for campaign_id in stub.campaigns['act_100'][:count]}
+
+    def test_sub_request_errors_are_independent(self):
+        stub, client = self.start_stub(latency=0)
+        calls = self.insights_calls(stub, 5)
+        calls['missing'] = ('999/insights', None)
+        results = client.batch(calls)
+
+        # 6 طلبات فرعية في دفعتين (BATCH_SIZE = 3)
+        self.assertEqual(stub.stats()['requests'], 2)
+        self.assertEqual(stub.stats()['sub_requests'], 6)
+        self.assertIsInstance(results.pop('missing'), GraphAPIError)
+        self.assertEqual({key: result['data'][0]['campaign_id'] for key, result in results.items()},
+                         {key: key for key in results})
+
+    def test_rate_limited_sub_requests_are_retried(self):
+        stub, client = self.start_stub(latency=0, rate_limit=2, window=0.3)
+        results = client.batch(self.insights_calls(stub, 3))
+
+        stats = stub.stats()
+        self.assertGreaterEqual(stats['rate_limited'], 1)
+        # كل إعادة ترسل الطلب الفرعي المرفوض وحده
+        self.assertEqual(stats['sub_requests'], 3 + stats['rate_limited'])
+        self.assertTrue(all(isinstance(result, dict) for result in results.values()))
+
+    @override_settings(META_GRAPH_API={**GRAPH_TEST_SETTINGS, 'RATE_LIMIT_RETRIES': 0})
+    def test_rate_limit_error_when_retries_exhausted(self):
+        stub, client = self.start_stub(latency=0, rate_limit=2, window=10)
+        results = client.batch(self.insights_calls(stub, 3))
+
+        errors = [result for result in results.values() if isinstance(result, GraphAPIError)]
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].is_rate_limit)
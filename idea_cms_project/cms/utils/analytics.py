@@ -0,0 +1,257 @@
+"""
+Analytics Aggregation
+محرك تجميع التحليلات: المقاييس العامة في استعلام واحد والتوزيعات في مرور واحد على الجدول
+"""
+
+from collections import Counter
+from datetime import datetime, time, timedelta
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Avg, Count, DurationField, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# حجم الدفعة عند المرور المتدفق على الصفوف (قواعد البيانات بدون GROUPING SETS)
+STREAM_CHUNK_SIZE = 5000
+
+
+class GroupSpec(NamedTuple):
+    """توزيع مطلوب: الحقول التي يتم التجميع عليها وعدد النتائج الأعلى (None = الكل)"""
+    fields: Tuple[str, ...]
+    limit: Optional[int] = None
+    skip_empty: bool = False
+
+
+def supports_grouping_sets(using: str) -> bool:
+    """GROUPING SETS مدعومة في PostgreSQL فقط من بين قواعد البيانات المستخدمة هنا"""
+    return connections[using].vendor == 'postgresql'
+
+
+def grouped_counts(queryset, groups: Dict[str, GroupSpec]) -> Dict[str, List[Tuple[tuple, int]]]:
+    """
+    حساب عدة توزيعات (GROUP BY) على نفس الـ queryset في استعلام واحد
+    النتيجة لكل توزيع: قائمة (قيم الحقول, العدد) مرتبة تنازلياً حسب العدد
+    """
+    if not groups:
+        return {}
+
+    queryset = queryset.order_by()
+    if supports_grouping_sets(queryset.db):
+        rows = _grouping_sets_counts(queryset, groups)
+    else:
+        rows = _streamed_counts(queryset, groups)
+
+    result = {}
+    for name, spec in groups.items():
+        items = sorted(rows.get(name, {}).items(), key=lambda item: item[1], reverse=True)
+        if spec.skip_empty:
+            items = [item for item in items if any(value not in (None, '') for value in item[0])]
+        if spec.limit is not None:
+            items = items[:spec.limit]
+        result[name] = items
+    return result
+
+
+def _all_fields(groups):
+    fields = []
+    for spec in groups.values():
+        for field in spec.fields:
+            if field not in fields:
+                fields.append(field)
+    return fields
+
+
+def _grouping_sets_counts(queryset, groups):
+    """استعلام واحد بـ GROUPING SETS مع ترتيب كل مجموعة وقصها داخل قاعدة البيانات"""
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    fields = _all_fields(groups)
+    # أسماء مستعارة ثابتة للأعمدة حتى تعمل الحقول المرتبطة (form__name) والمحسوبة
+    aliases = {field: f'group_{index}' for index, field in enumerate(fields)}
+    inner = queryset.values(**{alias: F(field) for field, alias in aliases.items()})
+    inner_sql, params = inner.query.sql_with_params()
+
+    columns = ', '.join(quote(aliases[field]) for field in fields)
+    sets = ', '.join(
+        '(' + ', '.join(quote(aliases[field]) for field in spec.fields) + ')' for spec in groups.values()
+    )
+
+    # GROUPING() تعيد قناعاً يكون فيه البت 1 للحقول غير المشاركة في المجموعة الحالية
+    full_mask = (1 << len(fields)) - 1
+    masks = {}
+    conditions = []
+    for name, spec in groups.items():
+        mask = full_mask
+        for field in spec.fields:
+            mask &= ~(1 << (len(fields) - 1 - fields.index(field)))
+        masks[mask] = name
+        if spec.limit is None:
+            conditions.append(f'grouping_id = {mask}')
+        else:
+            # صف إضافي لتعويض القيمة الفارغة عند skip_empty
+            limit = spec.limit + (1 if spec.skip_empty else 0)
+            conditions.append(f'(grouping_id = {mask} AND row_rank <= {limit})')
+
+    sql = (
+        f'SELECT grouping_id, {columns}, row_count FROM ('
+        f' SELECT grouping_id, {columns}, row_count,'
+        f' ROW_NUMBER() OVER (PARTITION BY grouping_id ORDER BY row_count DESC) AS row_rank FROM ('
+        f'  SELECT GROUPING({columns}) AS grouping_id, {columns}, COUNT(*) AS row_count'
+        f'  FROM ({inner_sql}) AS source GROUP BY GROUPING SETS ({sets})'
+        f' ) AS grouped'
+        f') AS ranked WHERE {" OR ".join(conditions)}'
+    )
+
+    rows = {name: {} for name in groups}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for grouping_id, *values, count in cursor.fetchall():
+            name = masks.get(grouping_id)
+            if name is None:
+                continue
+            key = tuple(values[fields.index(field)] for field in groups[name].fields)
+            rows[name][key] = count
+    return rows
+
+
+def _streamed_counts(queryset, groups):
+    """مرور واحد متدفق على الحقول المطلوبة فقط مع العد في الذاكرة"""
+    fields = _all_fields(groups)
+    # itemgetter يعيد tuple للمفاتيح المركبة، ونحول المفاتيح المفردة إلى tuple بعد العد
+    getters = {
+        name: itemgetter(*[fields.index(field) for field in spec.fields]) for name, spec in groups.items()
+    }
+    counters = {name: Counter() for name in groups}
+
+    # قراءة الصفوف على دفعات عبر الـ compiler (مع تحويلات الحقول مثل التواريخ)
+    # والعد يتم بـ Counter.update على مستوى C بدلاً من حلقة Python لكل صف
+    compiler = queryset.values_list(*fields).query.get_compiler(queryset.db)
+    rows = compiler.results_iter(chunked_fetch=True, chunk_size=STREAM_CHUNK_SIZE)
+    while True:
+        chunk = list(islice(rows, STREAM_CHUNK_SIZE))
+        if not chunk:
+            break
+        for name, getter in getters.items():
+            counters[name].update(map(getter, chunk))
+
+    for name, spec in groups.items():
+        if len(spec.fields) == 1:
+            counters[name] = {(key,): count for key, count in counters[name].items()}
+    return counters
+
+
+VISIT_GROUPS = {
+    'top_pages': GroupSpec(('page_url', 'page_title'), limit=10),
+    'top_referrers': GroupSpec(('referrer',), limit=10, skip_empty=True),
+    'device_breakdown': GroupSpec(('device_type',)),
+    'browser_breakdown': GroupSpec(('browser',)),
+    'country_breakdown': GroupSpec(('country',)),
+}
+
+
+def visit_analytics(queryset) -> Dict[str, Any]:
+    """
+    تحليلات VisitorTracking لأي queryset مفلتر:
+    استعلام واحد للمقاييس العامة (تجميع شرطي) ومرور واحد لكل التوزيعات
+    """
+    queryset = queryset.order_by()
+
+    totals = queryset.aggregate(
+        total_visitors=Count('session_key', distinct=True),
+        total_page_views=Count('id'),
+        bounce_visits=Count('id', filter=Q(is_bounce=True)),
+        avg_duration=Avg('visit_duration'),
+    )
+    total_page_views = totals['total_page_views']
+    bounce_rate = (totals['bounce_visits'] / total_page_views * 100) if total_page_views > 0 else 0
+
+    groups = grouped_counts(queryset, VISIT_GROUPS) if total_page_views else {name: [] for name in VISIT_GROUPS}
+
+    return {
+        'total_visitors': totals['total_visitors'],
+        'total_page_views': total_page_views,
+        'bounce_rate': round(bounce_rate, 2),
+        'avg_session_duration': round(totals['avg_duration'] or 0, 2),
+        'top_pages': [
+            {'page_url': page_url, 'page_title': page_title, 'views': count}
+            for (page_url, page_title), count in groups['top_pages']
+        ],
+        'top_referrers': [
+            {'referrer': referrer, 'visits': count}
+            for (referrer,), count in groups['top_referrers']
+        ],
+        'device_breakdown': {key: count for (key,), count in groups['device_breakdown']},
+        'browser_breakdown': {key: count for (key,), count in groups['browser_breakdown']},
+        'country_breakdown': {key: count for (key,), count in groups['country_breakdown']},
+    }
+
+
+def daily_counts(queryset, field: str, days: int) -> Dict[str, int]:
+    """
+    عدد السجلات لكل يوم في آخر days يوماً (بالتوقيت المحلي) باستعلام TruncDate واحد
+    الأيام بدون سجلات تظهر بقيمة 0، والترتيب من اليوم الحالي إلى الأقدم
+    """
+    today = timezone.localdate()
+    first_day = today - timedelta(days=days - 1)
+    # حد زمني بدلاً من __date حتى يستفيد الاستعلام من الفهرس على الحقل
+    start = datetime.combine(first_day, time.min)
+    if settings.USE_TZ:
+        start = timezone.make_aware(start)
+
+    counts = dict(
+        queryset.order_by()
+        .filter(**{f'{field}__gte': start})
+        .annotate(day=TruncDate(field))
+        .values('day')
+        .annotate(count=Count('id'))
+        .values_list('day', 'count')
+    )
+
+    return {
+        str(today - timedelta(days=offset)): counts.get(today - timedelta(days=offset), 0)
+        for offset in range(days)
+    }
+
+
+SUBMISSION_GROUPS = {
+    'submissions_by_status': GroupSpec(('status',)),
+    'submissions_by_form': GroupSpec(('form__name',)),
+}
+
+
+def submission_stats(queryset, days: int = 30) -> Dict[str, Any]:
+    """
+    إحصائيات FormSubmission بعدد ثابت من الاستعلامات مهما كانت الفترة:
+    المقاييس العامة، التوزيعات، والمدرج اليومي
+    """
+    queryset = queryset.order_by()
+
+    totals = queryset.aggregate(
+        total_submissions=Count('id'),
+        completed_submissions=Count('id', filter=Q(status='completed')),
+        # AVG يتجاهل الإرسالات غير المعالجة لأن الفرق يكون NULL
+        avg_processing_time=Avg(F('processed_at') - F('submitted_at'), output_field=DurationField()),
+    )
+    total_submissions = totals['total_submissions']
+    conversion_rate = (
+        totals['completed_submissions'] / total_submissions * 100 if total_submissions > 0 else 0
+    )
+    avg_processing_time = totals['avg_processing_time']
+    avg_processing_hours = avg_processing_time.total_seconds() / 3600 if avg_processing_time else 0
+
+    groups = grouped_counts(queryset, SUBMISSION_GROUPS) if total_submissions else {
+        name: [] for name in SUBMISSION_GROUPS
+    }
+
+    return {
+        'total_submissions': total_submissions,
+        'submissions_by_form': {key: count for (key,), count in groups['submissions_by_form']},
+        'submissions_by_status': {key: count for (key,), count in groups['submissions_by_status']},
+        'submissions_by_date': daily_counts(queryset, 'submitted_at', days),
+        'conversion_rate': round(conversion_rate, 2),
+        'avg_processing_time': round(avg_processing_hours, 2),
+    }
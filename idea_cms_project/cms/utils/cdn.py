@@ -0,0 +1,142 @@
+"""
+CDN Rewriting
+تحويل روابط /static/ و /media/ في صفحات HTML إلى روابط CDN في مرور واحد على البايتات:
+نمط واحد مجمّع، وذاكرة LRU للرابط الأصلي -> رابط CDN، وذاكرة للصفحات المحوّلة حسب ETag
+فالصفحة التي لم تتغير لا تُحوّل مرتين، ودعم الاستجابات المتدفقة دفعة بدفعة
+"""
+
+import re
+import threading
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, Optional
+
+from django.conf import settings
+
+from .compression import VariantCache
+
+DEFAULT_CDN_REWRITE_SETTINGS = {
+    'URL_CACHE_SIZE': 4096,                  # روابط محفوظة (أصلي -> CDN)
+    'OUTPUT_CACHE_SIZE': 16 * 1024 * 1024,   # مجموع بايتات الصفحات المحوّلة المحفوظة
+    'OUTPUT_MAX_ENTRY': 2 * 1024 * 1024,
+    'STREAM_CARRY_LIMIT': 65536,             # أقصى بايتات تُؤجل للدفعة التالية في التدفق
+}
+
+STATIC_EXTENSIONS = ('css', 'js', 'png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'woff', 'woff2', 'ttf', 'eot',
+                     'ico', 'pdf', 'mp4', 'webm')
+MEDIA_EXTENSIONS = ('png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'pdf', 'mp4', 'webm')
+
+# الرابط لا يحتوي علامات التنصيص أو > أو مسافات (\s في النمط)، فالتقسيم بعد أي منها لا يقطع رابطاً
+_DELIMITERS = (b'"', b"'", b'>', b' ', b'\n', b'\t', b'\r', b'\f', b'\x0b')
+
+# حروف اسم المضيف أو المسار: /static/ بعد أي منها ليس بداية رابط
+_PATH_BYTES = frozenset(b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.-')
+
+
+def get_cdn_rewrite_settings() -> Dict[str, Any]:
+    """دمج إعدادات CDN_REWRITE مع القيم الافتراضية"""
+    config = dict(DEFAULT_CDN_REWRITE_SETTINGS)
+    config.update(getattr(settings, 'CDN_REWRITE', {}))
+    return config
+
+
+def _alternation(extensions) -> bytes:
+    # الأطول أولاً حتى لا يطابق woff قبل woff2
+    return b'|'.join(re.escape(ext.encode()) for ext in sorted(extensions, key=len, reverse=True))
+
+
+class CDNRewriter:
+    """تحويل الروابط لمزود CDN واحد (الإعدادات ثابتة طوال عمر العملية)"""
+
+    def __init__(self, cdn_config):
+        self.cdn_config = cdn_config
+        config = get_cdn_rewrite_settings()
+        # النمط يبدأ بحرف ثابت ('/') ليبحث عنه محرك regex بسرعة؛ شرط الحرف السابق يُفحص في _replace
+        self.pattern = re.compile(
+            rb'/(?:static/[^"\'>\s]+\.(?:' + _alternation(STATIC_EXTENSIONS) + rb')'
+            rb'|media/[^"\'>\s]+\.(?:' + _alternation(MEDIA_EXTENSIONS) + rb'))'
+        )
+        self.cdn_url = lru_cache(maxsize=config['URL_CACHE_SIZE'])(self._cdn_url)
+        self.outputs = VariantCache(lambda: (
+            get_cdn_rewrite_settings()['OUTPUT_CACHE_SIZE'], get_cdn_rewrite_settings()['OUTPUT_MAX_ENTRY']
+        ))
+
+    def _cdn_url(self, url: bytes) -> bytes:
+        path = url.decode('utf-8', 'surrogateescape')
+        if not self.cdn_config.should_use_cdn(path):
+            return url
+        return self.cdn_config.get_cdn_url(path).encode('utf-8', 'surrogateescape')
+
+    def _replace(self, match) -> bytes:
+        # لا تُحوّل الروابط المطلقة أو الموجودة داخل مسار آخر (https://cdn.example.com/static/...)
+        start = match.start()
+        if start and match.string[start - 1] in _PATH_BYTES:
+            return match.group(0)
+        return self.cdn_url(match.group(0))
+
+    def rewrite(self, content: bytes) -> bytes:
+        return self.pattern.sub(self._replace, content)
+
+    def rewrite_cached(self, content: bytes, etag: Optional[str]) -> bytes:
+        """تحويل الصفحة، أو النسخة المحوّلة سابقاً لنفس ETag"""
+        if not etag:
+            return self.rewrite(content)
+        key = (etag, len(content))
+        rewritten = self.outputs.get(key)
+        if rewritten is None:
+            rewritten = self.rewrite(content)
+            self.outputs.set(key, rewritten)
+        return rewritten
+
+    def _split(self, data: bytes, limit: int):
+        """(الجزء الآمن للتحويل، الباقي الذي قد ينتهي برابط غير مكتمل)"""
+        cut = max(data.rfind(delimiter, max(0, len(data) - limit)) for delimiter in _DELIMITERS) + 1
+        if cut == 0:
+            return (data, b'') if len(data) >= limit else (b'', data)
+        return data[:cut], data[cut:]
+
+    def rewrite_stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        limit = get_cdn_rewrite_settings()['STREAM_CARRY_LIMIT']
+        carry = b''
+        for chunk in chunks:
+            ready, carry = self._split(carry + chunk, limit)
+            if ready:
+                yield self.rewrite(ready)
+        if carry:
+            yield self.rewrite(carry)
+
+    async def arewrite_stream(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        limit = get_cdn_rewrite_settings()['STREAM_CARRY_LIMIT']
+        carry = b''
+        async for chunk in chunks:
+            ready, carry = self._split(carry + chunk, limit)
+            if ready:
+                yield self.rewrite(ready)
+        if carry:
+            yield self.rewrite(carry)
+
+    def stats(self) -> Dict[str, Any]:
+        info = self.cdn_url.cache_info()
+        return {
+            'urls': {'hits': info.hits, 'misses': info.misses, 'size': info.currsize},
+            'pages': self.outputs.stats(),
+        }
+
+
+_rewriter = None
+_rewriter_lock = threading.Lock()
+
+
+def get_cdn_rewriter(cdn_config) -> CDNRewriter:
+    global _rewriter
+    if _rewriter is None:
+        with _rewriter_lock:
+            if _rewriter is None:
+                _rewriter = CDNRewriter(cdn_config)
+    return _rewriter
+
+
+def cdn_rewrite_stats() -> Dict[str, Any]:
+    """عدادات التحويل في هذه العملية"""
+    if _rewriter is None:
+        return {'enabled': False}
+    return {'enabled': True, **_rewriter.stats()}
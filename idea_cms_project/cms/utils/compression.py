@@ -0,0 +1,337 @@
+"""
+Compression
+ضغط الاستجابات: اختيار الترميز (br / zstd / gzip) من Accept-Encoding حسب قيم q، ومستوى ضغط لكل نوع محتوى،
+وضغط الاستجابات المتدفقة دفعة بدفعة، وذاكرة LRU للنسخ المضغوطة من الاستجابات القابلة للتخزين حسب ETag
+
+br و zstd اختياريان: يُعرضان فقط إذا كانت مكتبتا brotli و zstandard مثبتتين، وإلا يبقى gzip.
+"""
+
+import threading
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_COMPRESSION_SETTINGS = {
+    'ENABLED': True,
+    'CODECS': ['br', 'zstd', 'gzip'],  # ترتيب التفضيل عند تساوي قيم q
+    'MIN_SIZE': 1024,                  # لا تُضغط الاستجابات الأصغر
+    'STREAM_FLUSH_SIZE': 16384,        # بايتات غير مضغوطة قبل إرسال ما تم ضغطه من الاستجابة المتدفقة
+    # مستوى كل ترميز حسب نوع المحتوى ('default' لباقي الأنواع)
+    'LEVELS': {
+        'default': {'br': 5, 'zstd': 6, 'gzip': 6},
+        'application/json': {'br': 4, 'zstd': 3, 'gzip': 5},
+        'text/css': {'br': 9, 'zstd': 9, 'gzip': 9},
+        'application/javascript': {'br': 9, 'zstd': 9, 'gzip': 9},
+        'text/javascript': {'br': 9, 'zstd': 9, 'gzip': 9},
+    },
+    'VARIANT_CACHE_SIZE': 32 * 1024 * 1024,  # مجموع بايتات النسخ المضغوطة المحفوظة
+    'VARIANT_MAX_ENTRY': 2 * 1024 * 1024,    # أكبر نسخة مضغوطة تُحفظ
+}
+
+
+def get_compression_settings() -> Dict[str, Any]:
+    """دمج إعدادات COMPRESSION مع القيم الافتراضية"""
+    config = dict(DEFAULT_COMPRESSION_SETTINGS)
+    config.update(getattr(settings, 'COMPRESSION', {}))
+    levels = dict(DEFAULT_COMPRESSION_SETTINGS['LEVELS'])
+    levels.update(config['LEVELS'])
+    config['LEVELS'] = levels
+    return config
+
+
+# ---------------------------------------------------------------------------
+# الترميزات
+# ---------------------------------------------------------------------------
+
+class _GzipStream:
+    def __init__(self, level: int):
+        # wbits=31: ترويسة gzip بدون وقت، فنفس المحتوى ينتج نفس البايتات
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+    def __init__(self, level: int):
+        self._obj = brotli.Compressor(mode=brotli.MODE_TEXT, quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class _ZstdStream:
+    def __init__(self, level: int):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+_STREAMS = {'gzip': _GzipStream}
+if brotli is not None:
+    _STREAMS['br'] = _BrotliStream
+if zstandard is not None:
+    _STREAMS['zstd'] = _ZstdStream
+
+
+def available_codecs() -> List[str]:
+    """الترميزات المفعلة والمثبتة بترتيب التفضيل"""
+    return [name for name in get_compression_settings()['CODECS'] if name in _STREAMS]
+
+
+def compress(data: bytes, codec: str, level: int) -> bytes:
+    stream = _STREAMS[codec](level)
+    return stream.compress(data) + stream.finish()
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == 'gzip':
+        return zlib.decompress(data, 47)
+    if codec == 'br':
+        return brotli.decompress(data)
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+def compression_level(content_type: str, codec: str) -> int:
+    levels = get_compression_settings()['LEVELS']
+    by_codec = levels.get(content_type) or levels['default']
+    return by_codec.get(codec, levels['default'][codec])
+
+
+# ---------------------------------------------------------------------------
+# التفاوض
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=256)
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """{'br': 1.0, 'gzip': 0.8, ...} (قيمة q غير صالحة = 0)"""
+    accepted = {}
+    for part in header.split(','):
+        name, _, params = part.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    if 'x-gzip' in accepted:
+        accepted.setdefault('gzip', accepted['x-gzip'])
+    return accepted
+
+
+def negotiate(header: str, codecs: Iterable[str]) -> Optional[str]:
+    """
+    الترميز ذو أعلى q من codecs (المرتبة حسب تفضيل الخادم)، أو None للإرسال بدون ضغط
+    (لا يوجد ترميز مقبول، أو العميل يفضّل identity صراحة)
+    """
+    if not header:
+        return None
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    for name in codecs:
+        q = accepted.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    if best is not None and accepted.get('identity', 0.0) > best_q:
+        return None
+    return best
+
+
+# ---------------------------------------------------------------------------
+# الضغط المتدفق
+# ---------------------------------------------------------------------------
+
+def _flush_threshold() -> int:
+    return get_compression_settings()['STREAM_FLUSH_SIZE']
+
+
+def compress_stream(chunks: Iterable[bytes], codec: str, level: int,
+                    on_complete=None) -> Iterator[bytes]:
+    """
+    ضغط تدفق دفعة بدفعة: المخرجات تُرسل كلما تراكم STREAM_FLUSH_SIZE من المدخلات
+    on_complete(bytes): تُستدعى بالنتيجة كاملة عند انتهاء التدفق إن لم تتجاوز VARIANT_MAX_ENTRY
+    """
+    stream = _STREAMS[codec](level)
+    threshold = _flush_threshold()
+    collector = _Collector(on_complete)
+    pending = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode(settings.DEFAULT_CHARSET)
+        output = stream.compress(chunk)
+        pending += len(chunk)
+        if pending >= threshold:
+            output += stream.flush()
+            pending = 0
+        if output:
+            collector.add(output)
+            yield output
+    output = stream.finish()
+    collector.add(output)
+    collector.complete()
+    yield output
+
+
+async def acompress_stream(chunks: AsyncIterator[bytes], codec: str, level: int,
+                           on_complete=None) -> AsyncIterator[bytes]:
+    stream = _STREAMS[codec](level)
+    threshold = _flush_threshold()
+    collector = _Collector(on_complete)
+    pending = 0
+    async for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode(settings.DEFAULT_CHARSET)
+        output = stream.compress(chunk)
+        pending += len(chunk)
+        if pending >= threshold:
+            output += stream.flush()
+            pending = 0
+        if output:
+            collector.add(output)
+            yield output
+    output = stream.finish()
+    collector.add(output)
+    collector.complete()
+    yield output
+
+
+class _Collector:
+    """تجميع مخرجات التدفق لحفظها في ذاكرة النسخ (يتوقف عند تجاوز الحد)"""
+
+    def __init__(self, on_complete):
+        self.on_complete = on_complete
+        self.parts = [] if on_complete is not None else None
+        self.size = 0
+        self.limit = get_compression_settings()['VARIANT_MAX_ENTRY']
+
+    def add(self, data: bytes) -> None:
+        if self.parts is None:
+            return
+        self.size += len(data)
+        if self.size > self.limit:
+            self.parts = None
+        else:
+            self.parts.append(data)
+
+    def complete(self) -> None:
+        if self.parts is not None:
+            self.on_complete(b''.join(self.parts))
+
+
+# ---------------------------------------------------------------------------
+# ذاكرة النسخ المضغوطة
+# ---------------------------------------------------------------------------
+
+def _variant_limits() -> Tuple[int, int]:
+    config = get_compression_settings()
+    return config['VARIANT_CACHE_SIZE'], config['VARIANT_MAX_ENTRY']
+
+
+class VariantCache:
+    """
+    LRU محدود بمجموع البايتات للنسخ المضغوطة حسب (ETag، نوع المحتوى، الحجم، الترميز، المستوى)
+    limits(): (مجموع البايتات، أكبر قيمة) لاستخدامه مع مخرجات أخرى مشتقة من ETag
+    """
+
+    def __init__(self, limits: Callable[[], Tuple[int, int]] = _variant_limits):
+        self._limits = limits
+        self._entries: 'OrderedDict[Hashable, bytes]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key: Hashable, value: bytes) -> None:
+        max_size, max_entry = self._limits()
+        if len(value) > max_entry:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > max_size and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self._stats['evictions'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, 'entries': len(self._entries), 'bytes': self._size}
+
+
+variant_cache = VariantCache()
+
+_stats = {'compressed': 0, 'streamed': 0, 'skipped': 0, 'bytes_in': 0, 'bytes_out': 0}
+_stats_lock = threading.Lock()
+
+
+def count(name: str, bytes_in: int = 0, bytes_out: int = 0) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+        _stats['bytes_in'] += bytes_in
+        _stats['bytes_out'] += bytes_out
+
+
+def compression_stats() -> Dict[str, Any]:
+    """عدادات الضغط في هذه العملية (bytes_* للاستجابات غير المتدفقة فقط)"""
+    with _stats_lock:
+        data = dict(_stats)
+    data['ratio'] = round(data['bytes_out'] / data['bytes_in'], 3) if data['bytes_in'] else 0
+    data['codecs'] = available_codecs()
+    data['variants'] = variant_cache.stats()
+    return data
@@ -0,0 +1,199 @@
+"""
+View Counters
+عداد مشاهدات بالكتابة المؤجلة: الزيادة ذرية في الذاكرة المؤقتة (incr) والتطبيق على قاعدة البيانات
+دورياً بـ F('views_count') + n لكل مجموعة كائنات، بدلاً من قفل صف المقال (أو قاعدة SQLite كلها) مع كل قراءة
+
+القيمة المعروضة = قيمة قاعدة البيانات + الزيادات المعلقة، فيبقى العدد دقيقاً بين عمليتي تفريغ.
+كل عملية تفرّغ ما زادته بخيط خلفي كل FLUSH_INTERVAL ثانية وعند إيقافها (atexit).
+مع ذاكرة مؤقتة مشتركة (Redis/Memcached) تتشارك كل العمليات نفس العدادات؛ مع LocMemCache لكل عملية عداداتها
+ولا يراها أمر flush_view_counts لأنه يعمل في عملية منفصلة.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from ..models import BlogPost
+from .response_cache import invalidate_tags, model_tag
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VIEW_COUNTER_SETTINGS = {
+    'CACHE': 'default',
+    'FLUSH_INTERVAL': 30,  # ثوانٍ بين عمليات التفريغ في الخيط الخلفي
+    'LOCK_TIMEOUT': 60,
+}
+
+
+def get_view_counter_settings() -> Dict[str, Any]:
+    """دمج إعدادات VIEW_COUNTERS مع القيم الافتراضية"""
+    config = dict(DEFAULT_VIEW_COUNTER_SETTINGS)
+    config.update(getattr(settings, 'VIEW_COUNTERS', {}))
+    return config
+
+
+class ViewCounter:
+    """عداد مؤجل لحقل رقمي في نموذج واحد"""
+
+    def __init__(self, model, field: str = 'views_count'):
+        self.model = model
+        self.field = field
+        self.prefix = f'view_counter:{model._meta.label_lower}:{field}'
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    @property
+    def cache(self):
+        return caches[get_view_counter_settings()['CACHE']]
+
+    def key(self, pk) -> str:
+        return f'{self.prefix}:{pk}'
+
+    def _incr(self, pk, amount: int) -> int:
+        cache, key = self.cache, self.key(pk)
+        cache.add(key, 0, None)
+        try:
+            return cache.incr(key, amount)
+        except ValueError:
+            # أُزيح المفتاح بين add و incr
+            cache.add(key, 0, None)
+            return cache.incr(key, amount)
+
+    def increment(self, pk, amount: int = 1) -> int:
+        """زيادة العداد وإعادة مجموع الزيادات المعلقة للكائن"""
+        pending = self._incr(pk, amount)
+        self._ensure_worker()
+        with self._lock:
+            self._dirty.add(pk)
+        return pending
+
+    def pending(self, pks: Iterable) -> Dict[Any, int]:
+        """الزيادات المعلقة لمجموعة كائنات في طلب واحد للذاكرة المؤقتة"""
+        pks = list(pks)
+        values = self.cache.get_many([self.key(pk) for pk in pks])
+        return {pk: values.get(self.key(pk)) or 0 for pk in pks}
+
+    def apply_pending_data(self, items: Iterable[Dict]) -> None:
+        """إضافة الزيادات المعلقة إلى الحقل في بيانات مسلسلة (قواميس فيها id والحقل)"""
+        items = [item for item in items if self.field in item]
+        pending = self.pending(item['id'] for item in items)
+        for item in items:
+            item[self.field] += pending[item['id']]
+
+    def flush(self, pks: Optional[Iterable] = None) -> int:
+        """
+        تطبيق الزيادات المعلقة على قاعدة البيانات (الكائنات المعدلة في هذه العملية، أو pks المحددة)
+        يعيد عدد المشاهدات المطبقة. عملية تفريغ واحدة في نفس الوقت عبر قفل في الذاكرة المؤقتة.
+        """
+        if pks is None:
+            with self._lock:
+                pks, self._dirty = self._dirty, set()
+        pks = list(pks)
+        if not pks:
+            return 0
+
+        config = get_view_counter_settings()
+        cache = self.cache
+        lock_key = f'{self.prefix}:flush-lock'
+        if not cache.add(lock_key, 1, config['LOCK_TIMEOUT']):
+            # عملية أخرى تفرّغ الآن؛ نحتفظ بالكائنات للمرة القادمة
+            with self._lock:
+                self._dirty.update(pks)
+            return 0
+
+        try:
+            taken = {pk: amount for pk, amount in self.pending(pks).items() if amount > 0}
+            by_amount = defaultdict(list)
+            for pk, amount in taken.items():
+                by_amount[amount].append(pk)
+
+            try:
+                with transaction.atomic():
+                    for amount, amount_pks in by_amount.items():
+                        self.model.objects.filter(pk__in=amount_pks).update(**{self.field: F(self.field) + amount})
+            except Exception:
+                logger.exception(f'Flushing {self.prefix} failed, keeping pending counts')
+                with self._lock:
+                    self._dirty.update(pks)
+                raise
+
+            try:
+                # الاستجابات المخزنة تحتوي قيمة قاعدة البيانات السابقة
+                invalidate_tags(*(model_tag(self.model, pk) for pk in taken))
+            finally:
+                # الطرح بعد التطبيق فقط (decr ذري، فالمشاهدات الجديدة أثناء التفريغ تبقى في العداد):
+                # القراءة بينهما تزيد مؤقتاً ولا تنقص عن العدد الحقيقي
+                for pk, amount in taken.items():
+                    cache.decr(self.key(pk), amount)
+        finally:
+            cache.delete(lock_key)
+
+        return sum(taken.values())
+
+    def stop(self, flush: bool = True) -> None:
+        """إيقاف الخيط الخلفي مع تفريغ ما تبقى (ينتظر قليلاً إذا كانت عملية أخرى تفرّغ)"""
+        self._stopped.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        if not flush:
+            return
+        deadline = time.monotonic() + 5
+        while True:
+            self.flush()
+            with self._lock:
+                done = not self._dirty
+            if done or time.monotonic() >= deadline:
+                break
+            time.sleep(0.1)
+        close_old_connections()
+
+    def _ensure_worker(self) -> None:
+        """تشغيل خيط التفريغ الدوري عند أول زيادة (وبعد fork في gunicorn)"""
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None:
+            return
+
+        with self._lock:
+            if self._pid == pid and self._thread is not None:
+                return
+            if self._pid is not None and self._pid != pid:
+                # العملية الابنة ترث قائمة الكائنات المعدلة في الأب، وهو من يفرّغها
+                self._dirty = set()
+            else:
+                atexit.register(self._flush_at_exit)
+            self._pid = pid
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, name=f'view-counter-flusher:{self.prefix}', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(get_view_counter_settings()['FLUSH_INTERVAL']):
+            try:
+                self.flush()
+            except Exception:
+                pass  # سُجّل الخطأ وأُعيدت الزيادات، فتُجرّب في الدورة التالية
+            finally:
+                close_old_connections()
+
+    def _flush_at_exit(self) -> None:
+        try:
+            self.stop(flush=True)
+        except Exception as e:
+            logger.error(f'Flushing {self.prefix} at exit failed: {e}')
+
+
+blog_post_views = ViewCounter(BlogPost, 'views_count')
@@ -0,0 +1,102 @@
+"""
+ETags
+محددات صلاحية (validators) ثابتة بين العمليات: بصمة محتوى الملفات الثابتة والوسائط محفوظة حسب
+(المسار، وقت التعديل، الحجم)، و ETag ضعيف لاستجابات JSON من محتواها
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from django.utils.http import quote_etag
+
+DIGEST_CACHE_SIZE = 4096
+_READ_CHUNK = 1024 * 1024
+
+
+class FileValidators(NamedTuple):
+    path: str
+    etag: str
+    last_modified: float
+
+
+_digests: 'OrderedDict[str, tuple]' = OrderedDict()
+_digests_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def weak_etag(content: bytes) -> str:
+    """ETag ضعيف لمحتوى مولّد (JSON): نفس البيانات = نفس القيمة في كل العمليات"""
+    return f'W/{quote_etag(content_digest(content))}'
+
+
+def file_digest(path: str, stat: os.stat_result) -> str:
+    """بصمة محتوى الملف، تُحسب مرة واحدة لكل (المسار، وقت التعديل، الحجم)"""
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _digests_lock:
+        cached = _digests.get(path)
+        if cached is not None and cached[0] == signature:
+            _digests.move_to_end(path)
+            _stats['hits'] += 1
+            return cached[1]
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_READ_CHUNK), b''):
+            digest.update(chunk)
+    value = digest.hexdigest()
+
+    with _digests_lock:
+        _stats['misses'] += 1
+        _digests[path] = (signature, value)
+        _digests.move_to_end(path)
+        while len(_digests) > DIGEST_CACHE_SIZE:
+            _digests.popitem(last=False)
+    return value
+
+
+def resolve_file(url_path: str) -> Optional[str]:
+    """مسار الملف على القرص لرابط /static/ أو /media/ (None إذا لم يكن ملفاً موجوداً)"""
+    try:
+        if url_path.startswith(settings.STATIC_URL):
+            relative = url_path[len(settings.STATIC_URL):]
+            path = None
+            if settings.STATIC_ROOT:
+                path = safe_join(settings.STATIC_ROOT, relative)
+            if (path is None or not os.path.isfile(path)) and settings.DEBUG:
+                path = finders.find(relative)
+        elif url_path.startswith(settings.MEDIA_URL):
+            path = safe_join(settings.MEDIA_ROOT, url_path[len(settings.MEDIA_URL):])
+        else:
+            return None
+    except (SuspiciousFileOperation, ValueError, OSError):
+        # مسار يخرج من المجلد الجذر
+        return None
+    return path if path and os.path.isfile(path) else None
+
+
+def file_validators(url_path: str) -> Optional[FileValidators]:
+    path = resolve_file(url_path)
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+        etag = quote_etag(file_digest(path, stat))
+    except OSError:
+        return None
+    return FileValidators(path, etag, stat.st_mtime)
+
+
+def etag_cache_stats() -> Dict[str, int]:
+    with _digests_lock:
+        return {**_stats, 'size': len(_digests), 'max_size': DIGEST_CACHE_SIZE}
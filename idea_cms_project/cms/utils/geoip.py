@@ -0,0 +1,226 @@
+"""
+GeoIP Resolver
+تحديد الموقع الجغرافي محلياً من ملف نطاقات IP مرتبة (mmap + بحث ثنائي) دون أي اتصال شبكي
+"""
+
+import json
+import logging
+import mmap
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN = 'غير محدد'
+
+# تنسيق الملف:
+#   header: magic(8) | count(uint32) | names_offset(uint32) | names_length(uint32) | reserved(4)
+#   starts[count] uint32 | ends[count] uint32 | country_idx[count] uint16 | city_idx[count] uint16
+#   names: JSON (UTF-8) قائمة أسماء البلدان والمدن
+MAGIC = b'IDGEOIP1'
+HEADER = struct.Struct('<8sIIII')
+
+# حجم ذاكرة LRU لكل عنوان IP
+GEOIP_CACHE_SIZE = 65536
+
+# ثوانٍ بين فحوص تغيّر ملف القاعدة (build_geoip_db يستبدله بـ os.replace فيتغير inode)
+GEOIP_CHECK_INTERVAL = 30
+
+
+def ip_to_int(ip_address: str) -> Optional[int]:
+    """تحويل عنوان IPv4 إلى عدد صحيح، None لعناوين IPv6 أو غير الصالحة"""
+    try:
+        return int.from_bytes(socket.inet_aton(ip_address), 'big')
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+def write_database(path: str, ranges: Iterable[Tuple[int, int, str, str]]) -> int:
+    """
+    كتابة ملف قاعدة النطاقات من (start, end, country, city)
+    يتم ترتيب النطاقات حسب البداية، وتعيد عدد النطاقات المكتوبة
+    """
+    starts, ends = array('I'), array('I')
+    countries, cities = array('H'), array('H')
+    names, name_index = [], {}
+
+    def intern(name):
+        if name not in name_index:
+            name_index[name] = len(names)
+            names.append(name)
+        return name_index[name]
+
+    for start, end, country, city in sorted(ranges, key=lambda item: item[0]):
+        starts.append(start)
+        ends.append(end)
+        countries.append(intern(country or UNKNOWN))
+        cities.append(intern(city or UNKNOWN))
+
+    if len(names) > 0xFFFF:
+        raise ValueError('Too many distinct location names for a 16-bit index')
+
+    if sys.byteorder != 'little':
+        for column in (starts, ends, countries, cities):
+            column.byteswap()
+
+    names_blob = json.dumps(names, ensure_ascii=False).encode('utf-8')
+    count = len(starts)
+    names_offset = HEADER.size + count * 12
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, count, names_offset, len(names_blob), 0))
+        for column in (starts, ends, countries, cities):
+            column.tofile(f)
+        f.write(names_blob)
+
+    return count
+
+
+class GeoIPResolver:
+    """الواجهة الأساسية لمحللات الموقع الجغرافي"""
+
+    # (inode، وقت التعديل) لملف القاعدة عند التحميل، و None إذا لم يكن موجوداً
+    signature: Optional[Tuple[int, int]] = None
+    checked_at = 0.0
+
+    def lookup(self, ip_address: str) -> Dict[str, str]:
+        return {'country': UNKNOWN, 'city': UNKNOWN}
+
+
+class MmapGeoIPResolver(GeoIPResolver):
+    """
+    محلل يعتمد على ملف نطاقات مرتبة يُفتح بـ mmap
+    البحث ثنائي على مصفوفة البدايات مباشرة من الذاكرة المشتركة بين العمليات
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count, names_offset, names_length, _ = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f'Not a GeoIP range database: {self.path}')
+
+        self.count = count
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+        self._starts = self._column(view, offset, count, 'I')
+        self._ends = self._column(view, offset + count * 4, count, 'I')
+        self._countries = self._column(view, offset + count * 8, count, 'H')
+        self._cities = self._column(view, offset + count * 10, count, 'H')
+        self._names = json.loads(bytes(view[names_offset:names_offset + names_length]).decode('utf-8'))
+
+    @staticmethod
+    def _column(view, offset, count, typecode):
+        size = array(typecode).itemsize
+        column = view[offset:offset + count * size]
+        if sys.byteorder == 'little':
+            return column.cast(typecode)
+        # الملف مكتوب بترتيب little-endian، على الأجهزة الأخرى ننسخه إلى الذاكرة
+        data = array(typecode, bytes(column))
+        data.byteswap()
+        return data
+
+    def lookup(self, ip_address: str) -> Dict[str, str]:
+        value = ip_to_int(ip_address)
+        if value is not None and self.count:
+            index = bisect_right(self._starts, value) - 1
+            if index >= 0 and value <= self._ends[index]:
+                return {
+                    'country': self._names[self._countries[index]],
+                    'city': self._names[self._cities[index]],
+                }
+        return super().lookup(ip_address)
+
+
+_resolver: Optional[GeoIPResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def _database_signature(path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def _load_resolver(database_path) -> GeoIPResolver:
+    resolver_path = getattr(settings, 'GEOIP_RESOLVER', 'cms.utils.geoip.MmapGeoIPResolver')
+    try:
+        resolver_class = import_string(resolver_path)
+        if issubclass(resolver_class, MmapGeoIPResolver):
+            return resolver_class(database_path)
+        return resolver_class()
+    except (OSError, ValueError, TypeError, ImportError) as e:
+        logger.warning(f"GeoIP database unavailable, locations will be unknown: {e}")
+        return GeoIPResolver()
+
+
+def get_geoip_resolver() -> GeoIPResolver:
+    """
+    المحلل المشترك حسب GEOIP_RESOLVER، مع الرجوع للقيم الافتراضية إذا لم يتوفر الملف
+    كل GEOIP_CHECK_INTERVAL ثانية يُقارن inode ووقت تعديل الملف، فإذا استُبدل (أو أُنشئ بعد بدء العملية)
+    يُعاد التحميل وتُمسح ذاكرة العناوين، فتلتقط العمليات العاملة القاعدة الجديدة دون إعادة تشغيل
+    """
+    global _resolver
+
+    resolver = _resolver
+    now = time.monotonic()
+    if resolver is not None and now - resolver.checked_at < GEOIP_CHECK_INTERVAL:
+        return resolver
+
+    with _resolver_lock:
+        resolver = _resolver
+        if resolver is None or now - resolver.checked_at >= GEOIP_CHECK_INTERVAL:
+            database_path = getattr(settings, 'GEOIP_DATABASE_PATH', None)
+            signature = _database_signature(database_path)
+            if resolver is None or signature != resolver.signature:
+                if resolver is not None:
+                    logger.info(f"GeoIP database changed, reloading {database_path}")
+                resolver = _load_resolver(database_path)
+                resolver.signature = signature
+                _cached_lookup.cache_clear()
+            resolver.checked_at = now
+            _resolver = resolver
+    return resolver
+
+
+@lru_cache(maxsize=GEOIP_CACHE_SIZE)
+def _cached_lookup(ip_address: str) -> Tuple[str, str]:
+    location = get_geoip_resolver().lookup(ip_address)
+    return location['country'], location['city']
+
+
+def resolve_location(ip_address: str) -> Dict[str, str]:
+    """تحديد البلد والمدينة لعنوان IP مع ذاكرة LRU لكل عنوان"""
+    # فحص تغيّر الملف قبل الذاكرة، وإلا تبقى العناوين المحفوظة بنتائج القاعدة القديمة
+    get_geoip_resolver()
+    country, city = _cached_lookup(ip_address or '')
+    return {'country': country, 'city': city}
+
+
+def reset_geoip_resolver():
+    """إعادة تحميل المحلل ومسح الذاكرة المؤقتة في هذه العملية فوراً (العمليات الأخرى خلال GEOIP_CHECK_INTERVAL)"""
+    global _resolver
+    with _resolver_lock:
+        _resolver = None
+    _cached_lookup.cache_clear()
+
+
+def geoip_cache_stats() -> Dict[str, int]:
+    """إحصائيات ذاكرة LRU لعناوين IP"""
+    info = _cached_lookup.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
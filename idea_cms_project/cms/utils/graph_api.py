@@ -0,0 +1,351 @@
+"""
+Graph API Client
+عميل HTTP مشترك لـ Meta Graph API: جلسة requests واحدة لكل عملية مع اتصالات keep-alive في مجموعة محدودة
+(بدلاً من اتصال TCP و TLS جديد لكل طلب)، وجلب متوازٍ بعدد خيوط محدود، واحترام حدود الاستخدام
+من ترويسات X-App-Usage و X-Business-Use-Case-Usage و X-Ad-Account-Usage،
+وطلبات batch تجمع حتى 50 طلباً فرعياً في طلب HTTP واحد مع نتيجة أو خطأ مستقل لكل طلب فرعي
+
+BASE_URL قابل للتغيير لتشغيل المزامنة على خادم Graph API محلي (python manage.py graph_api_stub).
+"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Tuple
+from urllib.parse import urlencode
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_META_GRAPH_API_SETTINGS = {
+    'BASE_URL': 'https://graph.facebook.com/v18.0',
+    'TIMEOUT': 15,
+    'MAX_CONCURRENCY': 8,      # طلبات متزامنة أثناء المزامنة (وحجم مجموعة الاتصالات)
+    'PAGE_SIZE': 100,          # عناصر كل صفحة في القوائم (الحسابات والحملات)
+    'SLOW_DOWN_AT': 75,        # نسبة استخدام (%) تبدأ بعدها الطلبات بالتتابع
+    'SLOW_DOWN_INTERVAL': 1.0, # ثوانٍ بين الطلبات عند الاقتراب من الحد
+    'MAX_PAUSE': 120,          # أطول انتظار لاستعادة الوصول؛ بعدها تفشل الطلبات فوراً
+    'RATE_LIMIT_RETRIES': 3,
+    'BACKOFF': 2.0,            # ثوانٍ للمحاولة الأولى بعد خطأ حد الاستخدام دون وقت محدد
+    'BATCH_SIZE': 50,          # أقصى عدد طلبات فرعية في طلب batch (حد Graph API)
+}
+
+# رموز أخطاء Graph API الخاصة بتجاوز حدود الاستخدام
+RATE_LIMIT_ERROR_CODES = {4, 17, 32, 613} | set(range(80000, 80015))
+
+USAGE_HEADERS = ('X-App-Usage', 'X-Business-Use-Case-Usage', 'X-Ad-Account-Usage', 'X-FB-Ads-Insights-Throttle')
+
+
+def get_meta_graph_api_settings() -> Dict[str, Any]:
+    """دمج إعدادات META_GRAPH_API مع القيم الافتراضية"""
+    config = dict(DEFAULT_META_GRAPH_API_SETTINGS)
+    config.update(getattr(settings, 'META_GRAPH_API', {}))
+    return config
+
+
+class GraphAPIError(requests.RequestException):
+    """استجابة خطأ من Graph API (ترث RequestException لتُعالج مع أخطاء الاتصال)"""
+
+    def __init__(self, message: str, status: Optional[int] = None, code: Optional[int] = None,
+                 details: Any = None, response=None):
+        super().__init__(message, response=response)
+        self.status = status
+        self.code = code
+        self.details = details
+
+    @classmethod
+    def from_response(cls, response) -> 'GraphAPIError':
+        return cls.from_body(response.status_code, response.text, response=response)
+
+    @classmethod
+    def from_body(cls, status: Optional[int], body: Optional[str], response=None) -> 'GraphAPIError':
+        """من رمز الحالة ونص الرد (استجابة كاملة أو طلب فرعي في batch)"""
+        try:
+            error = json.loads(body or '{}').get('error', {})
+        except (ValueError, AttributeError):
+            error = {}
+        return cls(f'API Error: {status} {error.get("message", "")}'.strip(),
+                   status=status, code=error.get('code'), details=error or body, response=response)
+
+    @property
+    def is_rate_limit(self) -> bool:
+        return self.status == 429 or self.code in RATE_LIMIT_ERROR_CODES
+
+
+class GraphAPIRateLimited(GraphAPIError):
+    """تم تجاوز حد الاستخدام لمدة أطول من MAX_PAUSE"""
+
+
+# ---------------------------------------------------------------------------
+# حدود الاستخدام
+# ---------------------------------------------------------------------------
+
+def parse_usage(headers: Mapping[str, str]) -> Tuple[float, float]:
+    """
+    (أعلى نسبة استخدام %، ثوانٍ حتى استعادة الوصول) من ترويسات الاستخدام
+    X-App-Usage: {"call_count": 28, "total_time": 25, "total_cputime": 25}
+    X-Business-Use-Case-Usage: {"<id>": [{"type": "ads_insights", "call_count": 98, ..., "estimated_time_to_regain_access": 5}]}
+    X-Ad-Account-Usage: {"acc_id_util_pct": 9.67, "reset_time_duration": 0}
+    """
+    usage, regain = 0.0, 0.0
+    for header in USAGE_HEADERS:
+        raw = headers.get(header)
+        if not raw:
+            continue
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue
+        entries = [data]
+        if header == 'X-Business-Use-Case-Usage':
+            entries = [entry for values in data.values() for entry in values]
+        for entry in entries:
+            for key in ('call_count', 'total_time', 'total_cputime', 'acc_id_util_pct', 'app_id_util_pct'):
+                try:
+                    usage = max(usage, float(entry.get(key) or 0))
+                except (TypeError, ValueError):
+                    pass
+            regain = max(regain, float(entry.get('estimated_time_to_regain_access') or 0) * 60,
+                         float(entry.get('reset_time_duration') or 0))
+    return usage, regain
+
+
+class RateLimiter:
+    """
+    حالة حدود الاستخدام المشتركة بين كل الخيوط: إيقاف مؤقت حتى استعادة الوصول بعد تجاوز الحد،
+    وطلب واحد كل SLOW_DOWN_INTERVAL عند تجاوز SLOW_DOWN_AT
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._next_slot = 0.0
+        self.usage = 0.0
+
+    def wait(self) -> None:
+        config = get_meta_graph_api_settings()
+        with self._lock:
+            now = time.monotonic()
+            if self._paused_until - now > config['MAX_PAUSE']:
+                raise GraphAPIRateLimited(
+                    f'Rate limited for {self._paused_until - now:.0f}s', status=429, code=4
+                )
+            start = max(now, self._paused_until)
+            if self.usage >= config['SLOW_DOWN_AT']:
+                start = max(start, self._next_slot)
+                self._next_slot = start + config['SLOW_DOWN_INTERVAL']
+        if start > now:
+            time.sleep(start - now)
+
+    def record(self, headers: Mapping[str, str]) -> float:
+        """تحديث الاستخدام من ترويسات الاستجابة؛ يعيد ثواني الإيقاف إذا وصل الاستخدام 100%"""
+        usage, regain = parse_usage(headers)
+        with self._lock:
+            self.usage = usage
+        if usage >= 100:
+            return self.pause(regain)
+        return 0.0
+
+    def pause(self, seconds: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            # تسجيل الإيقاف مرة واحدة وليس لكل خيط وصله رد تجاوز الحد
+            already_paused = self._paused_until > now
+            self._paused_until = max(self._paused_until, now + seconds)
+        if not already_paused:
+            logger.warning(f'Graph API usage limit reached, pausing requests for {seconds:.0f}s')
+        return seconds
+
+
+# ---------------------------------------------------------------------------
+# العميل
+# ---------------------------------------------------------------------------
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """جلسة مشتركة: مجموعة اتصالات keep-alive بحجم MAX_CONCURRENCY، وإعادة المحاولة لأخطاء 5xx في GET"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = get_meta_graph_api_settings()['MAX_CONCURRENCY']
+                retry = Retry(total=2, connect=2, read=1, backoff_factor=0.5,
+                              status_forcelist=(500, 502, 503, 504), allowed_methods=frozenset({'GET'}),
+                              raise_on_status=False)
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+class GraphAPIClient:
+    """طلبات Graph API عبر الجلسة المشتركة مع احترام حدود الاستخدام"""
+
+    limiter = RateLimiter()  # مشترك بين كل العملاء في العملية (الحد على مستوى التطبيق)
+
+    def __init__(self, access_token: Optional[str] = None, base_url: Optional[str] = None):
+        config = get_meta_graph_api_settings()
+        self.access_token = access_token
+        self.base_url = (base_url or config['BASE_URL']).rstrip('/')
+        self.timeout = config['TIMEOUT']
+        self.session = get_session()
+
+    def url(self, path: str) -> str:
+        return path if path.startswith(('http://', 'https://')) else f'{self.base_url}/{path.lstrip("/")}'
+
+    def request(self, method: str, path: str, params: Optional[Dict] = None, data: Optional[Dict] = None,
+                timeout: Optional[float] = None) -> requests.Response:
+        """
+        طلب واحد؛ عند خطأ حد الاستخدام ينتظر (حسب الترويسات أو تراجع أسي) ويعيد المحاولة
+        يعيد الاستجابة كما هي لباقي الأخطاء
+        """
+        config = get_meta_graph_api_settings()
+        attempt = 0
+        while True:
+            self.limiter.wait()
+            response = self.session.request(method, self.url(path), params=params, data=data,
+                                            timeout=timeout or self.timeout)
+            paused = self.limiter.record(response.headers)
+            if response.status_code == 200:
+                return response
+
+            error = GraphAPIError.from_response(response)
+            if not error.is_rate_limit or attempt >= config['RATE_LIMIT_RETRIES']:
+                return response
+            if not paused:
+                self.limiter.pause(config['BACKOFF'] * 2 ** attempt)
+            attempt += 1
+
+    def get(self, path: str, params: Optional[Dict] = None, timeout: Optional[float] = None) -> requests.Response:
+        return self.request('GET', path, params=self._with_token(path, params), timeout=timeout)
+
+    def post(self, path: str, data: Optional[Dict] = None, timeout: Optional[float] = None) -> requests.Response:
+        return self.request('POST', path, data=self._with_token(path, data), timeout=timeout)
+
+    def _with_token(self, path: str, params: Optional[Dict]) -> Dict:
+        params = dict(params or {})
+        # الروابط الكاملة (paging.next) تتضمن الرمز مسبقاً
+        if self.access_token and not path.startswith(('http://', 'https://')):
+            params.setdefault('access_token', self.access_token)
+        return params
+
+    def get_json(self, path: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        response = self.get(path, params)
+        if response.status_code != 200:
+            raise GraphAPIError.from_response(response)
+        return response.json()
+
+    def get_all(self, path: str, params: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        """كل عناصر قائمة مقسمة إلى صفحات (paging.next)"""
+        params = {'limit': get_meta_graph_api_settings()['PAGE_SIZE'], **(params or {})}
+        data = self.get_json(path, params)
+        items = list(data.get('data', []))
+        while data.get('paging', {}).get('next'):
+            # رابط الصفحة التالية يتضمن كل المعاملات
+            data = self.get_json(data['paging']['next'])
+            items.extend(data.get('data', []))
+        return items
+
+    def fetch_concurrent(self, calls: Mapping[Hashable, Tuple[str, Optional[Dict]]],
+                         max_workers: Optional[int] = None) -> Dict[Hashable, Any]:
+        """
+        تنفيذ GET لكل (path, params) بعدد طلبات متزامنة محدود
+        يعيد {المفتاح: JSON أو الاستثناء}؛ فشل طلب لا يوقف الباقي
+        """
+        if not calls:
+            return {}
+        workers = min(max_workers or get_meta_graph_api_settings()['MAX_CONCURRENCY'], len(calls))
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='graph-api') as executor:
+            futures = {
+                executor.submit(self.get_json, path, params): key
+                for key, (path, params) in calls.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except requests.RequestException as e:
+                    results[futures[future]] = e
+        return results
+
+    def batch(self, calls: Mapping[Hashable, Tuple[str, Optional[Dict]]],
+              max_workers: Optional[int] = None) -> Dict[Hashable, Any]:
+        """
+        نفس fetch_concurrent لكن عبر طلبات batch: كل BATCH_SIZE طلب GET في طلب HTTP واحد،
+        والطلبات المجمعة تُرسل بالتوازي بعدد محدود
+        يعيد {المفتاح: JSON أو GraphAPIError} لكل طلب فرعي على حدة
+        """
+        if not calls:
+            return {}
+        size = get_meta_graph_api_settings()['BATCH_SIZE']
+        items = list(calls.items())
+        chunks = [dict(items[start:start + size]) for start in range(0, len(items), size)]
+        if len(chunks) == 1:
+            return self._batch_chunk(chunks[0])
+        workers = min(max_workers or get_meta_graph_api_settings()['MAX_CONCURRENCY'], len(chunks))
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='graph-api') as executor:
+            for chunk_results in executor.map(self._batch_chunk, chunks):
+                results.update(chunk_results)
+        return results
+
+    @staticmethod
+    def _relative_url(path: str, params: Optional[Dict]) -> str:
+        path = path.lstrip('/')
+        return f'{path}?{urlencode(params)}' if params else path
+
+    def _batch_chunk(self, calls: Dict[Hashable, Tuple[str, Optional[Dict]]]) -> Dict[Hashable, Any]:
+        """
+        طلب batch واحد؛ الطلبات الفرعية التي فشلت بسبب حد الاستخدام أو لم تكتمل (null في الرد)
+        يُعاد إرسالها وحدها حتى RATE_LIMIT_RETRIES مرة
+        """
+        config = get_meta_graph_api_settings()
+        results, pending, attempt = {}, dict(calls), 0
+        while pending:
+            payload = [{'method': 'GET', 'relative_url': self._relative_url(path, params)}
+                       for path, params in pending.values()]
+            try:
+                response = self.post('', {'batch': json.dumps(payload), 'include_headers': 'false'})
+                if response.status_code != 200:
+                    raise GraphAPIError.from_response(response)
+                items = response.json()
+                if not isinstance(items, list) or len(items) != len(pending):
+                    raise ValueError('expected one result per sub-request')
+            except (requests.RequestException, ValueError) as e:
+                # فشل الطلب كاملاً: نفس الخطأ لكل الطلبات الفرعية المتبقية
+                error = e if isinstance(e, requests.RequestException) else GraphAPIError(f'Invalid batch response: {e}')
+                results.update((key, error) for key in pending)
+                break
+
+            retry = {}
+            for (key, call), item in zip(pending.items(), items):
+                if item is None:
+                    results[key] = GraphAPIError('Batch sub-request did not complete')
+                    retry[key] = call
+                elif item.get('code') == 200:
+                    try:
+                        results[key] = json.loads(item.get('body') or '{}')
+                    except ValueError as e:
+                        results[key] = GraphAPIError(f'Invalid batch sub-response: {e}', status=200)
+                else:
+                    results[key] = GraphAPIError.from_body(item.get('code'), item.get('body'))
+                    if results[key].is_rate_limit:
+                        retry[key] = call
+
+            if not retry or attempt >= config['RATE_LIMIT_RETRIES']:
+                break
+            self.limiter.pause(config['BACKOFF'] * 2 ** attempt)
+            attempt += 1
+            pending = retry
+        return results
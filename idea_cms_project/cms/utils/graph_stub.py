@@ -0,0 +1,279 @@
+"""
+Graph API Stub
+خادم HTTP محلي يحاكي أجزاء Graph API التي تستخدمها المزامنة (الحسابات، الحملات مع الصفحات، الإحصائيات
+لكل حملة أو على مستوى الحساب بـ level=campaign، وطلبات batch)
+مع زمن استجابة قابل للضبط وترويسات الاستخدام وأخطاء تجاوز الحد، لقياس المزامنة وتجربتها دون حساب حقيقي
+
+يُشغّل بالأمر graph_api_stub، أو داخل العملية: GraphAPIStub(...).start() ثم stub.base_url
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, handler, stub):
+        self.stub = stub
+        super().__init__(address, handler)
+
+    def process_request(self, request, client_address):
+        # كل استدعاء = اتصال TCP جديد (keep-alive يعيد استخدام نفس الاتصال لعدة طلبات)
+        self.stub.count('connections')
+        super().process_request(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # الترويسات والمحتوى في كتابتين: بدون هذا يؤخر Nagle مع delayed ACK كل رد على اتصال keep-alive ~40ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.stub.handle(self, 'GET')
+
+    def do_POST(self):
+        self.server.stub.handle(self, 'POST')
+
+
+class GraphAPIStub:
+    """محاكاة Graph API: accounts حسابات، لكل منها campaigns_per_account حملة"""
+
+    def __init__(self, accounts: int = 2, campaigns_per_account: int = 150, latency: float = 0.05,
+                 rate_limit: Optional[int] = None, window: float = 10.0, access_token: str = 'stub-token',
+                 host: str = '127.0.0.1', port: int = 0, sub_request_latency: float = 0.002):
+        self.accounts = [f'act_{100 + i}' for i in range(accounts)]
+        self.campaigns = {
+            account: [f'{(100 + i) * 100000 + j}' for j in range(campaigns_per_account)]
+            for i, account in enumerate(self.accounts)
+        }
+        self.campaign_ids = {campaign_id for ids in self.campaigns.values() for campaign_id in ids}
+        self.latency = latency
+        self.sub_request_latency = sub_request_latency  # زمن إضافي لكل طلب فرعي في batch
+        self.rate_limit = rate_limit
+        self.window = window
+        self.access_token = access_token
+        self.address = (host, port)
+        self._lock = threading.Lock()
+        self._calls: List[float] = []
+        self._stats = {'requests': 0, 'sub_requests': 0, 'connections': 0, 'rate_limited': 0, 'active': 0,
+                       'max_active': 0}
+        self._server = None
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # التشغيل
+    # ------------------------------------------------------------------
+
+    def start(self) -> 'GraphAPIStub':
+        self._server = _StubServer(self.address, _Handler, self)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name='graph-api-stub')
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def serve_forever(self) -> None:
+        self._server = _StubServer(self.address, _Handler, self)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v18.0'
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = {key: 0 for key in self._stats}
+            self._calls = []
+
+    # ------------------------------------------------------------------
+    # الطلبات
+    # ------------------------------------------------------------------
+
+    def handle(self, handler: BaseHTTPRequestHandler, method: str) -> None:
+        parts = urlsplit(handler.path)
+        params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        if method == 'POST':
+            length = int(handler.headers.get('Content-Length') or 0)
+            body = handler.rfile.read(length).decode('utf-8')
+            params.update({key: values[-1] for key, values in parse_qs(body).items()})
+
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['active'] += 1
+            self._stats['max_active'] = max(self._stats['max_active'], self._stats['active'])
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            status, payload, headers = self.respond(method, parts.path, params)
+        finally:
+            self.count('active', -1)
+
+        body = json.dumps(payload).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _record_calls(self, count: int) -> Tuple[int, float]:
+        """(عدد الطلبات في النافذة الحالية بعد إضافة count، ثوانٍ حتى انتهاء النافذة)"""
+        now = time.monotonic()
+        with self._lock:
+            self._calls = [call for call in self._calls if now - call < self.window]
+            self._calls.extend([now] * count)
+            calls = len(self._calls)
+            oldest = self._calls[0]
+        return calls, max(self.window - (now - oldest), 0.0)
+
+    def _over_limit(self, call: int) -> bool:
+        return bool(self.rate_limit) and call > self.rate_limit
+
+    @staticmethod
+    def _segments(path: str) -> List[str]:
+        segments = [segment for segment in path.split('/') if segment]
+        if segments and segments[0].startswith('v') and segments[0][1:2].isdigit():
+            segments = segments[1:]
+        return segments
+
+    def respond(self, method: str, path: str, params: Dict[str, str]) -> Tuple[int, Any, Dict[str, str]]:
+        segments = self._segments(path)
+        batch = None
+        if method == 'POST' and not segments and 'batch' in params:
+            try:
+                batch = json.loads(params['batch'])
+            except ValueError:
+                batch = []
+
+        # كل طلب فرعي في batch يُحسب من حد الاستخدام كطلب مستقل (كما في Graph API)
+        calls, reset = self._record_calls(len(batch) if batch else 1)
+        usage = calls / self.rate_limit * 100 if self.rate_limit else 1.0
+        headers = {
+            'X-App-Usage': json.dumps({'call_count': round(min(usage, 100)), 'total_time': 1, 'total_cputime': 1}),
+            'X-Ad-Account-Usage': json.dumps({'acc_id_util_pct': 0, 'reset_time_duration': round(reset)}),
+        }
+        if params.get('access_token') != self.access_token:
+            return 400, {'error': {'message': 'Invalid OAuth access token.', 'code': 190}}, headers
+        if batch is not None:
+            return self.batch(batch, calls - len(batch), params, headers)
+        if self._over_limit(calls):
+            self.count('rate_limited')
+            return 400, {'error': {'message': 'Application request limit reached', 'code': 4}}, headers
+        return self.route(method, segments, params, headers)
+
+    def batch(self, requests: List[Dict[str, Any]], first_call: int, params: Dict[str, str],
+              headers: Dict[str, str]) -> Tuple[int, Any, Dict[str, str]]:
+        """تنفيذ الطلبات الفرعية؛ لكل منها رمز حالة ونص رد مستقل"""
+        if not requests or len(requests) > 50:
+            return 400, {'error': {'message': 'Batch must contain between 1 and 50 requests', 'code': 1}}, headers
+        if self.sub_request_latency:
+            time.sleep(self.sub_request_latency * len(requests))
+        self.count('sub_requests', len(requests))
+
+        results = []
+        for index, request in enumerate(requests):
+            parts = urlsplit(request.get('relative_url', ''))
+            sub_params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+            sub_params.setdefault('access_token', params['access_token'])
+            if self._over_limit(first_call + index + 1):
+                self.count('rate_limited')
+                status, payload = 400, {'error': {'message': 'Application request limit reached', 'code': 4}}
+            else:
+                status, payload, _ = self.route(request.get('method', 'GET').upper(), self._segments(parts.path),
+                                                sub_params, headers)
+            results.append({'code': status, 'headers': [{'name': 'Content-Type', 'value': 'application/json'}],
+                            'body': json.dumps(payload)})
+        return 200, results, headers
+
+    def route(self, method: str, segments: List[str], params: Dict[str, str],
+              headers: Dict[str, str]) -> Tuple[int, Any, Dict[str, str]]:
+        if segments == ['me']:
+            return 200, {'id': '10001', 'name': 'Idea Stub Business'}, headers
+        if segments == ['me', 'adaccounts']:
+            accounts = [{'id': account, 'name': f'Account {account}', 'account_status': 1, 'currency': 'SAR',
+                         'timezone_name': 'Asia/Riyadh'} for account in self.accounts]
+            return 200, self.page(accounts, segments, params), headers
+        if len(segments) == 2 and segments[1] == 'campaigns' and segments[0] in self.campaigns:
+            if method == 'POST':
+                return 200, {'id': str(int(time.time() * 1000))}, headers
+            campaigns = [self.campaign(campaign_id) for campaign_id in self.campaigns[segments[0]]]
+            return 200, self.page(campaigns, segments, params), headers
+        if len(segments) == 2 and segments[1] == 'insights':
+            if segments[0] in self.campaigns:
+                # إحصائيات الحساب: صف لكل حملة مع level=campaign
+                if params.get('level') != 'campaign':
+                    return 400, {'error': {'message': 'Stub supports level=campaign only', 'code': 100}}, headers
+                rows = [self.insights(campaign_id, params) for campaign_id in self.campaigns[segments[0]]]
+                return 200, self.page(rows, segments, params), headers
+            if segments[0] in self.campaign_ids:
+                return 200, {'data': [self.insights(segments[0], params)]}, headers
+            return 400, {'error': {'message': f"Unsupported get request. Object with ID '{segments[0]}' does not "
+                                              f"exist", 'code': 100}}, headers
+        return 404, {'error': {'message': 'Unknown path', 'code': 803}}, headers
+
+    def page(self, items: List[Dict], segments: List[str], params: Dict[str, str]) -> Dict[str, Any]:
+        """تقسيم إلى صفحات بمؤشر after كما في Graph API"""
+        limit = int(params.get('limit') or 25)
+        start = int(params.get('after') or 0)
+        data = {'data': items[start:start + limit]}
+        if start + limit < len(items):
+            query = {key: value for key, value in params.items() if key != 'after'}
+            query['after'] = start + limit
+            data['paging'] = {'next': f'{self.base_url}/{"/".join(segments)}?{urlencode(query)}'}
+        return data
+
+    def campaign(self, campaign_id: str) -> Dict[str, Any]:
+        return {
+            'id': campaign_id,
+            'name': f'Campaign {campaign_id}',
+            'status': 'ACTIVE' if int(campaign_id) % 3 else 'PAUSED',
+            'objective': 'OUTCOME_TRAFFIC',
+            'created_time': '2024-01-15T10:00:00+0000',
+            'updated_time': '2024-02-01T10:00:00+0000',
+        }
+
+    def insights(self, campaign_id: str, params: Dict[str, str]) -> Dict[str, Any]:
+        """أرقام ثابتة مشتقة من معرف الحملة"""
+        seed = int(campaign_id) % 997
+        impressions = 1000 + seed * 37
+        clicks = 10 + seed
+        spend = round(5 + seed * 0.73, 2)
+        return {
+            'campaign_id': campaign_id,
+            'impressions': str(impressions),
+            'clicks': str(clicks),
+            'spend': f'{spend:.2f}',
+            'reach': str(impressions * 4 // 5),
+            'frequency': '1.25',
+            'ctr': f'{clicks / impressions * 100:.4f}',
+            'cpc': f'{spend / clicks:.4f}',
+            'cpm': f'{spend / impressions * 1000:.4f}',
+            'cpp': f'{spend / impressions * 1250:.4f}',
+            'date_start': json.loads(params.get('time_range', '{}')).get('since', ''),
+            'date_stop': json.loads(params.get('time_range', '{}')).get('until', ''),
+        }
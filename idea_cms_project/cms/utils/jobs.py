@@ -0,0 +1,100 @@
+"""
+Background Jobs
+منفّذ مهام خلفية داخل العملية (ThreadPoolExecutor) دون الحاجة إلى وسيط خارجي
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_SETTINGS = {
+    'ENABLED': True,
+    'MAX_WORKERS': 2,
+    'JOB_TIMEOUT': 1800,  # ثوانٍ، بعدها تعتبر المهمة المعلقة متوقفة
+}
+
+
+def get_job_settings() -> Dict[str, Any]:
+    """دمج إعدادات BACKGROUND_JOBS مع القيم الافتراضية"""
+    config = dict(DEFAULT_JOB_SETTINGS)
+    config.update(getattr(settings, 'BACKGROUND_JOBS', {}))
+    return config
+
+
+class BackgroundJobRunner:
+    """
+    تشغيل دوال على مجموعة خيوط محدودة
+
+    المهام هنا تعتمد على قاعدة البيانات (ORM) لذا الخيوط كافية ولا حاجة لعمليات منفصلة؛
+    كل مهمة تغلق اتصالات قاعدة البيانات الخاصة بخيطها عند انتهائها.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._counters = {'submitted': 0, 'completed': 0, 'failed': 0}
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        return self._get_executor().submit(self._run, func, args, kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            data = dict(self._counters)
+        data['running'] = data['submitted'] - data['completed'] - data['failed']
+        data['max_workers'] = self.max_workers
+        return data
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # بعد fork (gunicorn) لا تنتقل الخيوط إلى العملية الابنة فننشئ منفذاً جديداً
+        pid = os.getpid()
+        with self._lock:
+            if self._executor is None or self._pid != pid:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='background-job'
+                )
+                self._pid = pid
+            self._counters['submitted'] += 1
+            return self._executor
+
+    def _run(self, func, args, kwargs):
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            logger.exception(f"Background job {getattr(func, '__name__', func)} failed")
+            with self._lock:
+                self._counters['failed'] += 1
+            raise
+        else:
+            with self._lock:
+                self._counters['completed'] += 1
+            return result
+        finally:
+            close_old_connections()
+
+
+_job_runner: Optional[BackgroundJobRunner] = None
+_job_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> Optional[BackgroundJobRunner]:
+    """المنفذ المشترك للعملية، أو None إذا كانت المهام الخلفية معطلة (تنفيذ متزامن)"""
+    global _job_runner
+
+    config = get_job_settings()
+    if not config['ENABLED']:
+        return None
+
+    if _job_runner is None:
+        with _job_runner_lock:
+            if _job_runner is None:
+                _job_runner = BackgroundJobRunner(max_workers=config['MAX_WORKERS'])
+    return _job_runner
@@ -0,0 +1,161 @@
+"""
+Platform Metrics
+تجميع أداء المنصات الخارجية: استعلام GROUP BY واحد لكل المنصات والمعدلات الموزونة تُحسب من نتيجته
+"""
+
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from django.core.cache import cache
+from django.db.models import Count, Sum
+
+from ..models import AdCampaign, CampaignDailyReport
+from .shared_cache import cross_process_cache_usable
+
+SUM_FIELDS = ('impressions', 'clicks', 'spend', 'reach')
+
+# نسخة بيانات التقارير في الذاكرة المؤقتة: تتغير مع كل مزامنة فتصبح المفاتيح القديمة غير مستخدمة
+CACHE_VERSION_KEY = 'platform_metrics:version'
+UNIFIED_REPORT_CACHE_TIMEOUT = 3600
+
+
+def _rates(metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """CTR و CPC موزونة: مجموع النقرات / مجموع الظهور بدلاً من متوسط النسب اليومية"""
+    impressions, clicks = metrics['total_impressions'], metrics['total_clicks']
+    metrics['ctr'] = (clicks / impressions) * 100 if impressions else 0
+    metrics['cpc'] = metrics['total_spend'] / clicks if clicks else 0
+    return metrics
+
+
+def report_queryset(date_from: Optional[date] = None, date_to: Optional[date] = None, queryset=None):
+    """تقارير الحملات اليومية ضمن الفترة (الحدود شاملة)"""
+    if queryset is None:
+        queryset = CampaignDailyReport.objects.all()
+    if date_from:
+        queryset = queryset.filter(report_date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(report_date__lte=date_to)
+    return queryset
+
+
+def platform_metrics(queryset) -> Dict[str, Any]:
+    """
+    مقاييس كل منصة موجودة في التقارير مع الإجماليات في استعلام واحد
+
+    النتيجة: {'platforms': {platform: metrics}, 'totals': metrics}
+    حيث metrics = total_impressions, total_clicks, total_spend, total_reach, campaigns_count, ctr, cpc
+    """
+    rows = queryset.order_by().values('platform').annotate(
+        **{f'total_{field}': Sum(field) for field in SUM_FIELDS},
+        campaigns_count=Count('campaign_id', distinct=True),
+    )
+
+    platforms = {}
+    totals = {f'total_{field}': 0 for field in SUM_FIELDS}
+    totals['campaigns_count'] = 0
+
+    for row in rows:
+        metrics = {key: row[key] or 0 for key in totals}
+        metrics['total_spend'] = float(metrics['total_spend'])
+        platforms[row['platform']] = _rates(metrics)
+        for key in totals:
+            totals[key] += metrics[key]
+
+    return {'platforms': platforms, 'totals': _rates(totals)}
+
+
+def campaign_status_counts(queryset=None) -> Dict[str, Any]:
+    """
+    أعداد الحملات حسب المنصة والحالة في استعلام واحد
+
+    النتيجة: {'total', 'by_status': {status: n}, 'platforms': {platform: {'total', 'by_status'}}}
+    """
+    if queryset is None:
+        queryset = AdCampaign.objects.all()
+
+    result = {'total': 0, 'by_status': {}, 'platforms': {}}
+    rows = queryset.order_by().values('platform', 'status').annotate(count=Count('id'))
+    for row in rows:
+        count, status = row['count'], row['status']
+        platform = result['platforms'].setdefault(row['platform'], {'total': 0, 'by_status': {}})
+        platform['total'] += count
+        platform['by_status'][status] = platform['by_status'].get(status, 0) + count
+        result['total'] += count
+        result['by_status'][status] = result['by_status'].get(status, 0) + count
+    return result
+
+
+def daily_series(queryset, date_from: date, date_to: date) -> List[Dict[str, Any]]:
+    """مقاييس كل يوم في الفترة (مع الأيام الفارغة) من استعلام GROUP BY واحد على report_date"""
+    rows = queryset.order_by().values('report_date').annotate(
+        **{f'total_{field}': Sum(field) for field in SUM_FIELDS}
+    )
+    by_day = {row['report_date']: row for row in rows}
+
+    series = []
+    day = date_from
+    while day <= date_to:
+        row = by_day.get(day, {})
+        metrics = {f'total_{field}': row.get(f'total_{field}') or 0 for field in SUM_FIELDS}
+        metrics['total_spend'] = float(metrics['total_spend'])
+        series.append({'date': day.isoformat(), **_rates(metrics)})
+        day += timedelta(days=1)
+    return series
+
+
+def metrics_cache_version() -> int:
+    """النسخة الحالية لبيانات التقارير (جزء من مفتاح كل تقرير مخزن)"""
+    return cache.get_or_set(CACHE_VERSION_KEY, time.time_ns, None)
+
+
+def invalidate_platform_metrics() -> None:
+    """إبطال التقارير المخزنة مؤقتاً بعد كتابة تقارير حملات جديدة"""
+    cache.set(CACHE_VERSION_KEY, time.time_ns(), None)
+
+
+def unified_report_data(date_from: date, date_to: date, include_series: bool = False) -> Dict[str, Any]:
+    """
+    التقرير الموحد لكل المنصات، مخزن مؤقتاً لكل (الفترة، اليوم) حتى المزامنة التالية
+    لا يُخزن مع ذاكرة داخل العملية: إبطال المزامنة لن يصل إلى باقي العمليات
+    """
+    use_cache = cross_process_cache_usable()
+    if use_cache:
+        cache_key = (f'platform_metrics:unified:{metrics_cache_version()}:'
+                     f'{date_from.isoformat()}:{date_to.isoformat()}:{int(include_series)}')
+        data = cache.get(cache_key)
+        if data is not None:
+            return data
+
+    queryset = report_queryset(date_from, date_to)
+    metrics = platform_metrics(queryset)
+    totals = metrics['totals']
+
+    data = {
+        'total_impressions': totals['total_impressions'],
+        'total_clicks': totals['total_clicks'],
+        'total_spend': totals['total_spend'],
+        'total_reach': totals['total_reach'],
+        'overall_ctr': totals['ctr'],
+        'overall_cpc': totals['cpc'],
+        'platforms': {
+            platform: {
+                'impressions': values['total_impressions'],
+                'clicks': values['total_clicks'],
+                'spend': values['total_spend'],
+                'reach': values['total_reach'],
+                'campaigns': values['campaigns_count'],
+            }
+            for platform, values in metrics['platforms'].items()
+        },
+        'date_range': {
+            'start': date_from.isoformat(),
+            'end': date_to.isoformat()
+        }
+    }
+    if include_series:
+        data['daily'] = daily_series(queryset, date_from, date_to)
+
+    if use_cache:
+        cache.set(cache_key, data, UNIFIED_REPORT_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,132 @@
+"""
+Analytics Reports
+إنشاء بيانات تقارير التحليلات في الخلفية مع دمج الطلبات المتطابقة قيد التنفيذ
+"""
+
+import logging
+import threading
+from datetime import date, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from django.utils import timezone
+
+from ..models import AnalyticsReport
+from .jobs import get_job_runner, get_job_settings
+from .rollups import submission_rollup_stats, unique_count_mode, visit_rollup_analytics
+
+logger = logging.getLogger(__name__)
+
+IN_FLIGHT_STATUSES = ('pending', 'running')
+
+# يمنع إنشاء تقريرين معلقين لنفس الطلب من خيطين في نفس العملية
+_request_lock = threading.Lock()
+
+
+def generate_report_data(report_type: str, date_from: date, date_to: date,
+                         unique: Optional[str] = None) -> Dict[str, Any]:
+    """إنشاء بيانات التقرير"""
+    # الأيام المغلقة من جداول التجميع اليومية والباقي من السجلات الخام
+    visits = visit_rollup_analytics(date_from, date_to, unique=unique)
+
+    # تحليلات الموقع
+    website_analytics = {
+        'total_visitors': visits['total_visitors'],
+        'total_page_views': visits['total_page_views'],
+        'bounce_rate': visits['bounce_rate'],
+        'avg_session_duration': visits['avg_session_duration']
+    }
+
+    # إرسالات النماذج
+    form_submissions = submission_rollup_stats(date_from, date_to)
+
+    # رؤى الزوار
+    visitor_insights = {
+        **website_analytics,
+        'device_breakdown': visits['device_breakdown'],
+        'browser_breakdown': visits['browser_breakdown']
+    }
+
+    # أداء المنصات (يمكن توسيعه لاحقاً)
+    platform_performance = {
+        'meta_business': {},
+        'twitter': {},
+        'google_analytics': {}
+    }
+
+    return {
+        'website_analytics': website_analytics,
+        'form_submissions': form_submissions,
+        'visitor_insights': visitor_insights,
+        'platform_performance': platform_performance
+    }
+
+
+def build_report(report_id: int) -> None:
+    """حساب بيانات تقرير معلق وحفظها مع تحديث حالته"""
+    report = AnalyticsReport.objects.only('report_type', 'date_from', 'date_to', 'unique_count').get(pk=report_id)
+    AnalyticsReport.objects.filter(pk=report_id).update(status='running')
+
+    try:
+        data = generate_report_data(report.report_type, report.date_from, report.date_to,
+                                    unique=report.unique_count or None)
+    except Exception as e:
+        logger.exception(f"Analytics report {report_id} failed")
+        AnalyticsReport.objects.filter(pk=report_id).update(status='failed', error_message=str(e))
+        raise
+
+    AnalyticsReport.objects.filter(pk=report_id).update(status='completed', error_message='', **data)
+
+
+def find_in_flight_report(report_type: str, date_from: date, date_to: date,
+                          unique_count: str) -> Optional[AnalyticsReport]:
+    """
+    تقرير معلق لنفس النوع والفترة وطريقة عد الزوار لم يتجاوز مهلة المهام (المهام الأقدم تعتبر متوقفة)
+    """
+    cutoff = timezone.now() - timedelta(seconds=get_job_settings()['JOB_TIMEOUT'])
+    return AnalyticsReport.objects.filter(
+        report_type=report_type,
+        date_from=date_from,
+        date_to=date_to,
+        unique_count=unique_count,
+        status__in=IN_FLIGHT_STATUSES,
+        generated_at__gte=cutoff,
+    ).order_by('generated_at').first()
+
+
+def request_report(title: str, report_type: str, date_from: date, date_to: date, user,
+                   unique: Optional[str] = None) -> Tuple[AnalyticsReport, bool]:
+    """
+    طلب إنشاء تقرير في الخلفية
+
+    يعيد (التقرير، created): إذا كان هناك تقرير مطابق قيد التنفيذ يعاد هو بدلاً من حساب جديد.
+    عند تعطيل المهام الخلفية يُحسب التقرير مباشرة ويعاد مكتملاً.
+    """
+    # الطريقة الفعلية (exact / approx) جزء من مفتاح الدمج: None والقيمة الافتراضية نفس التقرير
+    unique_count = unique_count_mode(unique)
+    with _request_lock:
+        existing = find_in_flight_report(report_type, date_from, date_to, unique_count)
+        if existing is not None:
+            return existing, False
+
+        report = AnalyticsReport.objects.create(
+            title=title,
+            report_type=report_type,
+            date_from=date_from,
+            date_to=date_to,
+            generated_by=user,
+            unique_count=unique_count,
+            status='pending',
+        )
+
+    runner = get_job_runner()
+    if runner is None:
+        try:
+            build_report(report.pk)
+        except Exception:
+            # الخطأ مسجل وحالة failed محفوظة في التقرير نفسه
+            pass
+        report.refresh_from_db()
+    else:
+        runner.submit(build_report, report.pk)
+
+    return report, True
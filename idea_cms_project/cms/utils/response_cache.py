@@ -0,0 +1,251 @@
+"""
+Response Cache
+ذاكرة مؤقتة لاستجابات DRF العامة مع إبطال بالوسوم (tags)
+
+كل استجابة مخزنة تحفظ نسخ الوسوم التي تعتمد عليها (مثل blogpost:* و category:12)، وحفظ أو حذف
+أي كائن يغيّر نسخة وسومه فتصبح كل الاستجابات المعتمدة عليها غير صالحة دون البحث عنها.
+إعادة الحساب بعد الإبطال يقوم بها طلب واحد فقط (single-flight)، والباقي يُخدم بالنسخة السابقة،
+أو يحسب الاستجابة مباشرة دون تخزينها إذا لم تكن هناك نسخة سابقة (لا انتظار يشغل عمليات الطلبات).
+
+تتطلب ذاكرة مشتركة بين العمليات (REDIS_URL)، وإلا تُعطّل (انظر shared_cache).
+"""
+
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .etags import weak_etag
+from .shared_cache import cross_process_cache_usable
+
+DEFAULT_RESPONSE_CACHE_SETTINGS = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'TIMEOUT': 300,       # حد أقصى لعمر الاستجابة حتى مع عدم تغير الوسوم
+    'LOCK_TIMEOUT': 10,   # مدة قفل إعادة الحساب
+}
+
+# معاملات لا تغيّر الاستجابة (روابط الحملات الإعلانية)
+IGNORED_QUERY_PARAMS = {'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content', 'fbclid', 'gclid'}
+
+KEY_PREFIX = 'response_cache'
+
+_stats = {'hits': 0, 'misses': 0, 'stale': 0, 'uncached': 0, 'not_modified': 0, 'bypass': 0, 'invalidations': 0}
+_stats_lock = threading.Lock()
+
+
+def get_response_cache_settings() -> Dict[str, Any]:
+    """دمج إعدادات RESPONSE_CACHE مع القيم الافتراضية"""
+    config = dict(DEFAULT_RESPONSE_CACHE_SETTINGS)
+    config.update(getattr(settings, 'RESPONSE_CACHE', {}))
+    return config
+
+
+def _cache():
+    return caches[get_response_cache_settings()['CACHE']]
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def response_cache_stats() -> Dict[str, Any]:
+    """عدادات hits/misses في هذه العملية"""
+    with _stats_lock:
+        data = dict(_stats)
+    served = data['hits'] + data['stale']
+    total = served + data['misses'] + data['uncached']
+    data['hit_rate'] = round(served / total * 100, 2) if total else 0
+    data['enabled'] = response_cache_enabled()
+    return data
+
+
+def response_cache_enabled() -> bool:
+    config = get_response_cache_settings()
+    return config['ENABLED'] and cross_process_cache_usable(config['CACHE'])
+
+
+# ---------------------------------------------------------------------------
+# الوسوم
+# ---------------------------------------------------------------------------
+
+def _tag_key(tag: str) -> str:
+    return f'{KEY_PREFIX}:tag:{tag}'
+
+
+def tag_versions(tags: Iterable[str], create: bool = False) -> Dict[str, Optional[int]]:
+    """النسخة الحالية لكل وسم في طلب واحد (create: إنشاء نسخ للوسوم التي لا نسخة لها بعد)"""
+    cache = _cache()
+    tags = list(tags)
+    values = cache.get_many([_tag_key(tag) for tag in tags])
+    versions = {tag: values.get(_tag_key(tag)) for tag in tags}
+    if create:
+        for tag, version in versions.items():
+            if version is None:
+                cache.add(_tag_key(tag), time.time_ns(), None)
+                versions[tag] = cache.get(_tag_key(tag))
+    return versions
+
+
+def invalidate_tags(*tags: str) -> None:
+    """إبطال كل الاستجابات المعتمدة على أي من الوسوم"""
+    if not tags:
+        return
+    version = time.time_ns()
+    _cache().set_many({_tag_key(tag): version for tag in tags}, None)
+    _count('invalidations')
+
+
+def model_tag(model, pk: Any = '*') -> str:
+    return f'{model._meta.model_name}:{pk}'
+
+
+# ---------------------------------------------------------------------------
+# مفاتيح الطلبات
+# ---------------------------------------------------------------------------
+
+def auth_class(user) -> str:
+    """فئة المستخدم في مفتاح الاستجابة: المستخدمون في نفس الفئة يرون نفس البيانات العامة"""
+    if not user.is_authenticated:
+        return 'anon'
+    if user.is_staff:
+        return 'staff'
+    if hasattr(user, 'profile') and user.profile.user_type == 'client':
+        return 'client'
+    return 'user'
+
+
+def request_key(request) -> str:
+    """المسار + المضيف + معاملات الاستعلام المرتبة (بدون معاملات التتبع) + فئة المستخدم"""
+    params = sorted(
+        (name, value)
+        for name, values in request.query_params.lists() if name not in IGNORED_QUERY_PARAMS
+        for value in values
+    )
+    query = '&'.join(f'{name}={value}' for name, value in params)
+    raw = f'{request.scheme}://{request.get_host()}{request.path}?{query}|{auth_class(request.user)}'
+    return f'{KEY_PREFIX}:entry:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+# ---------------------------------------------------------------------------
+# التخزين والقراءة
+# ---------------------------------------------------------------------------
+
+def _is_valid(entry: Optional[Dict]) -> bool:
+    if entry is None:
+        return False
+    return tag_versions(entry['tags']) == entry['tags']
+
+
+def cached_response(request, compute: Callable[[], Response], tags: Iterable[str],
+                    object_tags: Optional[Callable[[Any], Iterable[str]]] = None, etag: bool = True) -> Response:
+    """
+    استجابة من الذاكرة المؤقتة إن كانت وسومها لم تتغير، وإلا compute() وتخزين نتيجتها
+    tags: وسوم البيانات المعروفة مسبقاً، object_tags(data): وسوم الكائنات الموجودة في النتيجة
+    etag: حفظ ETag ضعيف مع الاستجابة والرد بـ 304 عند تطابق If-None-Match دون بناء الاستجابة
+    (يُعطّل إذا كانت الواجهة تعدّل البيانات بعد الذاكرة المؤقتة)
+    تُخزن فقط استجابات 200 لطلبات GET
+    """
+    config = get_response_cache_settings()
+    if not response_cache_enabled() or request.method not in ('GET', 'HEAD'):
+        _count('bypass')
+        return compute()
+
+    cache = _cache()
+    key = request_key(request)
+    entry = cache.get(key)
+    if _is_valid(entry):
+        _count('hits')
+        if entry.get('etag'):
+            not_modified = get_conditional_response(request, etag=entry['etag'])
+            if not_modified is not None:
+                _count('not_modified')
+                not_modified['ETag'] = entry['etag']
+                return not_modified
+        return _from_entry(entry, 'HIT')
+
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, config['LOCK_TIMEOUT']):
+        # طلب آخر يعيد الحساب: النسخة السابقة إن وجدت، وإلا الحساب مباشرة دون تخزين
+        if entry is not None:
+            _count('stale')
+            return _from_entry(entry, 'STALE')
+        _count('uncached')
+        response = compute()
+        response['X-Cache'] = 'BYPASS'
+        return response
+
+    try:
+        # نسخ الوسوم قبل الحساب: أي تعديل أثناءه يجعل النتيجة غير صالحة عند القراءة التالية
+        versions = tag_versions(tags, create=True)
+        response = compute()
+        if response.status_code == 200:
+            if object_tags is not None:
+                versions.update(tag_versions(object_tags(response.data), create=True))
+            entry = {'tags': versions, 'data': response.data, 'status': response.status_code, 'etag': None}
+            if etag:
+                entry['etag'] = response['ETag'] = weak_etag(JSONRenderer().render(response.data))
+            cache.set(key, entry, config['TIMEOUT'])
+    finally:
+        cache.delete(lock_key)
+
+    _count('misses')
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def _from_entry(entry: Dict, state: str) -> Response:
+    response = Response(entry['data'], status=entry['status'])
+    response['X-Cache'] = state
+    if entry.get('etag'):
+        response['ETag'] = entry['etag']
+    return response
+
+
+def response_ids(data) -> List[Any]:
+    """معرّفات الكائنات في استجابة تفصيلية أو قائمة (مع أو بدون ترقيم صفحات)"""
+    if isinstance(data, dict):
+        if isinstance(data.get('results'), list):
+            data = data['results']
+        elif 'id' in data:
+            return [data['id']]
+        else:
+            return []
+    if isinstance(data, list):
+        return [item['id'] for item in data if isinstance(item, dict) and 'id' in item]
+    return []
+
+
+class CachedResponseMixin:
+    """
+    تخزين list و retrieve لـ ViewSet مؤقتاً
+
+    cache_tags: وسوم البيانات التي تظهر في الاستجابة (النموذج نفسه والنماذج المضمنة في المسلسل)،
+    ويضاف إليها وسم كل كائن في الاستجابة (blogpost:12) تلقائياً
+    """
+
+    cache_tags = ()
+    cache_etag = True
+
+    def get_object_cache_tags(self, data) -> List[str]:
+        return [model_tag(self.queryset.model, pk) for pk in response_ids(data)]
+
+    def cached_response(self, request, compute: Callable[[], Response], tags=None) -> Response:
+        if tags is not None:
+            return cached_response(request, compute, tags)
+        return cached_response(request, compute, self.cache_tags, self.get_object_cache_tags, etag=self.cache_etag)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs)
+        )
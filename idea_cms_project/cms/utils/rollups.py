@@ -0,0 +1,417 @@
+"""
+Analytics Rollups
+جداول تجميع يومية لسجلات الزوار والإرسالات: تُبنى تدريجياً بأمر rollup_analytics
+وتُقرأ للأيام المغلقة، بينما يُقرأ اليوم المفتوح (وما بعد آخر تجميع) من السجلات الخام
+"""
+
+import json
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from ..models import (
+    DailyPageStats, DailySubmissionStats, DailyVisitorBreakdown, DailyVisitorStats,
+    FormSubmission, SystemSettings, VisitorTracking
+)
+from .analytics import GroupSpec, grouped_counts
+from .hyperloglog import HyperLogLog
+
+WATERMARK_KEY = 'analytics_rollup_watermark'
+
+TOP_N = 10
+
+BREAKDOWN_DIMENSIONS = ('device_type', 'browser', 'country', 'referrer')
+
+# الحقل الذي يُعد عليه الزوار الفريدون -> حقل الرسم في DailyVisitorStats
+SKETCH_FIELDS = {
+    'session_key': 'visitors_sketch',
+    'ip_address': 'ip_sketch',
+}
+
+UNIQUE_COUNT_MODES = ('exact', 'approx')
+
+RAW_VISIT_GROUPS = {
+    'pages': GroupSpec(('page_url', 'page_title')),
+    **{dimension: GroupSpec((dimension,)) for dimension in BREAKDOWN_DIMENSIONS},
+}
+
+
+def day_bounds(day: date) -> Tuple[datetime, datetime]:
+    """بداية اليوم ونهايته (غير شاملة) بالتوقيت المحلي"""
+    start = datetime.combine(day, time.min)
+    end = datetime.combine(day + timedelta(days=1), time.min)
+    if settings.USE_TZ:
+        start, end = timezone.make_aware(start), timezone.make_aware(end)
+    return start, end
+
+
+# ==================== العلامة المائية (watermark) ====================
+
+def get_watermark() -> Tuple[Optional[date], Optional[datetime]]:
+    """آخر يوم مغلق تم تجميعه ووقت آخر تشغيل، من SystemSettings"""
+    setting = SystemSettings.objects.filter(key=WATERMARK_KEY).first()
+    if setting is None:
+        return None, None
+    try:
+        data = json.loads(setting.value)
+        closed_through = date.fromisoformat(data['closed_through'])
+        last_run_at = datetime.fromisoformat(data['last_run_at'])
+    except (ValueError, KeyError, TypeError):
+        return None, None
+    return closed_through, last_run_at
+
+
+def set_watermark(closed_through: date, last_run_at: datetime):
+    SystemSettings.objects.update_or_create(
+        key=WATERMARK_KEY,
+        defaults={
+            'value': json.dumps({
+                'closed_through': closed_through.isoformat(),
+                'last_run_at': last_run_at.isoformat(),
+            }),
+            'description': 'آخر يوم تم تجميعه في جداول التحليلات اليومية',
+        },
+    )
+
+
+# ==================== بناء التجميعات ====================
+
+def rollup_visits_day(day: date) -> int:
+    """إعادة بناء تجميعات الزوار ليوم واحد، وتعيد عدد المشاهدات"""
+    start, end = day_bounds(day)
+    visits = VisitorTracking.objects.filter(visited_at__gte=start, visited_at__lt=end).order_by()
+
+    totals = visits.aggregate(
+        page_views=Count('id'),
+        bounces=Count('id', filter=Q(is_bounce=True)),
+        total_duration=Sum('visit_duration'),
+    )
+    pages = visits.values('page_url', 'page_title').annotate(
+        views=Count('id'),
+        bounces=Count('id', filter=Q(is_bounce=True)),
+        total_duration=Sum('visit_duration'),
+    )
+    breakdowns = grouped_counts(
+        visits, {dimension: GroupSpec((dimension,)) for dimension in BREAKDOWN_DIMENSIONS}
+    ) if totals['page_views'] else {}
+
+    with transaction.atomic():
+        DailyVisitorStats.objects.filter(date=day).delete()
+        DailyPageStats.objects.filter(date=day).delete()
+        DailyVisitorBreakdown.objects.filter(date=day).delete()
+        if not totals['page_views']:
+            return 0
+
+        DailyVisitorStats.objects.create(
+            date=day,
+            page_views=totals['page_views'],
+            bounces=totals['bounces'],
+            total_duration=totals['total_duration'] or 0,
+            **{
+                sketch_field: _build_sketch(visits, field).to_bytes()
+                for field, sketch_field in SKETCH_FIELDS.items()
+            }
+        )
+        DailyPageStats.objects.bulk_create([
+            DailyPageStats(date=day, **page) for page in pages
+        ], batch_size=1000)
+        DailyVisitorBreakdown.objects.bulk_create([
+            DailyVisitorBreakdown(date=day, dimension=dimension, value=value or '', visits=count)
+            for dimension, items in breakdowns.items()
+            for (value,), count in items
+        ], batch_size=1000)
+
+    return totals['page_views']
+
+
+def _build_sketch(queryset, field: str) -> HyperLogLog:
+    """رسم HyperLogLog للقيم المميزة لحقل (DISTINCT في قاعدة البيانات يقلل عدد الصفوف المنقولة)"""
+    sketch = HyperLogLog()
+    sketch.update(queryset.order_by().values_list(field, flat=True).distinct().iterator(chunk_size=5000))
+    return sketch
+
+
+def rollup_submissions_day(day: date) -> int:
+    """إعادة بناء تجميعات الإرسالات ليوم واحد، وتعيد عدد الإرسالات"""
+    start, end = day_bounds(day)
+    rows = list(
+        FormSubmission.objects.filter(submitted_at__gte=start, submitted_at__lt=end)
+        .order_by()
+        .values('form_id', 'status')
+        .annotate(submissions=Count('id'))
+    )
+
+    with transaction.atomic():
+        DailySubmissionStats.objects.filter(date=day).delete()
+        DailySubmissionStats.objects.bulk_create([DailySubmissionStats(date=day, **row) for row in rows])
+
+    return sum(row['submissions'] for row in rows)
+
+
+def rollup_day(day: date) -> Dict[str, int]:
+    return {'page_views': rollup_visits_day(day), 'submissions': rollup_submissions_day(day)}
+
+
+def run_rollups(since: Optional[date] = None, until: Optional[date] = None, rebuild: bool = False) -> List[date]:
+    """
+    تجميع الأيام المغلقة الجديدة منذ آخر علامة مائية (أو منذ since / أول سجل عند rebuild)
+    ويعيد أيضاً تجميع إرسالات الأيام السابقة التي تغيّرت حالتها منذ آخر تشغيل
+    """
+    run_started = timezone.now()
+    yesterday = timezone.localdate() - timedelta(days=1)
+    until = min(until or yesterday, yesterday)  # اليوم الحالي لا يُجمّع أبداً
+    closed_through, last_run_at = get_watermark()
+
+    if since is None and closed_through is not None and not rebuild:
+        since = closed_through + timedelta(days=1)
+    if since is None:
+        first_visit = VisitorTracking.objects.aggregate(first=Min('visited_at'))['first']
+        first_submission = FormSubmission.objects.aggregate(first=Min('submitted_at'))['first']
+        candidates = [timezone.localtime(value).date() for value in (first_visit, first_submission) if value]
+        since = min(candidates) if candidates else until + timedelta(days=1)
+
+    days = []
+    day = since
+    while day <= until:
+        rollup_day(day)
+        days.append(day)
+        day += timedelta(days=1)
+
+    # الإرسالات تتغير حالتها بعد إغلاق اليوم (update_status يحدّث processed_at)
+    if last_run_at is not None:
+        stale_days = (
+            FormSubmission.objects.filter(processed_at__gte=last_run_at, submitted_at__lt=day_bounds(since)[0])
+            .order_by()
+            .annotate(day=TruncDate('submitted_at'))
+            .values_list('day', flat=True)
+            .distinct()
+        )
+        for stale_day in sorted(stale_days):
+            rollup_submissions_day(stale_day)
+            days.append(stale_day)
+
+    new_watermark = max(filter(None, [closed_through, until]))
+    set_watermark(new_watermark, run_started)
+    return days
+
+
+# ==================== القراءة ====================
+
+def parse_day_range(date_from: Optional[str], date_to: Optional[str]) -> Optional[Tuple[Optional[date], Optional[date]]]:
+    """
+    تحويل معاملات التاريخ إلى أيام (شاملة)، أو None إذا لم تكن محاذية لحدود الأيام
+    (مثل قيم تحتوي على وقت) وبالتالي لا يمكن خدمتها من التجميعات
+    """
+    days = []
+    for value in (date_from, date_to):
+        if not value:
+            days.append(None)
+            continue
+        try:
+            day = parse_date(value)
+        except ValueError:
+            return None
+        if day is None:
+            return None
+        days.append(day)
+    return days[0], days[1]
+
+
+def _split_range(date_from: Optional[date], date_to: Optional[date]):
+    """
+    تقسيم النطاق إلى أيام مغلقة تُقرأ من التجميعات وجزء مفتوح يُقرأ من السجلات الخام
+    يعيد ((أول يوم, آخر يوم) أو None, (بداية, نهاية) أو None)
+    """
+    closed_through, _ = get_watermark()
+
+    rolled = None
+    raw_from = date_from
+    if closed_through is not None and (date_from is None or date_from <= closed_through):
+        rolled_to = min(closed_through, date_to) if date_to else closed_through
+        rolled = (date_from, rolled_to)
+        raw_from = closed_through + timedelta(days=1)
+
+    raw = None
+    if date_to is None or raw_from is None or raw_from <= date_to:
+        raw = (
+            day_bounds(raw_from)[0] if raw_from else None,
+            day_bounds(date_to)[1] if date_to else None,
+        )
+    return rolled, raw
+
+
+def _date_filter(field, date_range):
+    first, last = date_range
+    filters = {}
+    if first:
+        filters[f'{field}__gte'] = first
+    if last:
+        filters[f'{field}__lte'] = last
+    return filters
+
+
+def _time_filter(field, time_range):
+    start, end = time_range
+    filters = {}
+    if start:
+        filters[f'{field}__gte'] = start
+    if end:
+        filters[f'{field}__lt'] = end
+    return filters
+
+
+def _empty_visit_partial():
+    partial = {'page_views': 0, 'bounces': 0, 'total_duration': 0, 'pages': Counter()}
+    partial.update({dimension: Counter() for dimension in BREAKDOWN_DIMENSIONS})
+    return partial
+
+
+def _rolled_visit_partial(partial, date_range):
+    filters = _date_filter('date', date_range)
+    totals = DailyVisitorStats.objects.filter(**filters).aggregate(
+        page_views=Sum('page_views'), bounces=Sum('bounces'), total_duration=Sum('total_duration')
+    )
+    for key in ('page_views', 'bounces', 'total_duration'):
+        partial[key] += totals[key] or 0
+
+    pages = (DailyPageStats.objects.filter(**filters).order_by()
+             .values_list('page_url', 'page_title').annotate(views=Sum('views')))
+    for page_url, page_title, views in pages:
+        partial['pages'][(page_url, page_title)] += views
+
+    breakdowns = (DailyVisitorBreakdown.objects.filter(**filters).order_by()
+                  .values_list('dimension', 'value').annotate(visits=Sum('visits')))
+    for dimension, value, visits in breakdowns:
+        partial[dimension][value] += visits
+
+
+def _raw_visit_partial(partial, queryset):
+    totals = queryset.order_by().aggregate(
+        page_views=Count('id'),
+        bounces=Count('id', filter=Q(is_bounce=True)),
+        total_duration=Sum('visit_duration'),
+    )
+    if not totals['page_views']:
+        return
+    for key in ('page_views', 'bounces', 'total_duration'):
+        partial[key] += totals[key] or 0
+
+    groups = grouped_counts(queryset, RAW_VISIT_GROUPS)
+    for key, count in groups['pages']:
+        partial['pages'][key] += count
+    for dimension in BREAKDOWN_DIMENSIONS:
+        for (value,), count in groups[dimension]:
+            partial[dimension][value] += count
+
+
+def unique_count_mode(value: Optional[str] = None) -> str:
+    """exact أو approx من معامل الطلب، وإلا من ANALYTICS_UNIQUE_COUNT في الإعدادات"""
+    if value in UNIQUE_COUNT_MODES:
+        return value
+    return getattr(settings, 'ANALYTICS_UNIQUE_COUNT', 'approx')
+
+
+def _approx_unique_count(distinct_field, rolled, raw) -> Optional[int]:
+    """
+    دمج رسوم الأيام المغلقة مع رسم للجزء المفتوح من السجلات الخام
+    يعيد None إذا كان هناك يوم مجمّع بدون رسم (تم تجميعه قبل إضافة الرسوم)
+    """
+    sketch_field = SKETCH_FIELDS[distinct_field]
+    sketches = []
+    if rolled:
+        sketches = list(
+            DailyVisitorStats.objects.filter(**_date_filter('date', rolled)).values_list(sketch_field, flat=True)
+        )
+        if not all(sketches):
+            return None
+    sketch = HyperLogLog.merged(sketches)
+    if raw:
+        sketch.merge(_build_sketch(VisitorTracking.objects.filter(**_time_filter('visited_at', raw)), distinct_field))
+    return sketch.count()
+
+
+def _exact_unique_count(distinct_field, date_from, date_to) -> int:
+    full_range = (
+        day_bounds(date_from)[0] if date_from else None,
+        day_bounds(date_to)[1] if date_to else None,
+    )
+    return VisitorTracking.objects.filter(**_time_filter('visited_at', full_range)).order_by().aggregate(
+        total=Count(distinct_field, distinct=True)
+    )['total']
+
+
+def visit_rollup_analytics(date_from: Optional[date], date_to: Optional[date],
+                           distinct_field: str = 'session_key', unique: Optional[str] = None) -> Dict[str, Any]:
+    """
+    تحليلات الزوار لنطاق أيام (شامل) بنفس شكل visit_analytics:
+    الأيام المغلقة من جداول التجميع، وما بعد العلامة المائية من السجلات الخام
+    الزوار الفريدون: approx بدمج رسوم HyperLogLog اليومية، أو exact بـ COUNT DISTINCT على السجلات الخام
+    """
+    rolled, raw = _split_range(date_from, date_to)
+    partial = _empty_visit_partial()
+    if rolled:
+        _rolled_visit_partial(partial, rolled)
+    if raw:
+        _raw_visit_partial(partial, VisitorTracking.objects.filter(**_time_filter('visited_at', raw)))
+
+    total_visitors = 0
+    if partial['page_views']:
+        total_visitors = None
+        if unique_count_mode(unique) == 'approx':
+            total_visitors = _approx_unique_count(distinct_field, rolled, raw)
+        if total_visitors is None:
+            total_visitors = _exact_unique_count(distinct_field, date_from, date_to)
+
+    page_views = partial['page_views']
+    return {
+        'total_visitors': total_visitors,
+        'total_page_views': page_views,
+        'bounce_rate': round(partial['bounces'] / page_views * 100, 2) if page_views else 0,
+        'avg_session_duration': round(partial['total_duration'] / page_views, 2) if page_views else 0,
+        'top_pages': [
+            {'page_url': page_url, 'page_title': page_title, 'views': views}
+            for (page_url, page_title), views in partial['pages'].most_common(TOP_N)
+        ],
+        'top_referrers': [
+            {'referrer': referrer, 'visits': visits}
+            for referrer, visits in partial['referrer'].most_common()
+            if referrer
+        ][:TOP_N],
+        'device_breakdown': dict(partial['device_type'].most_common()),
+        'browser_breakdown': dict(partial['browser'].most_common()),
+        'country_breakdown': dict(partial['country'].most_common()),
+    }
+
+
+def submission_rollup_stats(date_from: Optional[date], date_to: Optional[date]) -> Dict[str, Any]:
+    """عدد الإرسالات حسب النموذج والحالة لنطاق أيام (شامل)"""
+    rolled, raw = _split_range(date_from, date_to)
+    rows = []
+    if rolled:
+        rows += list(
+            DailySubmissionStats.objects.filter(**_date_filter('date', rolled)).order_by()
+            .values_list('form__name', 'status').annotate(count=Sum('submissions'))
+        )
+    if raw:
+        rows += list(
+            FormSubmission.objects.filter(**_time_filter('submitted_at', raw)).order_by()
+            .values_list('form__name', 'status').annotate(count=Count('id'))
+        )
+
+    by_form, by_status = Counter(), Counter()
+    for form_name, submission_status, count in rows:
+        by_form[form_name] += count
+        by_status[submission_status] += count
+
+    return {
+        'total_submissions': sum(by_status.values()),
+        'submissions_by_form': dict(by_form.most_common()),
+        'submissions_by_status': dict(by_status.most_common()),
+    }
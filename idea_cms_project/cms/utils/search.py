@@ -0,0 +1,383 @@
+"""
+Full-text Search
+فهرس بحث نصي موحد للمشاريع والمهام والمقالات والصفحات:
+SQLite FTS5 (ترتيب BM25) في التطوير و PostgreSQL tsvector + GIN في الإنتاج خلف واجهة واحدة
+"""
+
+import operator
+import re
+import threading
+import unicodedata
+from functools import reduce
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import (
+    BooleanField, Case, ExpressionWrapper, FloatField, OuterRef, Q, Subquery, Value, When
+)
+from django.db.models.expressions import RawSQL
+from django.urls import NoReverseMatch
+from django.utils.html import strip_tags
+from django.utils.module_loading import import_string
+
+from ..models import BlogPost, Page, Project, SearchDocument, Task
+
+FTS_TABLE = 'cms_searchdocument_fts'
+
+# أوزان الحقول: تطابق العنوان أهم من تطابق النص
+TITLE_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+
+MAX_INDEXED_BODY = 100000
+DESCRIPTION_LENGTH = 100
+
+# ---------------------------------------------------------------------------
+# التطبيع
+# ---------------------------------------------------------------------------
+
+# التشكيل وعلامات القرآن والتطويل
+_ARABIC_MARKS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+
+_ARABIC_LETTERS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا', 'ٲ': 'ا', 'ٳ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي', 'ئ': 'ي', 'ی': 'ي',
+    'ؤ': 'و',
+    'ک': 'ك',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+
+# أداة التعريف وحروف الجر الملتصقة بها (وال، بال، كال، فال، لل) إذا بقي بعدها 3 أحرف على الأقل
+_ARABIC_ARTICLE = re.compile(r'(?<!\w)(?:[وف]?[بكل]?ال|[وف]?لل)(?=\w{3})')
+
+_TOKEN = re.compile(r'\w+')
+
+
+def normalize_text(text: str) -> str:
+    """
+    تطبيع النص للفهرسة والبحث بنفس الطريقة:
+    أشكال العرض (NFKC)، إزالة التشكيل والتطويل، توحيد الهمزات والألف، التاء المربوطة والألف المقصورة،
+    الأرقام، وحذف أداة التعريف ("التسويق" و"تسويق" نفس الكلمة)
+    """
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', text)
+    text = _ARABIC_MARKS.sub('', text)
+    text = text.translate(_ARABIC_LETTERS).lower()
+    return _ARABIC_ARTICLE.sub('', text)
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(normalize_text(text))
+
+
+# ---------------------------------------------------------------------------
+# مصادر المستندات
+# ---------------------------------------------------------------------------
+
+class SearchSource(NamedTuple):
+    """نوع مستند قابل للبحث: النموذج ودالة تحويل الكائن إلى حقول SearchDocument"""
+    doc_type: str
+    model: type
+    build: Callable
+    select_related: Tuple[str, ...] = ()
+
+
+def _excerpt(text: str) -> str:
+    return text[:DESCRIPTION_LENGTH] + '...' if len(text) > DESCRIPTION_LENGTH else text
+
+
+def _absolute_url(obj, fallback: str) -> str:
+    try:
+        return obj.get_absolute_url()
+    except NoReverseMatch:
+        return fallback
+
+
+def _build_project(project: Project) -> Dict:
+    return {
+        'title': project.title,
+        'body': project.description,
+        'description': _excerpt(project.description),
+        'url': f'/projects/{project.id}/',
+        'owner_id': project.client_id,
+        'is_public': False,
+    }
+
+
+def _build_task(task: Task) -> Dict:
+    return {
+        'title': task.title,
+        'body': task.description,
+        'description': _excerpt(task.description),
+        'url': f'/tasks/{task.id}/',
+        'owner_id': task.project.client_id,
+        'is_public': False,
+    }
+
+
+def _build_content(obj, fallback_url: str) -> Dict:
+    body = strip_tags(f'{obj.excerpt}\n{obj.content}')
+    return {
+        'title': obj.title,
+        'body': body,
+        'description': _excerpt(obj.excerpt or strip_tags(obj.content)),
+        'url': _absolute_url(obj, fallback_url),
+        'owner_id': None,
+        'is_public': obj.status == 'published',
+    }
+
+
+SEARCH_SOURCES: Dict[str, SearchSource] = {
+    'project': SearchSource('project', Project, _build_project),
+    'task': SearchSource('task', Task, _build_task, ('project',)),
+    'blogpost': SearchSource('blogpost', BlogPost, lambda post: _build_content(post, f'/blog/{post.slug}/')),
+    'page': SearchSource('page', Page, lambda page: _build_content(page, f'/{page.slug}/')),
+}
+
+SOURCES_BY_MODEL = {source.model: source for source in SEARCH_SOURCES.values()}
+
+
+def build_document(source: SearchSource, obj) -> SearchDocument:
+    fields = source.build(obj)
+    return SearchDocument(
+        doc_type=source.doc_type,
+        object_id=obj.pk,
+        title=fields['title'][:255],
+        description=fields['description'],
+        url=fields['url'],
+        owner_id=fields['owner_id'],
+        is_public=fields['is_public'],
+        indexed_title=normalize_text(fields['title']),
+        indexed_body=normalize_text(fields['body'][:MAX_INDEXED_BODY]),
+    )
+
+
+def index_object(obj) -> None:
+    """إضافة أو تحديث مستند كائن واحد (تحدّث قاعدة البيانات الفهرس النصي تلقائياً)"""
+    source = SOURCES_BY_MODEL.get(type(obj))
+    if source is None:
+        return
+    document = build_document(source, obj)
+    SearchDocument.objects.update_or_create(
+        doc_type=document.doc_type,
+        object_id=document.object_id,
+        defaults={
+            field: getattr(document, field)
+            for field in ('title', 'description', 'url', 'owner_id', 'is_public', 'indexed_title', 'indexed_body')
+        },
+    )
+
+
+def remove_object(obj) -> None:
+    source = SOURCES_BY_MODEL.get(type(obj))
+    if source is not None:
+        SearchDocument.objects.filter(doc_type=source.doc_type, object_id=obj.pk).delete()
+
+
+def rebuild_index(doc_types: Optional[Iterable[str]] = None, batch_size: int = 1000) -> Dict[str, int]:
+    """إعادة بناء مستندات الأنواع المحددة بالكامل، وتعيد عدد المستندات لكل نوع"""
+    counts = {}
+    for doc_type in doc_types or SEARCH_SOURCES:
+        source = SEARCH_SOURCES[doc_type]
+        SearchDocument.objects.filter(doc_type=doc_type).delete()
+
+        queryset = source.model.objects.select_related(*source.select_related).order_by('pk')
+        batch, total = [], 0
+        for obj in queryset.iterator(chunk_size=batch_size):
+            batch.append(build_document(source, obj))
+            if len(batch) >= batch_size:
+                SearchDocument.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        SearchDocument.objects.bulk_create(batch)
+        counts[doc_type] = total + len(batch)
+    return counts
+
+
+# ---------------------------------------------------------------------------
+# محركات البحث
+# ---------------------------------------------------------------------------
+
+class SearchHit(NamedTuple):
+    document: SearchDocument
+    score: float
+
+
+class SearchBackend:
+    """
+    الواجهة المشتركة: search يعيد المستندات المطابقة من queryset مرتبة حسب الصلة، و relevance يقيّد
+    queryset نموذج بالكائنات المطابقة مع صلتها (يبنيهما التطبيق الافتراضي من match و score على SearchDocument)
+    التطبيق الافتراضي (لقواعد بيانات بدون فهرس نصي) يطابق كل الكلمات بـ LIKE على النص المطبّع،
+    والصلة وزن العنوان أو النص لكل كلمة موجودة فيه
+    """
+
+    def match(self, tokens: Sequence[str]) -> Q:
+        condition = Q()
+        for token in tokens:
+            condition &= Q(indexed_title__contains=token) | Q(indexed_body__contains=token)
+        return condition
+
+    def score(self, tokens: Sequence[str]):
+        terms = []
+        for token in tokens:
+            terms += [
+                Case(When(indexed_title__contains=token, then=Value(TITLE_WEIGHT)), default=Value(0.0)),
+                Case(When(indexed_body__contains=token, then=Value(BODY_WEIGHT)), default=Value(0.0)),
+            ]
+        return ExpressionWrapper(reduce(operator.add, terms), output_field=FloatField())
+
+    def relevance(self, queryset, doc_type: str, tokens: Sequence[str]):
+        """
+        queryset النموذج مقيداً بالكائنات المطابقة ومعه search_relevance، دون حد فيقسمه الـ paginator
+        الصلة استعلام مرتبط يقرأ مستند كل كائن بالفهرس الفريد (doc_type, object_id)
+        """
+        documents = SearchDocument.objects.using(queryset.db).filter(doc_type=doc_type)
+        score = documents.filter(object_id=OuterRef('pk')).annotate(
+            search_score=self.score(tokens)
+        ).values('search_score')[:1]
+        return queryset.filter(
+            pk__in=documents.filter(self.match(tokens)).values('object_id')
+        ).annotate(search_relevance=Subquery(score, output_field=FloatField()))
+
+    def search(self, queryset, query: str, limit: int = 20) -> List[SearchHit]:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        documents = queryset.filter(self.match(tokens)).annotate(
+            search_score=self.score(tokens)
+        ).order_by('-search_score', 'pk')[:limit]
+        return [SearchHit(document, document.search_score) for document in documents]
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """SQLite FTS5: جدول محتوى خارجي على cms_searchdocument تحدّثه triggers، والترتيب بدالة bm25"""
+
+    @staticmethod
+    def match_expression(tokens: Sequence[str]) -> str:
+        # كل الكلمات مطلوبة، والكلمة الأخيرة كبادئة لأن المستخدم قد لا يكملها
+        terms = [f'"{token}"' for token in tokens[:-1]] + [f'"{tokens[-1]}"*']
+        return ' '.join(terms)
+
+    def relevance(self, queryset, doc_type: str, tokens: Sequence[str]):
+        # bm25 لا يعمل إلا في استعلام MATCH نفسه، والاستعلام المرتبط لكل صف يعيد MATCH لكل نتيجة،
+        # فيُربط جدول الفهرس في استعلام النموذج ويجري MATCH مرة واحدة؛ +rowid يمنع تمرير الربط إلى FTS5
+        # كقيد rowid (وإلا يجري MATCH لكل صف، كما في search)
+        quote = connections[queryset.db].ops.quote_name
+        model_pk = f'{quote(queryset.model._meta.db_table)}.{quote(queryset.model._meta.pk.column)}'
+        documents = quote(SearchDocument._meta.db_table)
+        return queryset.extra(
+            select={'search_relevance': f'-bm25({FTS_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT})'},
+            tables=[FTS_TABLE, SearchDocument._meta.db_table],
+            where=[
+                f'{FTS_TABLE} MATCH %s',
+                f'+{FTS_TABLE}.rowid = {documents}.id',
+                f'{documents}.doc_type = %s',
+                f'{documents}.object_id = {model_pk}',
+            ],
+            params=[self.match_expression(tokens), doc_type],
+        )
+
+    def search(self, queryset, query: str, limit: int = 20) -> List[SearchHit]:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        scope_sql, scope_params = queryset.order_by().values('id').query.sql_with_params()
+        sql = (
+            f'SELECT rowid, -bm25({FTS_TABLE}, %s, %s) AS score FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND +rowid IN ({scope_sql}) '
+            f'ORDER BY score DESC LIMIT %s'
+        )
+        params = [TITLE_WEIGHT, BODY_WEIGHT, self.match_expression(tokens), *scope_params, limit]
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            ranked = cursor.fetchall()
+
+        documents = SearchDocument.objects.using(queryset.db).in_bulk([row[0] for row in ranked])
+        return [SearchHit(documents[doc_id], score) for doc_id, score in ranked if doc_id in documents]
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    PostgreSQL: عمود search_vector مولّد (العنوان بوزن A والنص بوزن B) مع فهرس GIN
+    لا يوجد BM25 في PostgreSQL، الترتيب بـ ts_rank_cd مع تطبيع طول المستند (32) كأقرب بديل
+    """
+
+    @staticmethod
+    def tsquery(tokens: Sequence[str]) -> str:
+        return ' & '.join([*tokens[:-1], f'{tokens[-1]}:*'])
+
+    def match(self, tokens: Sequence[str]) -> Q:
+        return Q(RawSQL("search_vector @@ to_tsquery('simple', %s)", [self.tsquery(tokens)],
+                        output_field=BooleanField()))
+
+    def score(self, tokens: Sequence[str]):
+        return RawSQL("ts_rank_cd(search_vector, to_tsquery('simple', %s), 32)", [self.tsquery(tokens)],
+                      output_field=FloatField())
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+_backends: Dict[str, SearchBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_search_backend(using: Optional[str] = None) -> SearchBackend:
+    """المحرك حسب SEARCH_BACKEND في الإعدادات، أو حسب نوع قاعدة البيانات إذا كان فارغاً"""
+    using = using or router.db_for_read(SearchDocument)
+    if using not in _backends:
+        with _backends_lock:
+            if using not in _backends:
+                backend_path = getattr(settings, 'SEARCH_BACKEND', '')
+                if backend_path:
+                    backend_class = import_string(backend_path)
+                else:
+                    backend_class = VENDOR_BACKENDS.get(connections[using].vendor, SearchBackend)
+                _backends[using] = backend_class()
+    return _backends[using]
+
+
+def visible_documents(user, doc_types: Optional[Iterable[str]] = None):
+    """
+    المستندات التي يحق للمستخدم رؤيتها:
+    العميل يرى مشاريعه ومهامها فقط، وغير الإداريين يرون المقالات والصفحات المنشورة فقط
+    """
+    queryset = SearchDocument.objects.all()
+    if doc_types is not None:
+        queryset = queryset.filter(doc_type__in=list(doc_types))
+
+    if user.is_staff:
+        return queryset
+
+    private = Q(doc_type__in=['project', 'task'])
+    if hasattr(user, 'profile') and user.profile.user_type == 'client':
+        private &= Q(owner_id=user.id)
+    return queryset.filter(private | Q(is_public=True))
+
+
+def search_documents(user, query: str, doc_types: Optional[Iterable[str]] = None,
+                     limit: int = 20) -> List[SearchHit]:
+    """البحث في الفهرس مع تطبيق صلاحيات المستخدم"""
+    queryset = visible_documents(user, doc_types)
+    return get_search_backend(queryset.db).search(queryset, query, limit=limit)
+
+
+def filter_by_relevance(queryset, doc_type: str, query: str):
+    """
+    تقييد queryset النموذج بالكائنات المطابقة في الفهرس وترتيبها حسب الصلة (search_relevance)
+    بدون حد لعدد النتائج: فلاتر queryset (التصنيف، الوسم، الحالة) والتقسيم إلى صفحات وعدد النتائج
+    تشمل كل المطابقات
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset.none()
+
+    return get_search_backend(queryset.db).relevance(queryset, doc_type, tokens).order_by(
+        '-search_relevance', '-pk'
+    )
@@ -0,0 +1,26 @@
+"""
+Shared Cache
+نسخ الوسوم وإبطال الاستجابات وتقارير المنصات ونسخة فهرس الاقتراحات تعتمد على ذاكرة مؤقتة تراها كل العمليات:
+مع ذاكرة داخل العملية (LocMemCache) يصل الإبطال إلى عملية gunicorn التي عالجت التعديل فقط،
+وتخدم باقي العمليات بيانات قديمة حتى انتهاء صلاحيتها
+
+REDIS_URL في الإعدادات يجعل CACHES['default'] مشتركة. بدونها تُعطّل هذه الذاكرات إلا إذا كان
+ALLOW_PROCESS_LOCAL_CACHE مفعلاً (عملية واحدة، مثل runserver).
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def is_shared_cache(alias: str = 'default') -> bool:
+    """هل الذاكرة المؤقتة مشتركة بين العمليات (Redis أو Memcached أو قاعدة البيانات أو الملفات)"""
+    return not isinstance(caches[alias], PROCESS_LOCAL_BACKENDS)
+
+
+def cross_process_cache_usable(alias: str = 'default') -> bool:
+    """يمكن الاعتماد على الذاكرة للإبطال: مشتركة، أو سُمح صراحة بالذاكرة الداخلية لعملية واحدة"""
+    return is_shared_cache(alias) or getattr(settings, 'ALLOW_PROCESS_LOCAL_CACHE', False)
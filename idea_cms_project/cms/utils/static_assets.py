@@ -0,0 +1,300 @@
+"""
+Static Assets
+خط بناء الملفات الثابتة: اسم ببصمة المحتوى لكل ملف (app.3f2a9c1b7d4e.css)، ونسخ مضغوطة مسبقاً
+(.gz / .br / .zst) بجانبه تُنشأ بالتوازي في عدة عمليات، وملف manifest يربط الأسماء الأصلية بالمخرجات
+
+يُبنى بالأمر build_static_assets بعد collectstatic، ويستخدم StaticAssetsMiddleware الـ manifest لإرسال
+النسخة المضغوطة المناسبة لـ Accept-Encoding دون أي ضغط أثناء الطلب، و FingerprintedStaticFilesStorage
+لإعطاء القوالب روابط الأسماء ذات البصمة.
+"""
+
+import json
+import mimetypes
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import StaticFilesStorage
+
+from .compression import available_codecs, compress
+from .etags import content_digest
+
+DEFAULT_STATIC_ASSETS_SETTINGS = {
+    'ENABLED': True,
+    'MANIFEST': 'static-manifest.json',  # داخل STATIC_ROOT
+    'HASH_LENGTH': 12,
+    'MIN_SIZE': 512,       # لا تُنشأ نسخ مضغوطة للملفات الأصغر
+    'MIN_SAVING': 0.05,    # تُحذف النسخة المضغوطة إذا لم توفر 5% على الأقل
+    'WORKERS': None,       # None = عدد المعالجات
+    # البناء مرة واحدة، فتُستخدم أعلى المستويات
+    'LEVELS': {'br': 11, 'zstd': 19, 'gzip': 9},
+    'EXTENSIONS': ['css', 'js', 'mjs', 'map', 'json', 'svg', 'html', 'txt', 'xml', 'ttf', 'eot', 'otf'],
+    'MANIFEST_CHECK_INTERVAL': 2,  # ثوانٍ بين فحوص تغيّر الـ manifest أثناء التشغيل
+}
+
+# امتداد النسخة المضغوطة لكل ترميز (نفس أسماء gzip_static و brotli_static في nginx)
+ENCODING_SUFFIXES = {'gzip': '.gz', 'br': '.br', 'zstd': '.zst'}
+
+MANIFEST_VERSION = 1
+
+
+def get_static_assets_settings() -> Dict[str, Any]:
+    """دمج إعدادات STATIC_ASSETS مع القيم الافتراضية"""
+    config = dict(DEFAULT_STATIC_ASSETS_SETTINGS)
+    config.update(getattr(settings, 'STATIC_ASSETS', {}))
+    return config
+
+
+def manifest_path() -> Optional[str]:
+    if not settings.STATIC_ROOT:
+        return None
+    return os.path.join(settings.STATIC_ROOT, get_static_assets_settings()['MANIFEST'])
+
+
+def hashed_name(name: str, digest: str, length: int) -> str:
+    """css/app.css -> css/app.3f2a9c1b7d4e.css"""
+    root, ext = os.path.splitext(name)
+    return f'{root}.{digest[:length]}{ext}'
+
+
+# ---------------------------------------------------------------------------
+# البناء
+# ---------------------------------------------------------------------------
+
+class AssetTask(NamedTuple):
+    root: str
+    name: str
+    hash_length: int
+    compress: bool
+    levels: Dict[str, int]   # الترميزات المثبتة فقط
+    min_size: int
+    min_saving: float
+
+
+def process_asset(task: AssetTask) -> Tuple[str, Dict[str, Any], bool]:
+    """
+    عامل في عملية منفصلة: بصمة الملف، ونسخته بالاسم الجديد، ونسخه المضغوطة
+    يعيد (الاسم الأصلي، مدخل الـ manifest، هل كُتب شيء جديد). الملفات الموجودة بنفس البصمة لا يُعاد ضغطها.
+    """
+    source = os.path.join(task.root, task.name)
+    with open(source, 'rb') as f:
+        data = f.read()
+    digest = content_digest(data)
+    hashed = hashed_name(task.name, digest, task.hash_length)
+    target = os.path.join(task.root, hashed)
+    changed = False
+
+    if not os.path.exists(target):
+        _write_atomic(target, data)
+        changed = True
+
+    encodings = {}
+    if task.compress and len(data) >= task.min_size:
+        for codec, level in task.levels.items():
+            sibling = target + ENCODING_SUFFIXES[codec]
+            if os.path.exists(sibling):
+                size = os.path.getsize(sibling)
+            else:
+                compressed = compress(data, codec, level)
+                if len(compressed) > len(data) * (1 - task.min_saving):
+                    continue
+                _write_atomic(sibling, compressed)
+                size = len(compressed)
+                changed = True
+            encodings[codec] = size
+
+    return task.name, {'hashed': hashed, 'digest': digest, 'size': len(data), 'encodings': encodings}, changed
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _generated_files(manifest: Dict[str, Any]) -> set:
+    """المخرجات السابقة (الأسماء ذات البصمة ونسخها المضغوطة) حتى لا تُعالج كملفات مصدر"""
+    generated = set()
+    for entry in manifest.get('paths', {}).values():
+        generated.add(entry['hashed'])
+        for codec in entry.get('encodings', {}):
+            generated.add(entry['hashed'] + ENCODING_SUFFIXES[codec])
+    return generated
+
+
+def collect_sources(root: str, previous: Dict[str, Any]) -> List[str]:
+    config = get_static_assets_settings()
+    generated = _generated_files(previous)
+    hashed_pattern = re.compile(rf'\.[0-9a-f]{{{config["HASH_LENGTH"]}}}\.[^./]+$')
+    suffixes = tuple(ENCODING_SUFFIXES.values())
+    names = []
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            name = os.path.relpath(os.path.join(directory, filename), root).replace(os.sep, '/')
+            if name == config['MANIFEST'] or name in generated or name.endswith('.tmp'):
+                continue
+            # مخرجات بناء سابق لم تعد في الـ manifest (ملف تغيّر محتواه)
+            base, ext = os.path.splitext(name)
+            if hashed_pattern.search(base if ext in suffixes else name):
+                continue
+            names.append(name)
+    return sorted(names)
+
+
+def read_manifest(path: Optional[str] = None) -> Dict[str, Any]:
+    path = path or manifest_path()
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError, TypeError):
+        return {}
+    return manifest if manifest.get('version') == MANIFEST_VERSION else {}
+
+
+def build_static_assets(root: Optional[str] = None, workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    بناء الأسماء ذات البصمة والنسخ المضغوطة لكل ملفات root (افتراضياً STATIC_ROOT) وكتابة الـ manifest
+    يعيد إحصاءات البناء
+    """
+    config = get_static_assets_settings()
+    root = str(root or settings.STATIC_ROOT)
+    path = os.path.join(root, config['MANIFEST'])
+    previous = read_manifest(path)
+    extensions = {f'.{ext.lower()}' for ext in config['EXTENSIONS']}
+    codecs = available_codecs()
+    levels = {codec: config['LEVELS'][codec] for codec in codecs}
+
+    tasks = [
+        AssetTask(root, name, config['HASH_LENGTH'], os.path.splitext(name)[1].lower() in extensions,
+                  levels, config['MIN_SIZE'], config['MIN_SAVING'])
+        for name in collect_sources(root, previous)
+    ]
+
+    paths, changed = {}, 0
+    workers = workers or config['WORKERS'] or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(process_asset, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        results = [process_asset(task) for task in tasks]
+    for name, entry, written in results:
+        paths[name] = entry
+        changed += written
+
+    manifest = {'version': MANIFEST_VERSION, 'paths': paths}
+    _write_atomic(path, json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True).encode('utf-8'))
+
+    return {
+        'files': len(paths),
+        'changed': changed,
+        'codecs': codecs,
+        'bytes': sum(entry['size'] for entry in paths.values()),
+        'compressed': {
+            codec: sum(entry['encodings'][codec] for entry in paths.values() if codec in entry['encodings'])
+            for codec in codecs
+        },
+    }
+
+
+# ---------------------------------------------------------------------------
+# القراءة أثناء التشغيل
+# ---------------------------------------------------------------------------
+
+class StaticAsset(NamedTuple):
+    path: str                  # المسار على القرص للملف ذي البصمة
+    content_type: str
+    digest: str
+    size: int
+    last_modified: float
+    encodings: Dict[str, int]  # الترميز -> حجم النسخة المضغوطة
+    immutable: bool            # الطلب باسم البصمة: المحتوى لن يتغير أبداً
+
+    def encoded_path(self, codec: Optional[str]) -> str:
+        return self.path + ENCODING_SUFFIXES[codec] if codec else self.path
+
+
+class StaticManifest:
+    """الـ manifest في الذاكرة، يُعاد تحميله عند تغير الملف (بعد build_static_assets)"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._assets: Dict[str, StaticAsset] = {}
+        self._urls: Dict[str, str] = {}
+        self._mtime = None
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < get_static_assets_settings()['MANIFEST_CHECK_INTERVAL']:
+            return
+        with self._lock:
+            self._checked = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns if self.path else None
+            except OSError:
+                mtime = None
+            if mtime == self._mtime:
+                return
+            self._mtime = mtime
+            self._load(read_manifest(self.path) if mtime is not None else {})
+
+    def _load(self, manifest: Dict[str, Any]) -> None:
+        root = os.path.dirname(self.path or '')
+        assets, urls = {}, {}
+        for name, entry in manifest.get('paths', {}).items():
+            path = os.path.join(root, entry['hashed'])
+            try:
+                last_modified = os.stat(path).st_mtime
+            except OSError:
+                continue
+            content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+                content_type += '; charset=utf-8'
+            for key, immutable in ((name, False), (entry['hashed'], True)):
+                assets[key] = StaticAsset(path, content_type, entry['digest'], entry['size'], last_modified,
+                                          entry.get('encodings', {}), immutable)
+            urls[name] = entry['hashed']
+        self._assets, self._urls = assets, urls
+
+    def get(self, name: str) -> Optional[StaticAsset]:
+        self._refresh()
+        return self._assets.get(name)
+
+    def hashed_name(self, name: str) -> Optional[str]:
+        self._refresh()
+        return self._urls.get(name)
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._urls)
+
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def get_static_manifest() -> StaticManifest:
+    global _manifest
+    if _manifest is None:
+        with _manifest_lock:
+            if _manifest is None:
+                _manifest = StaticManifest(manifest_path())
+    return _manifest
+
+
+class FingerprintedStaticFilesStorage(StaticFilesStorage):
+    """
+    تخزين الملفات الثابتة (STORAGES['staticfiles']): {% static %} و staticfiles_storage.url تعطي
+    الاسم ذا البصمة من الـ manifest فيُرسل مع immutable، والملفات غير المبنية بأسمائها الأصلية
+    """
+
+    def url(self, name):
+        if name and get_static_assets_settings()['ENABLED']:
+            name = get_static_manifest().hashed_name(name.lstrip('/')) or name
+        return super().url(name)
@@ -0,0 +1,481 @@
+"""
+Search Suggestions
+اقتراحات البحث أثناء الكتابة من فهرس عناوين في ذاكرة العملية (مصفوفات مرتبة + bisect)
+
+كل عنوان يُفهرس بكل لاحقة تبدأ عند بداية كلمة ("حملة التسويق الرقمي" تطابق "حم" و"تسو" و"رق")،
+والمصفوفات مقسمة حسب الصلاحيات مسبقاً فلا يمر البحث على عناوين لا يحق للمستخدم رؤيتها.
+الإشارات تحدّث فهرس العملية مباشرة وتسجل التعديل في سجل مشترك في الذاكرة المؤقتة (عداد نسخ + تعديل لكل نسخة)،
+فتطبّقه باقي العمليات مدخلاً مدخلاً، وإعادة البناء الكاملة تجري في المهام الخلفية لا على خيط الطلب.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ..models import Category, SearchDocument, Tag
+from .jobs import get_job_runner
+from .search import SOURCES_BY_MODEL, normalize_text
+from .shared_cache import cross_process_cache_usable
+
+DEFAULT_SUGGEST_SETTINGS = {
+    'SYNC_INTERVAL': 2,    # ثوانٍ بين مقارنات نسخة الفهرس مع العمليات الأخرى
+    'MAX_WORDS': 12,       # عدد الكلمات الأولى المفهرسة من كل عنوان
+    'MAX_SCAN': 2000,      # حد المرور على المطابقات غير المسموح بها لكل طلب
+    'MAX_DELTAS': 1000,    # أقصى عدد تعديلات متأخرة تُطبق واحداً واحداً، وبعده يُعاد البناء
+    'DELTA_TIMEOUT': 600,  # ثوانٍ يبقى فيها كل تعديل في السجل المشترك
+    'REBUILD_INTERVAL': 300,  # مع ذاكرة مؤقتة داخل العملية: ثوانٍ بين إعادات البناء في الخلفية
+}
+
+CACHE_VERSION_KEY = 'search_suggest:version'
+CACHE_DELTA_KEY = 'search_suggest:delta:{}'
+
+SUGGEST_TYPES = ('project', 'task', 'blogpost', 'tag', 'category')
+
+# العروض المبنية مسبقاً: كل مدخل في ALL، والداخلي = ALL عدا المسودات، والعام = المنشور فقط،
+# ومشاريع ومهام كل عميل في عرض خاص به
+VIEW_ALL = 'all'
+VIEW_INTERNAL = 'internal'
+VIEW_PUBLIC = 'public'
+
+# أداة التعريف في آخر كلمة أثناء الكتابة ("الت" ← "ت"): normalize_text لا يحذفها قبل 3 أحرف
+_PARTIAL_ARTICLE = re.compile(r'(?<!\w)(?:[وف]?[بكل]?ال|[وف]?لل)(?=\w+$)')
+
+
+def get_suggest_settings() -> Dict[str, Any]:
+    """دمج إعدادات SEARCH_SUGGEST مع القيم الافتراضية"""
+    config = dict(DEFAULT_SUGGEST_SETTINGS)
+    config.update(getattr(settings, 'SEARCH_SUGGEST', {}))
+    return config
+
+
+class SuggestEntry(NamedTuple):
+    doc_type: str
+    object_id: int
+    title: str
+    url: str
+    owner_id: Optional[int]
+    is_public: bool
+    keys: Tuple[str, ...]
+
+    def views(self) -> List[Any]:
+        views = [VIEW_ALL]
+        if self.doc_type in ('project', 'task'):
+            views.append(VIEW_INTERNAL)
+            if self.owner_id is not None:
+                views.append(('owner', self.owner_id))
+        elif self.is_public:
+            views += [VIEW_INTERNAL, VIEW_PUBLIC]
+        return views
+
+
+def title_keys(title: str, max_words: int, doc_type: str, object_id: int) -> Tuple[str, ...]:
+    """
+    لواحق العنوان المطبّع التي تبدأ عند كل كلمة (مفاتيح القائمة المرتبة)
+    تنتهي كل لاحقة بمعرّف المدخل بعد \\x00 فتكون المفاتيح فريدة ويصبح الحذف bisect واحداً،
+    و \\x00 أصغر من أي حرف فتسبق الكلمة المطابقة تماماً ما يبدأ بها
+    """
+    words = normalize_text(title).split()[:max_words]
+    suffix = f'\x00{doc_type}:{object_id}'
+    return tuple(' '.join(words[i:]) + suffix for i in range(len(words)))
+
+
+def query_prefixes(query: str) -> List[str]:
+    """صيغ البحث: النص المطبّع، ومعه صيغة بدون أداة التعريف في الكلمة الأخيرة غير المكتملة"""
+    prefix = ' '.join(normalize_text(query).split())
+    if not prefix:
+        return []
+    prefixes = [prefix]
+    stripped = _PARTIAL_ARTICLE.sub('', prefix)
+    if stripped and stripped != prefix:
+        prefixes.append(stripped)
+    return prefixes
+
+
+class _SortedKeys:
+    """
+    قائمة مفاتيح مرتبة مقسمة إلى دلاء صغيرة (مع المدخلات المقابلة لها)
+
+    الإدراج والحذف يحركان دلواً واحداً (بضع مئات من العناصر) بدلاً من مصفوفة بحجم الفهرس كله،
+    والبحث bisect على أكبر مفتاح في كل دلو ثم داخل الدلو.
+    """
+
+    __slots__ = ('_keys', '_entries', '_maxes')
+
+    BUCKET_SIZE = 512
+
+    def __init__(self):
+        self._keys: List[List[str]] = []
+        self._entries: List[List[SuggestEntry]] = []
+        self._maxes: List[str] = []
+
+    def __bool__(self):
+        return bool(self._maxes)
+
+    def bulk_load(self, keys: List[str], entries_by_key: Dict[str, SuggestEntry]) -> None:
+        keys.sort()
+        size = self.BUCKET_SIZE
+        self._keys = [keys[i:i + size] for i in range(0, len(keys), size)]
+        self._entries = [[entries_by_key[key] for key in bucket] for bucket in self._keys]
+        self._maxes = [bucket[-1] for bucket in self._keys]
+
+    def insert(self, key: str, entry: SuggestEntry) -> None:
+        if not self._maxes:
+            self._keys, self._entries, self._maxes = [[key]], [[entry]], [key]
+            return
+
+        bucket = min(bisect_left(self._maxes, key), len(self._maxes) - 1)
+        keys, entries = self._keys[bucket], self._entries[bucket]
+        index = bisect_left(keys, key)
+        keys.insert(index, key)
+        entries.insert(index, entry)
+        self._maxes[bucket] = keys[-1]
+
+        if len(keys) > self.BUCKET_SIZE * 2:
+            half = len(keys) // 2
+            self._keys[bucket:bucket + 1] = [keys[:half], keys[half:]]
+            self._entries[bucket:bucket + 1] = [entries[:half], entries[half:]]
+            self._maxes[bucket:bucket + 1] = [keys[half - 1], keys[-1]]
+
+    def remove(self, key: str) -> None:
+        bucket = bisect_left(self._maxes, key)
+        if bucket == len(self._maxes):
+            return
+        keys = self._keys[bucket]
+        index = bisect_left(keys, key)
+        if index == len(keys) or keys[index] != key:
+            return
+
+        del keys[index]
+        del self._entries[bucket][index]
+        if keys:
+            self._maxes[bucket] = keys[-1]
+        else:
+            del self._keys[bucket], self._entries[bucket], self._maxes[bucket]
+
+    def scan(self, prefix: str):
+        bucket = bisect_left(self._maxes, prefix)
+        index = bisect_left(self._keys[bucket], prefix) if bucket < len(self._maxes) else 0
+        while bucket < len(self._maxes):
+            keys, entries = self._keys[bucket], self._entries[bucket]
+            while index < len(keys):
+                if not keys[index].startswith(prefix):
+                    return
+                yield entries[index]
+                index += 1
+            bucket, index = bucket + 1, 0
+
+
+class SuggestIndex:
+    """فهرس الاقتراحات لعملية واحدة"""
+
+    def __init__(self, max_words: int = DEFAULT_SUGGEST_SETTINGS['MAX_WORDS']):
+        self.max_words = max_words
+        self._views: Dict[Any, _SortedKeys] = {}
+        self._entries: Dict[Tuple[str, int], SuggestEntry] = {}
+        self._lock = threading.Lock()
+        self.version: Optional[int] = None
+        self.missing_version: Optional[int] = None
+        self.checked_at = 0.0
+        self.built_at = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def make_entry(self, doc_type: str, object_id: int, title: str, url: str,
+                   owner_id: Optional[int] = None, is_public: bool = True) -> SuggestEntry:
+        return SuggestEntry(doc_type, object_id, title, url, owner_id, is_public,
+                            title_keys(title, self.max_words, doc_type, object_id))
+
+    def load(self, entries: Iterable[SuggestEntry]) -> None:
+        """بناء كل العروض دفعة واحدة (ترتيب واحد لكل عرض بدلاً من إدراجات متتالية)"""
+        view_keys: Dict[Any, List[str]] = {}
+        entries_by_key: Dict[str, SuggestEntry] = {}
+        by_id = {}
+        for entry in entries:
+            by_id[(entry.doc_type, entry.object_id)] = entry
+            for key in entry.keys:
+                entries_by_key[key] = entry
+            for view in entry.views():
+                view_keys.setdefault(view, []).extend(entry.keys)
+
+        views = {}
+        for view, keys in view_keys.items():
+            views[view] = _SortedKeys()
+            views[view].bulk_load(keys, entries_by_key)
+
+        with self._lock:
+            self._views, self._entries = views, by_id
+
+    def add(self, entry: SuggestEntry) -> None:
+        with self._lock:
+            self._discard((entry.doc_type, entry.object_id))
+            self._entries[(entry.doc_type, entry.object_id)] = entry
+            for view in entry.views():
+                sorted_keys = self._views.setdefault(view, _SortedKeys())
+                for key in entry.keys:
+                    sorted_keys.insert(key, entry)
+
+    def discard(self, doc_type: str, object_id: int) -> None:
+        with self._lock:
+            self._discard((doc_type, object_id))
+
+    def _discard(self, entry_id: Tuple[str, int]) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for view in entry.views():
+            sorted_keys = self._views.get(view)
+            if sorted_keys is None:
+                continue
+            for key in entry.keys:
+                sorted_keys.remove(key)
+            if not sorted_keys and view not in (VIEW_ALL, VIEW_INTERNAL, VIEW_PUBLIC):
+                del self._views[view]
+
+    def get(self, doc_type: str, object_id: int) -> Optional[SuggestEntry]:
+        return self._entries.get((doc_type, object_id))
+
+    def suggest(self, query: str, views: Iterable[Any], doc_types: Optional[Iterable[str]] = None,
+                limit: int = 10, max_scan: int = DEFAULT_SUGGEST_SETTINGS['MAX_SCAN']) -> List[SuggestEntry]:
+        """العناوين التي تبدأ إحدى كلماتها بالنص المكتوب، بترتيب المفاتيح (ترتيب أبجدي)"""
+        doc_types = set(doc_types) if doc_types else None
+        results, seen, scanned = [], set(), 0
+
+        with self._lock:
+            for prefix in query_prefixes(query):
+                for view in views:
+                    sorted_keys = self._views.get(view)
+                    if sorted_keys is None:
+                        continue
+                    for entry in sorted_keys.scan(prefix):
+                        scanned += 1
+                        if scanned > max_scan:
+                            return results
+                        entry_id = (entry.doc_type, entry.object_id)
+                        if entry_id in seen or (doc_types and entry.doc_type not in doc_types):
+                            continue
+                        seen.add(entry_id)
+                        results.append(entry)
+                        if len(results) >= limit:
+                            return results
+        return results
+
+
+# ---------------------------------------------------------------------------
+# مصدر البيانات والمزامنة
+# ---------------------------------------------------------------------------
+
+def suggest_doc_type(obj) -> Optional[str]:
+    if isinstance(obj, Tag):
+        return 'tag'
+    if isinstance(obj, Category):
+        return 'category'
+    source = SOURCES_BY_MODEL.get(type(obj))
+    return source.doc_type if source is not None and source.doc_type in SUGGEST_TYPES else None
+
+
+def _entry_from_object(index: SuggestIndex, obj) -> Optional[SuggestEntry]:
+    if isinstance(obj, Tag):
+        return index.make_entry('tag', obj.pk, obj.name, f'/blog/tag/{obj.slug}/')
+    if isinstance(obj, Category):
+        return index.make_entry('category', obj.pk, obj.name, f'/blog/category/{obj.slug}/')
+
+    source = SOURCES_BY_MODEL.get(type(obj))
+    if source is None or source.doc_type not in SUGGEST_TYPES:
+        return None
+    fields = source.build(obj)
+    return index.make_entry(source.doc_type, obj.pk, fields['title'], fields['url'],
+                            fields['owner_id'], fields['is_public'])
+
+
+def load_entries(index: SuggestIndex) -> List[SuggestEntry]:
+    """كل العناوين من قاعدة البيانات: المشاريع والمهام والمقالات من فهرس البحث، والوسوم والتصنيفات مباشرة"""
+    entries = [
+        index.make_entry(doc_type, object_id, title, url, owner_id, is_public)
+        for doc_type, object_id, title, url, owner_id, is_public in SearchDocument.objects.filter(
+            doc_type__in=[t for t in SUGGEST_TYPES if t not in ('tag', 'category')]
+        ).values_list('doc_type', 'object_id', 'title', 'url', 'owner_id', 'is_public').iterator(chunk_size=5000)
+    ]
+    entries += [index.make_entry('tag', pk, name, f'/blog/tag/{slug}/')
+                for pk, name, slug in Tag.objects.values_list('pk', 'name', 'slug')]
+    entries += [index.make_entry('category', pk, name, f'/blog/category/{slug}/')
+                for pk, name, slug in Category.objects.values_list('pk', 'name', 'slug')]
+    return entries
+
+
+def _shared_version() -> int:
+    return cache.get_or_set(CACHE_VERSION_KEY, 0, None)
+
+
+def _publish(changes: List[Tuple[str, Any]]) -> int:
+    """
+    تسجيل تعديل في السجل المشترك: رقم نسخة جديد من العداد، وتحت مفتاحه التعديل نفسه
+    ('add' مع حقول المدخل، 'remove' مع معرّفه، 'rebuild' لإجبار إعادة البناء)
+    """
+    try:
+        version = cache.incr(CACHE_VERSION_KEY)
+    except ValueError:
+        cache.add(CACHE_VERSION_KEY, 0, None)
+        version = cache.incr(CACHE_VERSION_KEY)
+    cache.set(CACHE_DELTA_KEY.format(version), changes, get_suggest_settings()['DELTA_TIMEOUT'])
+    return version
+
+
+def _mark_applied(index: Optional[SuggestIndex], version: int) -> None:
+    # التعديل طُبّق على فهرس العملية مباشرة؛ إذا سبقته تعديلات لم تُطبق بعد تُطبق كلها بالترتيب عند المزامنة
+    if index is not None and index.version == version - 1:
+        index.version = version
+
+
+def _apply_changes(index: SuggestIndex, changes: List[Tuple[str, Any]]) -> bool:
+    for op, value in changes:
+        if op == 'add':
+            index.add(index.make_entry(*value))
+        elif op == 'remove':
+            index.discard(*value)
+        else:
+            return False
+    return True
+
+
+def _sync(index: SuggestIndex, config: Dict[str, Any]) -> bool:
+    """
+    تطبيق التعديلات المسجلة بعد نسخة الفهرس، مدخلاً مدخلاً في دلوه
+    يعيد False إذا لم يعد السجل كافياً (تأخر كبير أو تعديل انتهت صلاحيته أو مسح الذاكرة) فيلزم إعادة البناء
+    """
+    if index.version is None:
+        return False
+    shared = _shared_version()
+    if shared == index.version:
+        return True
+    if shared < index.version or shared - index.version > config['MAX_DELTAS']:
+        return False
+
+    versions = range(index.version + 1, shared + 1)
+    changes_by_key = cache.get_many([CACHE_DELTA_KEY.format(version) for version in versions])
+    for version in versions:
+        changes = changes_by_key.get(CACHE_DELTA_KEY.format(version))
+        if changes is None:
+            # عملية أخرى زادت العداد ولم تكتب تعديلها بعد؛ إذا بقي مفقوداً في الفحص التالي فقد انتهت صلاحيته
+            if index.missing_version == version:
+                return False
+            index.missing_version = version
+            return True
+        if not _apply_changes(index, changes):
+            return False
+        index.version = version
+    index.missing_version = None
+    return True
+
+
+_suggest_index: Optional[SuggestIndex] = None
+_suggest_index_lock = threading.Lock()
+_rebuild_future = None
+
+
+def rebuild_suggest_index() -> SuggestIndex:
+    """
+    بناء فهرس كامل من قاعدة البيانات واستبدال فهرس العملية به
+    النسخة تُقرأ قبل التحميل، فالتعديلات التي تصل أثناء البناء تُطبق عليه عند المزامنة التالية
+    """
+    global _suggest_index
+
+    config = get_suggest_settings()
+    version = _shared_version()
+    index = SuggestIndex(max_words=config['MAX_WORDS'])
+    index.load(load_entries(index))
+    index.version = version
+    index.built_at = time.monotonic()
+    with _suggest_index_lock:
+        _suggest_index = index
+    return index
+
+
+def _schedule_rebuild() -> None:
+    """إعادة البناء في المهام الخلفية (مرة واحدة في كل وقت)، ويستمر الفهرس الحالي في خدمة الطلبات"""
+    global _rebuild_future
+
+    if _rebuild_future is not None and not _rebuild_future.done():
+        return
+    runner = get_job_runner()
+    if runner is None:
+        rebuild_suggest_index()
+    else:
+        _rebuild_future = runner.submit(rebuild_suggest_index)
+
+
+def get_suggest_index() -> SuggestIndex:
+    """
+    فهرس العملية، مع مزامنة التعديلات كل SYNC_INTERVAL ثانية
+    عند أول طلب يبدأ البناء في الخلفية ويُعاد فهرس فارغ حتى ينتهي. مع ذاكرة مؤقتة داخل العملية
+    لا تصل تعديلات العمليات الأخرى، فيُعاد البناء في الخلفية كل REBUILD_INTERVAL ثانية
+    """
+    global _suggest_index
+
+    config = get_suggest_settings()
+    index = _suggest_index
+    now = time.monotonic()
+    if index is not None and now - index.checked_at < config['SYNC_INTERVAL']:
+        return index
+
+    with _suggest_index_lock:
+        index = _suggest_index
+        if index is None:
+            index = _suggest_index = SuggestIndex(max_words=config['MAX_WORDS'])
+        index.checked_at = now
+        if not _sync(index, config):
+            rebuild = True
+        elif not cross_process_cache_usable():
+            rebuild = now - index.built_at >= config['REBUILD_INTERVAL']
+        else:
+            rebuild = False
+    if rebuild:
+        _schedule_rebuild()
+    return _suggest_index
+
+
+def reset_suggest_index() -> None:
+    """إجبار كل العمليات على إعادة بناء فهارسها"""
+    _publish([('rebuild', None)])
+    _schedule_rebuild()
+
+
+def update_suggestions(objects: Iterable) -> None:
+    """تحديث عناوين كائنات بعد حفظها: فهرس العملية فوراً، وباقي العمليات عبر السجل المشترك"""
+    index = _suggest_index
+    builder = index or SuggestIndex(max_words=get_suggest_settings()['MAX_WORDS'])
+    entries = [entry for entry in (_entry_from_object(builder, obj) for obj in objects) if entry is not None]
+    if not entries:
+        return
+    if index is not None:
+        for entry in entries:
+            index.add(entry)
+    _mark_applied(index, _publish([('add', tuple(entry[:6])) for entry in entries]))
+
+
+def remove_suggestion(doc_type: str, object_id: int) -> None:
+    index = _suggest_index
+    if index is not None:
+        index.discard(doc_type, object_id)
+    _mark_applied(index, _publish([('remove', (doc_type, object_id))]))
+
+
+def user_views(user) -> List[Any]:
+    """العروض المسموحة للمستخدم، بنفس قواعد visible_documents في البحث النصي"""
+    if user.is_staff:
+        return [VIEW_ALL]
+    if hasattr(user, 'profile') and user.profile.user_type == 'client':
+        return [('owner', user.id), VIEW_PUBLIC]
+    return [VIEW_INTERNAL]
+
+
+def suggest(user, query: str, doc_types: Optional[Iterable[str]] = None, limit: int = 10) -> List[SuggestEntry]:
+    return get_suggest_index().suggest(
+        query, user_views(user), doc_types=doc_types, limit=limit,
+        max_scan=get_suggest_settings()['MAX_SCAN'],
+    )
@@ -0,0 +1,108 @@
+"""
+User Agent Classifier
+تصنيف User Agent (نوع الجهاز، المتصفح، نظام التشغيل) بمطابقة واحدة مع ذاكرة LRU
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple
+
+UNKNOWN = 'غير محدد'
+
+# حجم ذاكرة LRU: عدد الـ User Agents المختلفة في الزيارات الحقيقية صغير
+USER_AGENT_CACHE_SIZE = 4096
+
+# نمط واحد مجمّع يمر على النص مرة واحدة ويلتقط كل الرموز المعروفة
+# (يُطبق على النص بعد lower() لأن IGNORECASE أبطأ بأكثر من 10 مرات مع التناوب)
+_TOKEN_PATTERN = re.compile(
+    r'edga?|edgios|opr|opera|samsungbrowser|firefox|fxios|crios|chrome|chromium|safari'
+    r'|ipad|iphone|ipod|android|mobile|tablet|kindle|silk'
+    r'|windows|macintosh|mac os|cros|linux'
+    r'|bot|crawler|spider|scraper'
+)
+
+
+class UserAgentInfo(NamedTuple):
+    """نتيجة تصنيف User Agent (غير قابلة للتعديل لأنها مشتركة عبر الذاكرة المؤقتة)"""
+    device_type: str
+    browser: str
+    operating_system: str
+    is_bot: bool
+
+    def as_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+@lru_cache(maxsize=USER_AGENT_CACHE_SIZE)
+def classify_user_agent(user_agent: str) -> UserAgentInfo:
+    """تصنيف User Agent، النتيجة محفوظة حسب النص الخام"""
+    tokens = set(_TOKEN_PATTERN.findall((user_agent or '').lower()))
+    return UserAgentInfo(
+        device_type=_device_type(tokens),
+        browser=_browser(tokens),
+        operating_system=_operating_system(tokens),
+        is_bot=bool(tokens & {'bot', 'crawler', 'spider', 'scraper'}),
+    )
+
+
+def user_agent_cache_stats() -> Dict[str, int]:
+    """إحصائيات الذاكرة المؤقتة (hits/misses)"""
+    info = classify_user_agent.cache_info()
+    total = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'max_size': info.maxsize,
+        'hit_rate': round(info.hits / total * 100, 2) if total else 0,
+    }
+
+
+def clear_user_agent_cache():
+    """مسح الذاكرة المؤقتة (للاختبارات وقياس الأداء)"""
+    classify_user_agent.cache_clear()
+
+
+def _device_type(tokens):
+    # iPad وأجهزة Android بدون كلمة Mobile تعتبر أجهزة لوحية
+    if tokens & {'ipad', 'tablet', 'kindle', 'silk'}:
+        return 'tablet'
+    if 'android' in tokens and 'mobile' not in tokens:
+        return 'tablet'
+    if tokens & {'mobile', 'iphone', 'ipod', 'android'}:
+        return 'mobile'
+    return 'desktop'
+
+
+def _browser(tokens):
+    # الترتيب مهم: Edge و Opera و Samsung تحتوي أيضاً على Chrome و Safari
+    if tokens & {'edg', 'edga', 'edgios'}:
+        return 'Edge'
+    if tokens & {'opr', 'opera'}:
+        return 'Opera'
+    if 'samsungbrowser' in tokens:
+        return 'Samsung Internet'
+    if tokens & {'firefox', 'fxios'}:
+        return 'Firefox'
+    if tokens & {'chrome', 'chromium', 'crios'}:
+        return 'Chrome'
+    if 'safari' in tokens:
+        return 'Safari'
+    return UNKNOWN
+
+
+def _operating_system(tokens):
+    if 'windows' in tokens:
+        return 'Windows'
+    # iOS يحتوي على "Mac OS X" لذا يجب فحصه قبل macOS
+    if tokens & {'iphone', 'ipad', 'ipod'}:
+        return 'iOS'
+    if 'android' in tokens:
+        return 'Android'
+    if 'cros' in tokens:
+        return 'ChromeOS'
+    if tokens & {'macintosh', 'mac os'}:
+        return 'macOS'
+    if 'linux' in tokens:
+        return 'Linux'
+    return UNKNOWN
@@ -0,0 +1,286 @@
+"""
+Visit Buffer
+مخزن مؤقت لسجلات تتبع الزوار مع كتابة مجمعة (bulk_create)
+"""
+
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections, transaction
+
+from .geoip import resolve_location
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SETTINGS = {
+    'ENABLED': True,
+    'MAX_BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 5.0,
+    'MAX_PENDING': 10000,
+    'OVERFLOW_POLICY': 'drop_oldest',
+}
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'flush')
+
+# أخطاء الاتصال أو القفل: قاعدة البيانات غير متاحة وليست السجلات غير صالحة، فتُعاد إلى المخزن
+DATABASE_UNAVAILABLE = (OperationalError, InterfaceError)
+
+
+class VisitBuffer:
+    """
+    مخزن مؤقت داخل العملية لسجلات VisitorTracking
+
+    تُضاف السجلات من الـ middleware دون أي استعلام، ويقوم خيط خلفي
+    بكتابتها دفعة واحدة عند امتلاء الدفعة أو مرور الفاصل الزمني أو عند
+    إيقاف العملية. عند تجاوز الحد الأقصى تُطبق سياسة الفائض:
+    - drop_oldest: حذف أقدم سجل لإفساح المجال
+    - drop_newest: رفض السجل الجديد
+    - flush: كتابة متزامنة على خيط الطلب (لا يُفقد أي سجل)
+    """
+
+    def __init__(self, max_batch_size: int = 200, flush_interval: float = 5.0,
+                 max_pending: int = 10000, overflow_policy: str = 'drop_oldest'):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max(max_pending, max_batch_size)
+        self.overflow_policy = overflow_policy
+
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+
+        self._counters = {
+            'buffered': 0,
+            'flushed': 0,
+            'dropped': 0,
+            'failed': 0,
+            'requeued': 0,
+            'flushes': 0,
+        }
+
+    def add(self, record: Dict[str, Any]) -> bool:
+        """إضافة سجل زيارة إلى المخزن، تعيد False إذا تم رفضه"""
+        self._ensure_worker()
+
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                if self.overflow_policy == 'drop_newest':
+                    self._counters['dropped'] += 1
+                    self._wakeup.set()
+                    return False
+                if self.overflow_policy == 'drop_oldest':
+                    self._pending.popleft()
+                    self._counters['dropped'] += 1
+
+            self._pending.append(record)
+            self._counters['buffered'] += 1
+            pending = len(self._pending)
+
+        if pending > self.max_pending and self.overflow_policy == 'flush':
+            self.flush()
+        elif pending >= self.max_batch_size:
+            self._wakeup.set()
+
+        return True
+
+    def flush(self) -> int:
+        """كتابة جميع السجلات المعلقة إلى قاعدة البيانات وإرجاع عددها"""
+        from ..models import VisitorTracking
+
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+
+                retry = []
+                try:
+                    # savepoint خاص بالدفعة حتى يبقى الاتصال صالحاً لإعادة المحاولة سجلاً سجلاً
+                    with transaction.atomic():
+                        VisitorTracking.objects.bulk_create(
+                            [VisitorTracking(**self._prepare(record)) for record in batch],
+                            batch_size=self.max_batch_size
+                        )
+                    saved = len(batch)
+                except DATABASE_UNAVAILABLE as e:
+                    logger.error(f"Visitor tracking flush failed ({len(batch)} rows), keeping them for the next flush: {e}")
+                    saved, retry = 0, batch
+                except Exception as e:
+                    logger.error(f"Visitor tracking flush failed ({len(batch)} rows), retrying row by row: {e}")
+                    saved, retry = self._save_rows(batch)
+
+                written += saved
+                requeued = self._requeue(retry)
+                with self._lock:
+                    self._counters['flushed'] += saved
+                    self._counters['failed'] += len(batch) - saved - len(retry)
+                    self._counters['requeued'] += requeued
+                    self._counters['flushes'] += 1
+
+                if retry:
+                    # قاعدة البيانات غير متاحة: الدفعة عادت إلى بداية المخزن للمحاولة القادمة
+                    break
+
+        return written
+
+    def stats(self) -> Dict[str, Any]:
+        """عدادات المخزن الحالية"""
+        with self._lock:
+            data = dict(self._counters)
+            data['pending'] = len(self._pending)
+        data.update({
+            'max_batch_size': self.max_batch_size,
+            'flush_interval': self.flush_interval,
+            'max_pending': self.max_pending,
+            'overflow_policy': self.overflow_policy,
+            'worker_alive': bool(self._thread and self._thread.is_alive()),
+        })
+        return data
+
+    def stop(self, flush: bool = True):
+        """إيقاف الخيط الخلفي مع كتابة ما تبقى"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + 1)
+        if flush:
+            self.flush()
+            close_old_connections()
+
+    @staticmethod
+    def _save_rows(batch: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        كتابة السجلات واحداً واحداً بعد فشل الدفعة، فلا يُحذف إلا السجل غير الصالح
+        يعيد (عدد المكتوب، السجلات الباقية إذا أصبحت قاعدة البيانات غير متاحة أثناء الكتابة)
+        """
+        from ..models import VisitorTracking
+
+        saved = 0
+        for index, record in enumerate(batch):
+            try:
+                with transaction.atomic():
+                    VisitorTracking.objects.create(**record)
+                saved += 1
+            except DATABASE_UNAVAILABLE as e:
+                logger.error(f"Visitor tracking row retry stopped, database unavailable: {e}")
+                return saved, batch[index:]
+            except Exception as e:
+                logger.error(f"Visitor tracking row dropped: {e}")
+        return saved, []
+
+    def _requeue(self, batch: List[Dict[str, Any]]) -> int:
+        """
+        إعادة سجلات إلى بداية المخزن بترتيبها، مع احترام max_pending وسياسة الفائض:
+        drop_oldest يحذف أقدمها (من الدفعة)، و drop_newest يحذف أحدث المعلق، و flush يحتفظ بالكل
+        يعيد عدد السجلات المعادة
+        """
+        if not batch:
+            return 0
+        with self._lock:
+            excess = len(self._pending) + len(batch) - self.max_pending
+            if excess > 0 and self.overflow_policy == 'drop_oldest':
+                excess = min(excess, len(batch))
+                batch = batch[excess:]
+                self._counters['dropped'] += excess
+            elif excess > 0 and self.overflow_policy == 'drop_newest':
+                excess = min(excess, len(self._pending))
+                for _ in range(excess):
+                    self._pending.pop()
+                self._counters['dropped'] += excess
+            self._pending.extendleft(reversed(batch))
+        return len(batch)
+
+    @staticmethod
+    def _prepare(record: Dict[str, Any]) -> Dict[str, Any]:
+        """إكمال السجل قبل الكتابة (تحديد الموقع الجغرافي المؤجل من الـ middleware)"""
+        if 'country' not in record:
+            record.update(resolve_location(record.get('ip_address')))
+        return record
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            count = min(len(self._pending), self.max_batch_size)
+            return [self._pending.popleft() for _ in range(count)]
+
+    def _ensure_worker(self):
+        """تشغيل الخيط الخلفي عند أول استخدام (وبعد fork في gunicorn)"""
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None:
+            return
+
+        with self._lock:
+            if self._pid == pid and self._thread is not None:
+                return
+            if self._pid is not None and self._pid != pid:
+                # العملية الابنة ترث نسخة من السجلات المعلقة للأب فلا نكررها
+                self._pending.clear()
+            self._pid = pid
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='visit-buffer-flusher', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+_visit_buffer: Optional[VisitBuffer] = None
+_visit_buffer_lock = threading.Lock()
+
+
+def get_buffer_settings() -> Dict[str, Any]:
+    """دمج إعدادات VISITOR_TRACKING_BUFFER مع القيم الافتراضية"""
+    config = dict(DEFAULT_BUFFER_SETTINGS)
+    config.update(getattr(settings, 'VISITOR_TRACKING_BUFFER', {}))
+    return config
+
+
+def get_visit_buffer() -> Optional[VisitBuffer]:
+    """المخزن المشترك للعملية، أو None إذا كان معطلاً في الإعدادات"""
+    global _visit_buffer
+
+    config = get_buffer_settings()
+    if not config['ENABLED']:
+        return None
+
+    if _visit_buffer is None:
+        with _visit_buffer_lock:
+            if _visit_buffer is None:
+                _visit_buffer = VisitBuffer(
+                    max_batch_size=config['MAX_BATCH_SIZE'],
+                    flush_interval=config['FLUSH_INTERVAL'],
+                    max_pending=config['MAX_PENDING'],
+                    overflow_policy=config['OVERFLOW_POLICY'],
+                )
+                atexit.register(_flush_at_exit)
+    return _visit_buffer
+
+
+def _flush_at_exit():
+    if _visit_buffer is not None:
+        try:
+            _visit_buffer.stop(flush=True)
+        except Exception as e:
+            logger.error(f"Visitor tracking flush at exit failed: {e}")
@@ -1,16 +1,17 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Count, Avg, Sum
+from django.db.models import Q, Count
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import timedelta
 from django.contrib.auth.models import User
 from .models import (
     Category, Tag, Media, Page, BlogPost, SiteSettings, ContactMessage,
     DynamicForm, FormSubmission, VisitorTracking, IntegrationSettings,
-    PlatformReport, AdCampaign, AnalyticsReport
+    PlatformReport, CampaignDailyReport, AdCampaign, AnalyticsReport
 )
 from .serializers import (
     CategorySerializer, TagSerializer, MediaSerializer, PageSerializer,
@@ -22,17 +23,31 @@ from .serializers import (
     PlatformReportSerializer, AdCampaignSerializer, AnalyticsReportSerializer,
     AnalyticsStatsSerializer, FormSubmissionStatsSerializer
 )
+from .utils.visit_buffer import get_visit_buffer
+from .utils.analytics import submission_stats, visit_analytics
+from .utils.rollups import parse_day_range, submission_rollup_stats, visit_rollup_analytics
+from .utils.reports import request_report
+from .utils.counters import blog_post_views
+from .utils.response_cache import CachedResponseMixin, cached_response
+from .utils.search import filter_by_relevance
+from .utils.platform_metrics import (
+    campaign_status_counts, invalidate_platform_metrics, platform_metrics, report_queryset
+)
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """ViewSet للتصنيفات"""
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
+    cache_tags = ('category:*', 'blogpost:*')
     
     def get_queryset(self):
-        queryset = Category.objects.all()
+        # عدد المقالات المنشورة في نفس الاستعلام بدلاً من استعلام لكل تصنيف
+        queryset = Category.objects.annotate(
+            published_posts_count=Count('blogpost', filter=Q(blogpost__status='published'))
+        )
         search = self.request.query_params.get('search', None)
         if search:
             queryset = queryset.filter(
@@ -41,15 +56,19 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return queryset.order_by('name')
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """ViewSet للوسوم"""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
+    cache_tags = ('tag:*', 'blogpost:*')
     
     def get_queryset(self):
-        queryset = Tag.objects.all()
+        # عدد المقالات المنشورة في نفس الاستعلام بدلاً من استعلام لكل وسم
+        queryset = Tag.objects.annotate(
+            published_posts_count=Count('blogpost', filter=Q(blogpost__status='published'))
+        )
         search = self.request.query_params.get('search', None)
         if search:
             queryset = queryset.filter(name__icontains=search)
@@ -81,12 +100,13 @@ class MediaViewSet(viewsets.ModelViewSet):
         serializer.save(uploaded_by=self.request.user)
 
 
-class PageViewSet(viewsets.ModelViewSet):
+class PageViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """ViewSet للصفحات"""
     queryset = Page.objects.all()
     serializer_class = PageSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
+    cache_tags = ('page:*', 'media:*', 'user:*')
     
     def get_queryset(self):
         queryset = Page.objects.all()
@@ -95,11 +115,10 @@ class PageViewSet(viewsets.ModelViewSet):
         if not self.request.user.is_authenticated:
             queryset = queryset.filter(status='published')
         
+        # البحث عبر الفهرس النصي، والنتائج مرتبة حسب الصلة
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) | Q(content__icontains=search)
-            )
+            return filter_by_relevance(queryset, 'page', search)
         
         return queryset.order_by('order', '-created_at')
     
@@ -107,12 +126,15 @@ class PageViewSet(viewsets.ModelViewSet):
         serializer.save(author=self.request.user)
 
 
-class BlogPostViewSet(viewsets.ModelViewSet):
+class BlogPostViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """ViewSet لمقالات المدونة"""
     queryset = BlogPost.objects.all()
     serializer_class = BlogPostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
+    cache_tags = ('blogpost:*', 'category:*', 'tag:*', 'media:*', 'user:*')
+    # views_count يُعدّل بعد الذاكرة المؤقتة، فيُحسب ETag من المحتوى النهائي في CacheControlMiddleware
+    cache_etag = False
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -141,29 +163,32 @@ class BlogPostViewSet(viewsets.ModelViewSet):
         if featured and featured.lower() == 'true':
             queryset = queryset.filter(is_featured=True)
         
-        # البحث
+        # البحث عبر الفهرس النصي، والنتائج مرتبة حسب الصلة
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) | 
-                Q(content__icontains=search) | 
-                Q(excerpt__icontains=search)
-            )
+            return filter_by_relevance(queryset, 'blogpost', search)
         
         return queryset.order_by('-published_at', '-created_at')
     
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
     
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        # المشاهدات المعلقة تضاف بعد الذاكرة المؤقتة للاستجابات، فالمخزن هو قيمة قاعدة البيانات فقط
+        posts = response.data['results'] if isinstance(response.data, dict) else response.data
+        blog_post_views.apply_pending_data(posts)
+        return response
+    
     def retrieve(self, request, *args, **kwargs):
-        """زيادة عدد المشاهدات عند عرض المقال"""
-        instance = self.get_object()
-        if not request.user.is_authenticated or request.user != instance.author:
-            instance.views_count += 1
-            instance.save(update_fields=['views_count'])
-        
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        """زيادة عدد المشاهدات عند عرض المقال (في الذاكرة المؤقتة، وتُطبّق على قاعدة البيانات دورياً)"""
+        response = super().retrieve(request, *args, **kwargs)
+        post = response.data
+        if not request.user.is_authenticated or request.user.id != post['author']['id']:
+            post['views_count'] += blog_post_views.increment(post['id'])
+        else:
+            blog_post_views.apply_pending_data([post])
+        return response
 
 
 class SiteSettingsViewSet(viewsets.ModelViewSet):
@@ -179,6 +204,9 @@ class SiteSettingsViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def public(self, request):
         """إعدادات الموقع العامة (للواجهة الأمامية)"""
+        return cached_response(request, self._public_settings, tags=('sitesettings:*', 'media:*'))
+    
+    def _public_settings(self):
         settings = SiteSettings.objects.first()
         if settings:
             data = {
@@ -391,45 +419,12 @@ class FormSubmissionViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """إحصائيات إرسالات النماذج"""
-        queryset = self.get_queryset()
-        
-        # إحصائيات عامة
-        total_submissions = queryset.count()
-        submissions_by_status = queryset.values('status').annotate(count=Count('id'))
-        submissions_by_form = queryset.values('form__name').annotate(count=Count('id'))
-        
-        # إحصائيات حسب التاريخ (آخر 30 يوم)
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        recent_submissions = queryset.filter(submitted_at__gte=thirty_days_ago)
-        submissions_by_date = {}
-        
-        for i in range(30):
-            date = (timezone.now() - timedelta(days=i)).date()
-            count = recent_submissions.filter(submitted_at__date=date).count()
-            submissions_by_date[str(date)] = count
-        
-        # معدل التحويل (نسبة الإرسالات المكتملة)
-        completed_submissions = queryset.filter(status='completed').count()
-        conversion_rate = (completed_submissions / total_submissions * 100) if total_submissions > 0 else 0
-        
-        # متوسط وقت المعالجة
-        processed_submissions = queryset.filter(processed_at__isnull=False)
-        avg_processing_time = 0
-        if processed_submissions.exists():
-            total_time = sum([
-                (sub.processed_at - sub.submitted_at).total_seconds() / 3600  # بالساعات
-                for sub in processed_submissions
-            ])
-            avg_processing_time = total_time / processed_submissions.count()
-        
-        stats_data = {
-            'total_submissions': total_submissions,
-            'submissions_by_form': {item['form__name']: item['count'] for item in submissions_by_form},
-            'submissions_by_status': {item['status']: item['count'] for item in submissions_by_status},
-            'submissions_by_date': submissions_by_date,
-            'conversion_rate': round(conversion_rate, 2),
-            'avg_processing_time': round(avg_processing_time, 2)
-        }
+        # عدد ثابت من الاستعلامات مهما كانت الفترة (?days=، افتراضياً 30 يوماً)
+        try:
+            days = min(max(int(request.query_params.get('days', 30)), 1), 366)
+        except ValueError:
+            days = 30
+        stats_data = submission_stats(self.get_queryset(), days=days)
         
         serializer = FormSubmissionStatsSerializer(stats_data)
         return Response(serializer.data)
@@ -479,62 +474,29 @@ class VisitorTrackingViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def analytics(self, request):
         """تحليلات الزوار"""
-        queryset = self.get_queryset()
-        
-        # إحصائيات عامة
-        total_visitors = queryset.values('session_key').distinct().count()
-        total_page_views = queryset.count()
-        bounce_visits = queryset.filter(is_bounce=True).count()
-        bounce_rate = (bounce_visits / total_page_views * 100) if total_page_views > 0 else 0
-        
-        # متوسط مدة الجلسة
-        avg_session_duration = queryset.aggregate(
-            avg_duration=Avg('visit_duration')
-        )['avg_duration'] or 0
-        
-        # أهم الصفحات
-        top_pages = list(queryset.values('page_url', 'page_title')
-                        .annotate(views=Count('id'))
-                        .order_by('-views')[:10])
-        
-        # أهم المصادر
-        top_referrers = list(queryset.exclude(referrer__isnull=True)
-                           .exclude(referrer='')
-                           .values('referrer')
-                           .annotate(visits=Count('id'))
-                           .order_by('-visits')[:10])
-        
-        # توزيع الأجهزة
-        device_breakdown = dict(queryset.values('device_type')
-                              .annotate(count=Count('id'))
-                              .values_list('device_type', 'count'))
-        
-        # توزيع المتصفحات
-        browser_breakdown = dict(queryset.values('browser')
-                               .annotate(count=Count('id'))
-                               .values_list('browser', 'count'))
-        
-        # توزيع البلدان
-        country_breakdown = dict(queryset.values('country')
-                               .annotate(count=Count('id'))
-                               .values_list('country', 'count'))
-        
-        analytics_data = {
-            'total_visitors': total_visitors,
-            'total_page_views': total_page_views,
-            'total_form_submissions': FormSubmission.objects.count(),
-            'bounce_rate': round(bounce_rate, 2),
-            'avg_session_duration': round(avg_session_duration, 2),
-            'top_pages': top_pages,
-            'top_referrers': top_referrers,
-            'device_breakdown': device_breakdown,
-            'browser_breakdown': browser_breakdown,
-            'country_breakdown': country_breakdown
-        }
+        # نطاق بالأيام بدون فلاتر إضافية يُقرأ من جداول التجميع اليومية
+        params = request.query_params
+        day_range = parse_day_range(params.get('date_from'), params.get('date_to'))
+        if day_range is not None and not params.get('device_type') and not params.get('browser'):
+            analytics_data = visit_rollup_analytics(*day_range, unique=params.get('unique'))
+        else:
+            # المقاييس العامة في استعلام واحد والتوزيعات في مرور واحد على الجدول
+            analytics_data = visit_analytics(self.get_queryset())
+        analytics_data['total_form_submissions'] = FormSubmission.objects.count()
         
         serializer = AnalyticsStatsSerializer(analytics_data)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def buffer_stats(self, request):
+        """عدادات المخزن المؤقت لسجلات الزوار في هذه العملية"""
+        visit_buffer = get_visit_buffer()
+        if visit_buffer is None:
+            data = {'enabled': False}
+        else:
+            data = {'enabled': True, **visit_buffer.stats()}
+        return Response(data)
+
 
 class IntegrationSettingsViewSet(viewsets.ModelViewSet):
     """ViewSet لإعدادات التكامل"""
@@ -687,70 +649,45 @@ class AnalyticsReportViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # جمع بيانات التقرير
-        report_data = self._generate_report_data(report_type, date_from, date_to)
-        
-        # إنشاء التقرير
-        report = AnalyticsReport.objects.create(
-            title=title,
-            report_type=report_type,
-            date_from=date_from,
-            date_to=date_to,
-            generated_by=request.user,
-            **report_data
-        )
-        
-        serializer = self.get_serializer(report)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
-    
-    def _generate_report_data(self, report_type, date_from, date_to):
-        """إنشاء بيانات التقرير"""
-        # تحليلات الموقع
-        visitor_queryset = VisitorTracking.objects.filter(
-            visited_at__range=[date_from, date_to]
-        )
-        
-        website_analytics = {
-            'total_visitors': visitor_queryset.values('session_key').distinct().count(),
-            'total_page_views': visitor_queryset.count(),
-            'bounce_rate': visitor_queryset.filter(is_bounce=True).count() / visitor_queryset.count() * 100 if visitor_queryset.count() > 0 else 0,
-            'avg_session_duration': visitor_queryset.aggregate(avg=Avg('visit_duration'))['avg'] or 0
-        }
+        day_range = parse_day_range(str(date_from), str(date_to))
+        if day_range is None:
+            return Response(
+                {'error': 'صيغة التاريخ غير صحيحة (YYYY-MM-DD)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        date_from, date_to = day_range
         
-        # إرسالات النماذج
-        submission_queryset = FormSubmission.objects.filter(
-            submitted_at__range=[date_from, date_to]
+        # الحساب في الخلفية؛ الطلبات المتطابقة قيد التنفيذ تشترك في نفس التقرير
+        report, created = request_report(
+            title, report_type, date_from, date_to, request.user,
+            unique=request.data.get('unique')
         )
         
-        form_submissions = {
-            'total_submissions': submission_queryset.count(),
-            'submissions_by_form': dict(submission_queryset.values('form__name').annotate(count=Count('id')).values_list('form__name', 'count')),
-            'submissions_by_status': dict(submission_queryset.values('status').annotate(count=Count('id')).values_list('status', 'count'))
-        }
-        
-        # رؤى الزوار
-        visitor_insights = {
-            'total_visitors': website_analytics['total_visitors'],
-            'total_page_views': website_analytics['total_page_views'],
-            'bounce_rate': website_analytics['bounce_rate'],
-            'avg_session_duration': website_analytics['avg_session_duration'],
-            'device_breakdown': dict(visitor_queryset.values('device_type').annotate(count=Count('id')).values_list('device_type', 'count')),
-            'browser_breakdown': dict(visitor_queryset.values('browser').annotate(count=Count('id')).values_list('browser', 'count'))
-        }
+        if report.status == 'completed':
+            serializer = self.get_serializer(report)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
         
-        # أداء المنصات (يمكن توسيعه لاحقاً)
-        platform_performance = {
-            'meta_business': {},
-            'twitter': {},
-            'google_analytics': {}
+        return Response({
+            'job_id': report.id,
+            'status': report.status,
+            'deduplicated': not created,
+            'status_url': reverse('analyticsreport-job-status', args=[report.id], request=request)
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'], url_path='status')
+    def job_status(self, request, pk=None):
+        """حالة مهمة إنشاء التقرير"""
+        report = self.get_object()
+        
+        data = {
+            'job_id': report.id,
+            'status': report.status,
+            'error': report.error_message or None,
         }
+        if report.status == 'completed':
+            data['report'] = self.get_serializer(report).data
         
-        return {
-            'website_analytics': website_analytics,
-            'form_submissions': form_submissions,
-            'visitor_insights': visitor_insights,
-            'platform_performance': platform_performance
-        }
+        return Response(data)
 
 
 
@@ -844,46 +781,30 @@ class PlatformReportViewSet(viewsets.ReadOnlyModelViewSet):
             end_date = timezone.now().date()
             start_date = end_date - timedelta(days=days)
             
-            # جلب التقارير
-            reports = PlatformReport.objects.filter(
-                report_date__gte=start_date,
-                report_date__lte=end_date
-            )
+            # كل المنصات الموجودة في التقارير مع الإجماليات في استعلام واحد
+            metrics = platform_metrics(report_queryset(start_date, end_date))
             
-            # تجميع البيانات حسب المنصة
             summary = {}
-            for platform in ['meta_business', 'x_twitter']:
-                platform_reports = reports.filter(platform=platform)
-                
+            for platform, values in metrics['platforms'].items():
                 summary[platform] = {
-                    'total_impressions': platform_reports.aggregate(
-                        total=Sum('impressions')
-                    )['total'] or 0,
-                    'total_clicks': platform_reports.aggregate(
-                        total=Sum('clicks')
-                    )['total'] or 0,
-                    'total_spend': float(platform_reports.aggregate(
-                        total=Sum('spend')
-                    )['total'] or 0),
-                    'total_reach': platform_reports.aggregate(
-                        total=Sum('reach')
-                    )['total'] or 0,
-                    'avg_ctr': platform_reports.aggregate(
-                        avg=Avg('ctr')
-                    )['avg'] or 0,
-                    'avg_cpc': platform_reports.aggregate(
-                        avg=Avg('cpc')
-                    )['avg'] or 0,
-                    'campaigns_count': platform_reports.values('campaign_id').distinct().count()
+                    'total_impressions': values['total_impressions'],
+                    'total_clicks': values['total_clicks'],
+                    'total_spend': values['total_spend'],
+                    'total_reach': values['total_reach'],
+                    'avg_ctr': values['ctr'],
+                    'avg_cpc': values['cpc'],
+                    'campaigns_count': values['campaigns_count']
                 }
             
-            # حساب الإجماليات
+            totals = metrics['totals']
             total_summary = {
-                'total_impressions': sum(p['total_impressions'] for p in summary.values()),
-                'total_clicks': sum(p['total_clicks'] for p in summary.values()),
-                'total_spend': sum(p['total_spend'] for p in summary.values()),
-                'total_reach': sum(p['total_reach'] for p in summary.values()),
-                'total_campaigns': sum(p['campaigns_count'] for p in summary.values()),
+                'total_impressions': totals['total_impressions'],
+                'total_clicks': totals['total_clicks'],
+                'total_spend': totals['total_spend'],
+                'total_reach': totals['total_reach'],
+                'total_campaigns': totals['campaigns_count'],
+                'overall_ctr': totals['ctr'],
+                'overall_cpc': totals['cpc'],
                 'date_range': {
                     'start': start_date.isoformat(),
                     'end': end_date.isoformat(),
@@ -891,21 +812,6 @@ class PlatformReportViewSet(viewsets.ReadOnlyModelViewSet):
                 }
             }
             
-            # حساب المعدلات الإجمالية
-            if total_summary['total_impressions'] > 0:
-                total_summary['overall_ctr'] = (
-                    total_summary['total_clicks'] / total_summary['total_impressions']
-                ) * 100
-            else:
-                total_summary['overall_ctr'] = 0
-            
-            if total_summary['total_clicks'] > 0:
-                total_summary['overall_cpc'] = (
-                    total_summary['total_spend'] / total_summary['total_clicks']
-                )
-            else:
-                total_summary['overall_cpc'] = 0
-            
             return Response({
                 'success': True,
                 'summary': total_summary,
@@ -991,7 +897,7 @@ class AdCampaignViewSet(viewsets.ModelViewSet):
                 
                 if insights:
                     # تحديث أو إنشاء تقرير جديد
-                    PlatformReport.objects.update_or_create(
+                    CampaignDailyReport.objects.update_or_create(
                         platform=campaign.platform,
                         campaign_id=campaign.external_id,
                         report_date=timezone.now().date(),
@@ -1006,6 +912,7 @@ class AdCampaignViewSet(viewsets.ModelViewSet):
                             'data': insights
                         }
                     )
+                    invalidate_platform_metrics()
                     
                     return Response({
                         'success': True,
@@ -1025,7 +932,7 @@ class AdCampaignViewSet(viewsets.ModelViewSet):
                 
                 if analytics:
                     # تحديث أو إنشاء تقرير جديد
-                    PlatformReport.objects.update_or_create(
+                    CampaignDailyReport.objects.update_or_create(
                         platform=campaign.platform,
                         campaign_id=campaign.external_id,
                         report_date=timezone.now().date(),
@@ -1040,6 +947,7 @@ class AdCampaignViewSet(viewsets.ModelViewSet):
                             'data': analytics
                         }
                     )
+                    invalidate_platform_metrics()
                     
                     return Response({
                         'success': True,
@@ -1076,25 +984,26 @@ class AdCampaignViewSet(viewsets.ModelViewSet):
             # جلب الحملات
             campaigns = self.get_queryset()
             
-            # جلب التقارير المرتبطة
-            campaign_ids = campaigns.values_list('external_id', flat=True)
-            reports = PlatformReport.objects.filter(
-                campaign_id__in=campaign_ids,
-                report_date__gte=start_date,
-                report_date__lte=end_date
+            # التقارير المرتبطة (الحملات كاستعلام فرعي)
+            reports = report_queryset(start_date, end_date).filter(
+                campaign_id__in=campaigns.values('external_id')
             )
             
-            # تجميع البيانات
+            # استعلامان فقط: أعداد الحملات حسب المنصة والحالة، ومقاييس التقارير حسب المنصة
+            campaign_counts = campaign_status_counts(campaigns)
+            metrics = platform_metrics(reports)
+            totals = metrics['totals']
+            
             summary = {
-                'total_campaigns': campaigns.count(),
-                'active_campaigns': campaigns.filter(status='active').count(),
-                'paused_campaigns': campaigns.filter(status='paused').count(),
-                'total_impressions': reports.aggregate(total=Sum('impressions'))['total'] or 0,
-                'total_clicks': reports.aggregate(total=Sum('clicks'))['total'] or 0,
-                'total_spend': float(reports.aggregate(total=Sum('spend'))['total'] or 0),
-                'total_reach': reports.aggregate(total=Sum('reach'))['total'] or 0,
-                'avg_ctr': reports.aggregate(avg=Avg('ctr'))['avg'] or 0,
-                'avg_cpc': reports.aggregate(avg=Avg('cpc'))['avg'] or 0,
+                'total_campaigns': campaign_counts['total'],
+                'active_campaigns': campaign_counts['by_status'].get('active', 0),
+                'paused_campaigns': campaign_counts['by_status'].get('paused', 0),
+                'total_impressions': totals['total_impressions'],
+                'total_clicks': totals['total_clicks'],
+                'total_spend': totals['total_spend'],
+                'total_reach': totals['total_reach'],
+                'avg_ctr': totals['ctr'],
+                'avg_cpc': totals['cpc'],
                 'date_range': {
                     'start': start_date.isoformat(),
                     'end': end_date.isoformat(),
@@ -1102,26 +1011,21 @@ class AdCampaignViewSet(viewsets.ModelViewSet):
                 }
             }
             
-            # تجميع حسب المنصة
+            # تجميع حسب المنصة (كل منصة لها حملات أو تقارير)
             platforms_summary = {}
-            for platform in ['meta_business', 'x_twitter']:
-                platform_campaigns = campaigns.filter(platform=platform)
-                platform_reports = reports.filter(platform=platform)
+            empty_counts = {'total': 0, 'by_status': {}}
+            for platform in sorted(set(campaign_counts['platforms']) | set(metrics['platforms'])):
+                counts = campaign_counts['platforms'].get(platform, empty_counts)
+                values = metrics['platforms'].get(platform)
                 
                 platforms_summary[platform] = {
-                    'campaigns_count': platform_campaigns.count(),
-                    'active_campaigns': platform_campaigns.filter(status='active').count(),
-                    'total_impressions': platform_reports.aggregate(
-                        total=Sum('impressions')
-                    )['total'] or 0,
-                    'total_clicks': platform_reports.aggregate(
-                        total=Sum('clicks')
-                    )['total'] or 0,
-                    'total_spend': float(platform_reports.aggregate(
-                        total=Sum('spend')
-                    )['total'] or 0),
-                    'avg_ctr': platform_reports.aggregate(avg=Avg('ctr'))['avg'] or 0,
-                    'avg_cpc': platform_reports.aggregate(avg=Avg('cpc'))['avg'] or 0
+                    'campaigns_count': counts['total'],
+                    'active_campaigns': counts['by_status'].get('active', 0),
+                    'total_impressions': values['total_impressions'] if values else 0,
+                    'total_clicks': values['total_clicks'] if values else 0,
+                    'total_spend': values['total_spend'] if values else 0,
+                    'avg_ctr': values['ctr'] if values else 0,
+                    'avg_cpc': values['cpc'] if values else 0
                 }
             
             return Response({
@@ -1266,8 +1170,10 @@ class UnifiedReportViewSet(viewsets.ViewSet):
         try:
             days = int(request.query_params.get('days', 7))
             
+            include_series = request.query_params.get('series', '').lower() in ('1', 'true')
+            
             integration_manager = get_integration_manager()
-            result = integration_manager.get_unified_report(days)
+            result = integration_manager.get_unified_report(days, include_series=include_series)
             
             return Response(result)
             
@@ -1286,65 +1192,43 @@ class UnifiedReportViewSet(viewsets.ViewSet):
             end_date = timezone.now().date()
             start_date = end_date - timedelta(days=days)
             
-            # إحصائيات المنصات
-            platform_reports = PlatformReport.objects.filter(
-                report_date__gte=start_date,
-                report_date__lte=end_date
-            )
-            
-            # إحصائيات الحملات
-            campaigns = AdCampaign.objects.all()
-            
-            # إحصائيات الزوار
-            visitors = VisitorTracking.objects.filter(
-                visit_date__gte=start_date,
-                visit_date__lte=end_date
-            )
+            # إحصائيات المنصات والحملات (نفس محرك ملخص المنصات)
+            platform_totals = platform_metrics(report_queryset(start_date, end_date))['totals']
+            campaign_counts = campaign_status_counts()
             
-            # إحصائيات النماذج
-            form_submissions = FormSubmission.objects.filter(
-                submitted_at__gte=timezone.make_aware(
-                    datetime.combine(start_date, datetime.min.time())
-                ),
-                submitted_at__lte=timezone.make_aware(
-                    datetime.combine(end_date, datetime.max.time())
-                )
+            # إحصائيات الزوار والنماذج من جداول التجميع اليومية (واليوم الحالي من السجلات الخام)
+            visitors = visit_rollup_analytics(
+                start_date, end_date, distinct_field='ip_address', unique=request.query_params.get('unique')
             )
+            form_submissions = submission_rollup_stats(start_date, end_date)
+            submissions_by_status = form_submissions['submissions_by_status']
             
             stats = {
                 'platforms': {
-                    'total_impressions': platform_reports.aggregate(
-                        total=Sum('impressions')
-                    )['total'] or 0,
-                    'total_clicks': platform_reports.aggregate(
-                        total=Sum('clicks')
-                    )['total'] or 0,
-                    'total_spend': float(platform_reports.aggregate(
-                        total=Sum('spend')
-                    )['total'] or 0),
-                    'total_reach': platform_reports.aggregate(
-                        total=Sum('reach')
-                    )['total'] or 0
+                    'total_impressions': platform_totals['total_impressions'],
+                    'total_clicks': platform_totals['total_clicks'],
+                    'total_spend': platform_totals['total_spend'],
+                    'total_reach': platform_totals['total_reach'],
+                    'overall_ctr': platform_totals['ctr'],
+                    'overall_cpc': platform_totals['cpc']
                 },
                 'campaigns': {
-                    'total_campaigns': campaigns.count(),
-                    'active_campaigns': campaigns.filter(status='active').count(),
-                    'paused_campaigns': campaigns.filter(status='paused').count(),
-                    'meta_business_campaigns': campaigns.filter(platform='meta_business').count(),
-                    'x_twitter_campaigns': campaigns.filter(platform='x_twitter').count()
+                    'total_campaigns': campaign_counts['total'],
+                    'active_campaigns': campaign_counts['by_status'].get('active', 0),
+                    'paused_campaigns': campaign_counts['by_status'].get('paused', 0),
+                    'meta_business_campaigns': campaign_counts['platforms'].get('meta_business', {}).get('total', 0),
+                    'x_twitter_campaigns': campaign_counts['platforms'].get('x_twitter', {}).get('total', 0)
                 },
                 'visitors': {
-                    'total_visits': visitors.count(),
-                    'unique_visitors': visitors.values('ip_address').distinct().count(),
-                    'avg_session_duration': visitors.aggregate(
-                        avg=Avg('session_duration')
-                    )['avg'] or 0,
-                    'bounce_rate': 0  # يمكن حسابها لاحقاً
+                    'total_visits': visitors['total_page_views'],
+                    'unique_visitors': visitors['total_visitors'],
+                    'avg_session_duration': visitors['avg_session_duration'],
+                    'bounce_rate': visitors['bounce_rate']
                 },
                 'forms': {
-                    'total_submissions': form_submissions.count(),
-                    'pending_submissions': form_submissions.filter(status='pending').count(),
-                    'processed_submissions': form_submissions.filter(status='processed').count(),
+                    'total_submissions': form_submissions['total_submissions'],
+                    'pending_submissions': submissions_by_status.get('new', 0) + submissions_by_status.get('in_progress', 0),
+                    'processed_submissions': submissions_by_status.get('completed', 0),
                     'forms_count': DynamicForm.objects.filter(is_active=True).count()
                 },
                 'date_range': {
@@ -47,6 +47,7 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'cms.middleware.CORSMiddleware',
     'cms.middleware.SecurityMiddleware',
+    'cms.middleware.StaticAssetsMiddleware',
     'cms.middleware.CompressionMiddleware',
     'cms.middleware.CDNMiddleware',
     'cms.middleware.CacheControlMiddleware',
@@ -142,6 +143,16 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# {% static %} يعطي الأسماء ذات البصمة بعد build_static_assets (انظر STATIC_ASSETS)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'cms.utils.static_assets.FingerprintedStaticFilesStorage',
+    },
+}
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -210,7 +221,114 @@ STATIC_FILES_CACHE_TTL = 31536000  # سنة واحدة
 MEDIA_FILES_CACHE_TTL = 2592000   # شهر واحد
 HTML_CACHE_TTL = 3600             # ساعة واحدة
 
-# إعدادات الضغط
-COMPRESSION_ENABLED = True
-COMPRESSION_MIN_SIZE = 1024  # 1KB
+# الذاكرة المؤقتة: Redis مشترك بين كل عمليات gunicorn عند ضبط REDIS_URL (مطلوب في الإنتاج لإبطال
+# الاستجابات وتقارير المنصات في كل العمليات)، وإلا ذاكرة داخل العملية للتطوير
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'idea_cms',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# السماح بالذاكرات المعتمدة على الإبطال مع ذاكرة داخل العملية (صحيح فقط مع عملية واحدة مثل runserver)
+ALLOW_PROCESS_LOCAL_CACHE = os.getenv('ALLOW_PROCESS_LOCAL_CACHE', str(DEBUG)).lower() == 'true'
+
+
+# إعدادات المخزن المؤقت لتتبع الزوار (كتابة مجمعة بدلاً من INSERT لكل طلب)
+VISITOR_TRACKING_BUFFER = {
+    'ENABLED': os.getenv('VISITOR_TRACKING_BUFFER_ENABLED', 'true').lower() == 'true',
+    'MAX_BATCH_SIZE': 200,        # عدد السجلات في كل bulk_create
+    'FLUSH_INTERVAL': 5.0,        # ثوانٍ بين عمليات الكتابة الدورية
+    'MAX_PENDING': 10000,         # الحد الأقصى للسجلات المعلقة في الذاكرة
+    'OVERFLOW_POLICY': 'drop_oldest',  # drop_oldest | drop_newest | flush
+}
+
+# إعدادات تحديد الموقع الجغرافي (قاعدة نطاقات IP محلية تُبنى بأمر build_geoip_db)
+GEOIP_RESOLVER = os.getenv('GEOIP_RESOLVER', 'cms.utils.geoip.MmapGeoIPResolver')
+GEOIP_DATABASE_PATH = os.getenv('GEOIP_DATABASE_PATH', str(BASE_DIR / 'geoip' / 'ip-ranges.bin'))
+
+# إعدادات عدّ الزوار الفريدين في التحليلات: approx (دمج رسوم HyperLogLog اليومية) أو exact (COUNT DISTINCT)
+ANALYTICS_UNIQUE_COUNT = os.getenv('ANALYTICS_UNIQUE_COUNT', 'approx')
+
+# إعدادات المهام الخلفية (إنشاء التقارير خارج دورة الطلب)
+BACKGROUND_JOBS = {
+    'ENABLED': os.getenv('BACKGROUND_JOBS_ENABLED', 'true').lower() == 'true',
+    'MAX_WORKERS': 2,      # عدد الخيوط لكل عملية
+    'JOB_TIMEOUT': 1800,   # ثوانٍ قبل اعتبار التقرير المعلق متوقفاً
+}
 
+# إعدادات البحث النصي (الفهرس الأولي: python manage.py rebuild_search_index)
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', '')  # فارغ = حسب قاعدة البيانات (SQLite FTS5 أو PostgreSQL tsvector)
+SEARCH_AUTO_INDEX = True  # تحديث الفهرس عبر الإشارات عند حفظ أو حذف المحتوى
+
+# إعدادات اقتراحات البحث (فهرس عناوين في ذاكرة كل عملية، يُزامن بين العمليات عبر الذاكرة المؤقتة المشتركة)
+SEARCH_SUGGEST = {
+    'SYNC_INTERVAL': 2,  # ثوانٍ بين فحوص سجل التعديلات المشترك
+    'MAX_WORDS': 12,
+    'MAX_SCAN': 2000,
+    'MAX_DELTAS': 1000,
+    'DELTA_TIMEOUT': 600,
+    'REBUILD_INTERVAL': 300,  # بدون ذاكرة مشتركة (REDIS_URL) يُعاد بناء الفهارس في الخلفية بهذا الفاصل
+}
+
+# إعدادات عدادات المشاهدات (الزيادات في الذاكرة المؤقتة وتُطبّق على قاعدة البيانات كل FLUSH_INTERVAL ثانية وعند الإيقاف)
+VIEW_COUNTERS = {
+    'CACHE': 'default',  # يُفضّل ذاكرة مشتركة (Redis)؛ أمر flush_view_counts لا يعمل إلا معها
+    'FLUSH_INTERVAL': 30,
+}
+
+# إعدادات الذاكرة المؤقتة لاستجابات الواجهات العامة (تُبطل بالوسوم عند حفظ أو حذف المحتوى)
+RESPONSE_CACHE = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+    'LOCK_TIMEOUT': 10,
+}
+
+# إعدادات ضغط الاستجابات (br و zstd يتطلبان مكتبتي brotli و zstandard، وإلا يُستخدم gzip فقط)
+COMPRESSION = {
+    'ENABLED': True,
+    'CODECS': ['br', 'zstd', 'gzip'],  # ترتيب التفضيل عند تساوي قيم q في Accept-Encoding
+    'MIN_SIZE': 1024,
+    'STREAM_FLUSH_SIZE': 16384,
+    'LEVELS': {
+        'default': {'br': 5, 'zstd': 6, 'gzip': 6},
+        'application/json': {'br': 4, 'zstd': 3, 'gzip': 5},
+    },
+    'VARIANT_CACHE_SIZE': 32 * 1024 * 1024,
+}
+
+# إعدادات بناء الملفات الثابتة (python manage.py build_static_assets بعد collectstatic):
+# أسماء ببصمة المحتوى ونسخ .gz/.br/.zst مضغوطة مسبقاً يرسلها StaticAssetsMiddleware حسب Accept-Encoding
+STATIC_ASSETS = {
+    'ENABLED': True,
+    'MANIFEST': 'static-manifest.json',
+    'WORKERS': None,  # عدد عمليات الضغط المتوازية (None = عدد المعالجات)
+    'LEVELS': {'br': 11, 'zstd': 19, 'gzip': 9},
+}
+
+# إعدادات تحويل روابط CDN في صفحات HTML (مزود CDN يُحدد في cdn_config.py عبر متغيرات البيئة)
+CDN_REWRITE = {
+    'URL_CACHE_SIZE': 4096,
+    'OUTPUT_CACHE_SIZE': 16 * 1024 * 1024,  # صفحات محوّلة محفوظة حسب ETag
+}
+
+# إعدادات عميل Meta Graph API (جلسة مشتركة بـ keep-alive وجلب متوازٍ محدود يحترم ترويسات حدود الاستخدام)
+# META_GRAPH_API_URL يوجّه المزامنة إلى خادم محلي: python manage.py graph_api_stub
+META_GRAPH_API = {
+    'BASE_URL': os.environ.get('META_GRAPH_API_URL', 'https://graph.facebook.com/v18.0'),
+    'TIMEOUT': 15,
+    'MAX_CONCURRENCY': 8,
+    'BATCH_SIZE': 50,    # طلبات فرعية في كل طلب batch لإحصائيات الحملات (الحد الأقصى في Graph API)
+    'SLOW_DOWN_AT': 75,  # نسبة الاستخدام (%) التي تصبح بعدها الطلبات متتابعة
+    'MAX_PAUSE': 120,
+}